@@ -0,0 +1,129 @@
+import os
+import sys
+import numpy as np
+import pyarrow as pa
+
+# Columnar layout for the blank-line-delimited .source files and whitespace label files:
+#   sentences.arrow  Arrow IPC file with one row per sentence (sentence: string, label: int8)
+#   offsets.npy      int64 array of length n_docs + 1; doc i is rows offsets[i]:offsets[i + 1]
+# Both are memory-mapped on read, so opening a split is constant time and constant memory.
+
+SCHEMA = pa.schema([("sentence", pa.large_string()), ("label", pa.int8())])
+NO_LABEL = -1
+
+def iter_source_docs(path):
+    current_doc = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line == "":
+                if current_doc:
+                    yield current_doc
+                    current_doc = []
+            else:
+                current_doc.append(line)
+    if current_doc:
+        yield current_doc
+
+def iter_label_docs(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield [int(x) for x in line.strip().split()]
+
+def convert(source_path, output_dir, labels_path=None, batch_sentences=65536):
+    os.makedirs(output_dir, exist_ok=True)
+    label_docs = iter_label_docs(labels_path) if labels_path else None
+    offsets = [0]
+    sentences, labels = [], []
+
+    with pa.OSFile(os.path.join(output_dir, "sentences.arrow.tmp"), "wb") as sink:
+        with pa.ipc.new_file(sink, SCHEMA) as writer:
+            for doc_index, doc in enumerate(iter_source_docs(source_path)):
+                doc_labels = next(label_docs, None) if label_docs else [NO_LABEL] * len(doc)
+                if doc_labels is None:
+                    raise ValueError(f"{labels_path} has fewer label lines than {source_path} has docs.")
+                if len(doc_labels) != len(doc):
+                    raise ValueError(f"Mismatch in doc {doc_index}: {len(doc)} sentences vs {len(doc_labels)} labels.")
+                sentences.extend(doc)
+                labels.extend(doc_labels)
+                offsets.append(offsets[-1] + len(doc))
+                if len(sentences) >= batch_sentences:
+                    writer.write_batch(pa.record_batch([pa.array(sentences, pa.large_string()), pa.array(labels, pa.int8())], schema=SCHEMA))
+                    sentences, labels = [], []
+            if sentences:
+                writer.write_batch(pa.record_batch([pa.array(sentences, pa.large_string()), pa.array(labels, pa.int8())], schema=SCHEMA))
+
+    if label_docs is not None and next(label_docs, None) is not None:
+        raise ValueError(f"{labels_path} has more label lines than {source_path} has docs.")
+
+    np.save(os.path.join(output_dir, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+    os.replace(os.path.join(output_dir, "sentences.arrow.tmp"), os.path.join(output_dir, "sentences.arrow"))
+    return Corpus(output_dir)
+
+class Corpus:
+    def __init__(self, path):
+        self.path = path
+        self._mmap = pa.memory_map(os.path.join(path, "sentences.arrow"), "r")
+        # read_all over a memory map is zero-copy for uncompressed IPC files
+        table = pa.ipc.open_file(self._mmap).read_all()
+        self.sentence_column = table.column("sentence")
+        self.label_column = table.column("label")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _span(self, index):
+        if index < 0:
+            index += len(self)
+        return int(self.offsets[index]), int(self.offsets[index + 1])
+
+    def sentences(self, index):
+        start, end = self._span(index)
+        return self.sentence_column.slice(start, end - start).to_pylist()
+
+    def labels(self, index):
+        start, end = self._span(index)
+        return self.label_column.slice(start, end - start).to_numpy()
+
+    def __getitem__(self, index):
+        return self.sentences(index), self.labels(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def iter_sentences(self):
+        for index in range(len(self)):
+            yield self.sentences(index)
+
+    def iter_batches(self, batch_docs=256):
+        # Yields (first_doc_index, sentences, labels, offsets) with offsets relative to the batch
+        for first in range(0, len(self), batch_docs):
+            last = min(first + batch_docs, len(self))
+            start, end = int(self.offsets[first]), int(self.offsets[last])
+            yield (
+                first,
+                self.sentence_column.slice(start, end - start).to_pylist(),
+                self.label_column.slice(start, end - start).to_numpy(),
+                np.asarray(self.offsets[first:last + 1]) - start,
+            )
+
+def open_corpus(source_path, labels_path=None):
+    # Converts once next to the source and reuses the conversion until the inputs change
+    output_dir = source_path + ".corpus"
+    if labels_path:
+        output_dir = f"{source_path}.{os.path.basename(labels_path)}.corpus"
+    arrow_path = os.path.join(output_dir, "sentences.arrow")
+    inputs = [source_path] + ([labels_path] if labels_path else [])
+    if not os.path.exists(arrow_path) or any(os.path.getmtime(p) > os.path.getmtime(arrow_path) for p in inputs):
+        return convert(source_path, output_dir, labels_path)
+    return Corpus(output_dir)
+
+if __name__ == "__main__":
+    # python corpus.py <source> [labels] [output_dir]
+    source_path = sys.argv[1]
+    labels_path = sys.argv[2] if len(sys.argv) > 2 else None
+    output_dir = sys.argv[3] if len(sys.argv) > 3 else (f"{source_path}.{os.path.basename(labels_path)}.corpus" if labels_path else source_path + ".corpus")
+    corpus = convert(source_path, output_dir, labels_path)
+    print(f"Converted {len(corpus)} docs ({len(corpus.sentence_column)} sentences) to {output_dir}")
@@ -0,0 +1,184 @@
+"""Shared ROUGE/BERTScore evaluation for the summarisation scripts.
+
+Per-document scores are appended to a JSONL results file keyed by doc id and a hash of
+(prediction, reference), so a re-run, or a run over a larger sample, only scores documents
+it has not seen.
+
+The scripts in abstractive/, extractive/ and hybrid/ are run directly by path and their
+file names are not importable module names, so they cannot be run as a package. Each one
+puts this directory on sys.path with a single line before importing this module, or the
+other shared modules next to it (corpus, inference_runner, textrank_engine).
+"""
+import hashlib
+import json
+import os
+from collections import defaultdict
+from functools import lru_cache
+from multiprocessing import Pool
+from nltk.stem import porter
+from rouge_score import rouge_scorer, tokenize, tokenizers
+
+ROUGE_TYPES = ["rouge1", "rouge2", "rougeL"]
+BERTSCORE_LANG = "en"
+BERTSCORE_BATCH_SIZE = 64
+TOKEN_CACHE_SIZE = 4096
+
+class MemoStemmer:
+    # Porter stemming dominates ROUGE time and legal text repeats the same words constantly
+    def __init__(self):
+        self._stemmer = porter.PorterStemmer()
+        self._stems = {}
+
+    def stem(self, word):
+        stem = self._stems.get(word)
+        if stem is None:
+            stem = self._stems[word] = self._stemmer.stem(word)
+        return stem
+
+class CachedTokenizer(tokenizers.Tokenizer):
+    # Same tokens as rouge_score's DefaultTokenizer(use_stemmer=True); references are
+    # tokenized once per process however many systems are scored against them
+    def __init__(self, cache_size=TOKEN_CACHE_SIZE):
+        self._stemmer = MemoStemmer()
+        self._tokenize = lru_cache(maxsize=cache_size)(self._tokenize_uncached)
+
+    def _tokenize_uncached(self, text):
+        return tokenize.tokenize(text, self._stemmer)
+
+    def tokenize(self, text):
+        return self._tokenize(text)
+
+_rouge_scorer = None
+
+def get_rouge_scorer():
+    global _rouge_scorer
+    if _rouge_scorer is None:
+        _rouge_scorer = rouge_scorer.RougeScorer(ROUGE_TYPES, tokenizer=CachedTokenizer())
+    return _rouge_scorer
+
+def _rouge_pair(pair):
+    prediction, reference = pair
+    scores = get_rouge_scorer().score(reference, prediction)
+    return {rouge_type: scores[rouge_type].fmeasure for rouge_type in ROUGE_TYPES}
+
+def rouge_scores(predictions, references, processes=None, chunksize=8):
+    pairs = list(zip(predictions, references))
+    if processes == 1 or len(pairs) <= chunksize:
+        return [_rouge_pair(pair) for pair in pairs]
+    with Pool(processes) as pool:
+        return pool.map(_rouge_pair, pairs, chunksize=chunksize)
+
+_bert_scorer = None
+_reference_embeddings = {}
+
+def get_bert_scorer(batch_size=BERTSCORE_BATCH_SIZE):
+    # One model for the life of the process instead of one per bert_score.score call
+    global _bert_scorer
+    from bert_score import BERTScorer
+
+    if _bert_scorer is None:
+        _bert_scorer = BERTScorer(lang=BERTSCORE_LANG, batch_size=batch_size)
+    return _bert_scorer
+
+def _embed(scorer, sentences, batch_size, cache):
+    from bert_score.utils import get_bert_embedding
+
+    idf_dict = defaultdict(lambda: 1.0)
+    idf_dict[scorer._tokenizer.sep_token_id] = 0
+    idf_dict[scorer._tokenizer.cls_token_id] = 0
+
+    # Longest first, as bert_score does, so each batch pads to similar lengths
+    missing = sorted({s for s in sentences if s not in cache}, key=lambda s: len(s.split(" ")), reverse=True)
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        embeddings, masks, padded_idf = get_bert_embedding(batch, scorer._model, scorer._tokenizer, idf_dict, device=scorer.device)
+        embeddings, masks, padded_idf = embeddings.cpu(), masks.cpu(), padded_idf.cpu()
+        for i, sentence in enumerate(batch):
+            length = int(masks[i].sum().item())
+            cache[sentence] = (embeddings[i, :length], padded_idf[i, :length])
+    return cache
+
+def _pad(stats, device):
+    import torch
+    from torch.nn.utils.rnn import pad_sequence
+
+    embeddings = [embedding.to(device) for embedding, _ in stats]
+    idf = [weights.to(device) for _, weights in stats]
+    lengths = torch.tensor([embedding.size(0) for embedding in embeddings])
+    mask = torch.arange(int(lengths.max())).expand(len(lengths), -1) < lengths.unsqueeze(1)
+    return pad_sequence(embeddings, batch_first=True, padding_value=2.0), mask.to(device), pad_sequence(idf, batch_first=True)
+
+def bertscore_f1(predictions, references, batch_size=BERTSCORE_BATCH_SIZE):
+    # Equivalent to bert_score.score(predictions, references, lang="en"), with reference
+    # embeddings kept for the rest of the process
+    import torch
+    from bert_score.utils import greedy_cos_idf
+
+    scorer = get_bert_scorer(batch_size)
+    _embed(scorer, references, batch_size, _reference_embeddings)
+    hypotheses = _embed(scorer, predictions, batch_size, {})
+
+    f1 = []
+    with torch.no_grad():
+        for start in range(0, len(references), batch_size):
+            ref_stats = _pad([_reference_embeddings[r] for r in references[start:start + batch_size]], scorer.device)
+            hyp_stats = _pad([hypotheses[p] for p in predictions[start:start + batch_size]], scorer.device)
+            _, _, F = greedy_cos_idf(*ref_stats, *hyp_stats)
+            f1.extend(F.cpu().tolist())
+    return f1
+
+def pair_key(prediction, reference):
+    return hashlib.sha256(f"{prediction}\n\0\n{reference}".encode("utf-8")).hexdigest()[:16]
+
+def load_results(results_path):
+    results = {}
+    if results_path and os.path.exists(results_path):
+        with open(results_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    # Partial last line from an interrupted run
+                    continue
+                results[row["doc_id"]] = row
+    return results
+
+def evaluate(predictions, references, results_path=None, doc_ids=None, bertscore=True,
+             processes=None, batch_size=BERTSCORE_BATCH_SIZE):
+    if len(predictions) != len(references):
+        raise ValueError(f"Prediction and reference count mismatch: {len(predictions)} vs {len(references)}")
+    doc_ids = list(doc_ids) if doc_ids is not None else list(range(len(predictions)))
+    metrics = ROUGE_TYPES + (["bertscore_f1"] if bertscore else [])
+
+    results = load_results(results_path)
+    pending = [
+        i for i, doc_id in enumerate(doc_ids)
+        if doc_id not in results
+        or results[doc_id]["key"] != pair_key(predictions[i], references[i])
+        or any(metric not in results[doc_id] for metric in metrics)
+    ]
+    print(f"Scoring {len(pending)} of {len(doc_ids)} docs ({len(doc_ids) - len(pending)} from {results_path}).")
+
+    if pending:
+        pending_predictions = [predictions[i] for i in pending]
+        pending_references = [references[i] for i in pending]
+        rows = rouge_scores(pending_predictions, pending_references, processes)
+        if bertscore:
+            for row, f1 in zip(rows, bertscore_f1(pending_predictions, pending_references, batch_size)):
+                row["bertscore_f1"] = f1
+        for i, row in zip(pending, rows):
+            results[doc_ids[i]] = {"doc_id": doc_ids[i], "key": pair_key(predictions[i], references[i]), **row}
+        if results_path:
+            with open(results_path, "a", encoding="utf-8") as f:
+                for i in pending:
+                    f.write(json.dumps(results[doc_ids[i]]) + "\n")
+
+    n = len(doc_ids)
+    return {metric: sum(results[doc_id][metric] for doc_id in doc_ids) / n for metric in metrics} if n else {}
+
+def print_scores(averages):
+    print(f"\nAverage ROUGE-1 F1: {averages['rouge1']:.4f}")
+    print(f"Average ROUGE-2 F1: {averages['rouge2']:.4f}")
+    print(f"Average ROUGE-L F1: {averages['rougeL']:.4f}")
+    if "bertscore_f1" in averages:
+        print("Average BERTScore F1:", averages["bertscore_f1"])
@@ -1,45 +1,21 @@
+import os
 import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from corpus import open_corpus
 
 # balances the number of positive and negative labels in the dataset
 def balance_source_and_labels(source_path, labels_path, output_source_path, output_labels_path):
     random.seed(42)
 
-    source_docs = []
-    current_doc = []
-
-    with open(source_path, encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line == "":
-                if current_doc:
-                    source_docs.append(current_doc)
-                    current_doc = []
-            else:
-                current_doc.append(line)
-
-    if current_doc:
-        source_docs.append(current_doc)
-
-    label_docs = []
-    with open(labels_path, encoding="utf-8") as f:
-        for line in f:
-            nums = line.strip().split()
-            nums = [int(x) for x in nums]
-            label_docs.append(nums)
-
-
-    if len(source_docs) != len(label_docs):
-        raise ValueError(f"Number of docs mismatch: {str(len(source_docs))} source docs vs {str(len(label_docs))} label docs.")
+    corpus = open_corpus(source_path, labels_path)
 
     balanced_sources = []
     balanced_labels = []
 
-    for i in range(len(source_docs)):
-        sentences = source_docs[i]
-        labels = label_docs[i]
-
-        if len(sentences) != len(labels):
-            raise Exception(f"Mismatch: {str(len(sentences))} sentences vs {str(len(labels))} labels.")
+    for sentences, labels in corpus:
+        labels = labels.tolist()
 
         pos_indices = []
         neg_indices = []
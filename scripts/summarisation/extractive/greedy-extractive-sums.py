@@ -1,20 +1,85 @@
+import argparse
 import os
+import json
+import time
+import heapq
+import hashlib
 import nltk
+from collections import Counter
 from nltk.tokenize import sent_tokenize
-from rouge_score import rouge_scorer
-from concurrent.futures import ProcessPoolExecutor
+from rouge_score import rouge_scorer, scoring
+from multiprocessing import Pool
 
 nltk.download('punkt')
 
-MAX_DOC_SENTENCES = 200  # max doc length for oracle generation
+parser = argparse.ArgumentParser(description="Greedy ROUGE-1 oracle labels for a EUR-Lex-Sum split.")
+parser.add_argument("split", nargs="?", default="val")
+parser.add_argument("--search", choices=["exact", "lazy"], default="exact",
+                    help="exact greedy (the reference labels) or lazy greedy, which is faster and keeps long docs "
+                         "but may pick different sentences; lazy runs always report how often it differs")
+parser.add_argument("--verify", action="store_true", help="Check the incremental ROUGE-1 against rouge_score first")
+ARGS = parser.parse_args()
+SPLIT = ARGS.split
+VERIFY = ARGS.verify
+RAW_DIR = "./data/eur-lexsum/raw-data"
+PROCESSED_DIR = "./data/eur-lexsum/processed-data"
+PROCESSES = os.cpu_count()
+CHUNKSIZE = 4  # docs per task; docs are scheduled longest first so chunks stay balanced
+PROGRESS_EVERY = 100
+
+SEARCH_MODE = ARGS.search  # "exact" or "lazy" (priority queue) greedy search
+MAX_DOC_SENTENCES = None if SEARCH_MODE == "lazy" else 200  # max doc length for exact oracle generation
+COMPARE_SAMPLE = 200  # docs used to report how often lazy and exact greedy disagree
 
 def get_trigrams(text):
     words = text.split()
     return set(zip(words, words[1:], words[2:]))
 
+# Tracks ROUGE-1 between the target and a growing selection from stemmed unigram counts.
+# Tokens come from the RougeScorer's own tokenizer, and tokenizing sentences separately gives
+# the same tokens as tokenizing them joined with spaces, so scores match rouge_score exactly.
+class IncrementalRouge1:
+    def __init__(self, source_sentences, target_summary, scorer=None):
+        scorer = scorer or rouge_scorer.RougeScorer(['rouge1'], use_stemmer=True)
+        tokenize = scorer._tokenizer.tokenize
+        self.target_counts = Counter(tokenize(target_summary))
+        self.target_total = sum(self.target_counts.values())
+        # Only tokens that appear in the target can change the overlap
+        self.sentence_counts = []
+        self.sentence_totals = []
+        for sentence in source_sentences:
+            counts = Counter(tokenize(sentence))
+            self.sentence_totals.append(sum(counts.values()))
+            self.sentence_counts.append({t: c for t, c in counts.items() if t in self.target_counts})
+        self.selected_counts = Counter()
+        self.selected_total = 0
+        self.overlap = 0
+
+    def overlap_with(self, index):
+        overlap = self.overlap
+        for token, count in self.sentence_counts[index].items():
+            target = self.target_counts[token]
+            current = self.selected_counts[token]
+            overlap += min(current + count, target) - min(current, target)
+        return overlap
+
+    def fmeasure(self, overlap, prediction_total):
+        precision = overlap / max(prediction_total, 1)
+        recall = overlap / max(self.target_total, 1)
+        return scoring.fmeasure(precision, recall)
+
+    def score_with(self, index):
+        return self.fmeasure(self.overlap_with(index), self.selected_total + self.sentence_totals[index])
+
+    def add(self, index):
+        self.overlap = self.overlap_with(index)
+        self.selected_total += self.sentence_totals[index]
+        self.selected_counts.update(self.sentence_counts[index])
+
 # Creates a golden extractive summary using a greedy algorithm which maximises ROUGE-1 score
 def greedy_extractive_summary(source_sentences, target_summary, max_sentences=32, trigram_blocking=True):
-    scorer = rouge_scorer.RougeScorer(['rouge1'], use_stemmer=True)
+    rouge = IncrementalRouge1(source_sentences, target_summary)
+    sentence_trigrams = [get_trigrams(sentence) for sentence in source_sentences] if trigram_blocking else None
     selected = []
     selected_set = set()
     selected_trigrams = set()
@@ -25,15 +90,14 @@ def greedy_extractive_summary(source_sentences, target_summary, max_sentences=32
         best_index = None
         best_score = current_best_score
 
-        for index, sentence in enumerate(source_sentences):
+        for index in range(len(source_sentences)):
             if index in selected_set:
                 continue
 
-            if trigram_blocking and (get_trigrams(sentence) & selected_trigrams):
+            if trigram_blocking and (sentence_trigrams[index] & selected_trigrams):
                 continue
 
-            candidate_summary = ' '.join(selected + [sentence])
-            score = scorer.score(target_summary, candidate_summary)['rouge1'].fmeasure
+            score = rouge.score_with(index)
             gain = score - current_best_score
 
             if gain > best_gain:
@@ -46,107 +110,237 @@ def greedy_extractive_summary(source_sentences, target_summary, max_sentences=32
 
         selected_set.add(best_index)
         selected.append(source_sentences[best_index])
-        selected_trigrams.update(get_trigrams(source_sentences[best_index]))
+        rouge.add(best_index)
+        if trigram_blocking:
+            selected_trigrams.update(sentence_trigrams[best_index])
         current_best_score = best_score
 
     binary_labels = [1 if i in selected_set else 0 for i in range(len(source_sentences))]
     return selected, current_best_score, binary_labels
 
-def process_doc(args):
-    source, target = args
-    return greedy_extractive_summary(source, target)
-
-def process_batch(batch_sources, batch_targets, batch):
-    inputs = [(src, tgt) for src, tgt in zip(batch_sources, batch_targets)]
-
-    all_oracle_summaries = []
-    all_binary_labels = []
-    total_rouge = 0.0
+# Lazy greedy: ROUGE-1 gains are close to submodular, so a candidate's gain from an earlier step
+# is treated as an upper bound. Only the top of the heap is re-scored, and it is selected once its
+# fresh gain still beats every stale bound. Ties go to the lowest index, as in exact greedy.
+def lazy_greedy_extractive_summary(source_sentences, target_summary, max_sentences=32, trigram_blocking=True):
+    rouge = IncrementalRouge1(source_sentences, target_summary)
+    sentence_trigrams = [get_trigrams(sentence) for sentence in source_sentences] if trigram_blocking else None
+    selected = []
+    selected_set = set()
+    selected_trigrams = set()
+    current_best_score = 0.0
 
-    with ProcessPoolExecutor(max_workers=2) as executor:
-        futures = [executor.submit(process_doc, item) for item in inputs]
-        results = []
-        for i, future in enumerate(futures):
-            results.append(future.result())
-            print(f"Processed {i+1}/{len(futures)} items")
+    heap = [(-rouge.score_with(index), index, 0) for index in range(len(source_sentences))]
+    heapq.heapify(heap)
 
-    for selected, score, binary_labels in results:
-        all_oracle_summaries.append(selected)
-        all_binary_labels.append(binary_labels)
-        total_rouge += score
+    for step in range(max_sentences):
+        best_index = None
+        while heap:
+            neg_gain, index, scored_at = heapq.heappop(heap)
+            # The selected trigram set only grows, so a blocked sentence stays blocked
+            if trigram_blocking and (sentence_trigrams[index] & selected_trigrams):
+                continue
+            if scored_at == step:
+                if -neg_gain > 0:
+                    best_index = index
+                break
+            gain = rouge.score_with(index) - current_best_score
+            heapq.heappush(heap, (-gain, index, step))
+
+        if best_index is None:
+            break
 
-    avg_rouge = total_rouge / len(results)
-    print(f"Batch {batch} Average ROUGE-1: {avg_rouge:.4f}")
+        selected_set.add(best_index)
+        selected.append(source_sentences[best_index])
+        rouge.add(best_index)
+        if trigram_blocking:
+            selected_trigrams.update(sentence_trigrams[best_index])
+        current_best_score = rouge.fmeasure(rouge.overlap, rouge.selected_total)
 
-    with open(f"./data/eur-lexsum/processed-data/val-oracle_summaries_batch_{batch}.txt", "w", encoding="utf-8") as f:
-        for summary in all_oracle_summaries:
-            f.write("\n".join(summary) + "\n===\n")
+    binary_labels = [1 if i in selected_set else 0 for i in range(len(source_sentences))]
+    return selected, current_best_score, binary_labels
 
-    with open(f"./data/eur-lexsum/processed-data/val-oracle_labels_batch_{batch}.txt", "w", encoding="utf-8") as f:
-        for labels in all_binary_labels:
-            f.write(" ".join(str(label) for label in labels) + "\n")
+def compare_doc(args):
+    source, target = args
+    _, exact_score, exact_labels = greedy_extractive_summary(source, target)
+    _, lazy_score, lazy_labels = lazy_greedy_extractive_summary(source, target)
+    return exact_labels != lazy_labels, exact_score - lazy_score
+
+# Reports how often lazy greedy picks a different oracle from exact greedy, on docs spread
+# evenly over the split
+def compare_search_modes(pool, source_docs, target_summaries, sample=COMPARE_SAMPLE):
+    pairs = list(zip(source_docs, target_summaries))
+    pairs = pairs[::max(1, len(pairs) // sample)][:sample]
+    results = pool.map(compare_doc, pairs, chunksize=CHUNKSIZE)
+    differing = sum(differs for differs, _ in results)
+    score_delta = sum(delta for _, delta in results)
+    print(f"Lazy vs exact greedy: {differing}/{len(pairs)} docs differ, "
+          f"mean ROUGE-1 loss {score_delta / max(len(pairs), 1):.5f}")
+    return differing, len(pairs)
+
+# Spot-checks the incremental scorer against RougeScorer.score on real documents
+def verify_incremental_rouge(source_docs, target_summaries, sample=20):
+    scorer = rouge_scorer.RougeScorer(['rouge1'], use_stemmer=True)
+    for source, target in list(zip(source_docs, target_summaries))[:sample]:
+        selected, score, _ = greedy_extractive_summary(source, target)
+        expected = scorer.score(target, ' '.join(selected))['rouge1'].fmeasure if selected else 0.0
+        if score != expected:
+            raise AssertionError(f"Incremental ROUGE-1 {score} does not match rouge_score {expected}")
+        rouge = IncrementalRouge1(source, target)
+        for index, sentence in enumerate(source):
+            if rouge.score_with(index) != scorer.score(target, sentence)['rouge1'].fmeasure:
+                raise AssertionError(f"Incremental ROUGE-1 mismatch for sentence {index}")
 
-    return avg_rouge
+def process_doc(args):
+    index, source, target = args
+    if SEARCH_MODE == "lazy":
+        selected, score, binary_labels = lazy_greedy_extractive_summary(source, target)
+    else:
+        selected, score, binary_labels = greedy_extractive_summary(source, target)
+    return {"index": index, "selected": selected, "score": score, "labels": binary_labels}
+
+def split_sentences(line):
+    return sent_tokenize(line.strip(), language='english')
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Everything that decides which docs are kept and what their oracle is; checkpoint records are
+# keyed by position in the filtered list, so they are only valid for the same fingerprint
+def checkpoint_fingerprint(source_path, target_path):
+    return {
+        "search_mode": SEARCH_MODE,
+        "max_doc_sentences": MAX_DOC_SENTENCES,
+        "source_sha256": file_hash(source_path),
+        "target_sha256": file_hash(target_path),
+    }
+
+# Loads finished docs from the append-only checkpoint. A crash can leave a partial last line,
+# which is cut off so the next append starts on a clean line.
+def load_checkpoint(path, fingerprint):
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    lines = data[:end].decode("utf-8").splitlines()
+    if not lines:
+        return done
+    header = json.loads(lines[0])
+    if header.get("fingerprint") != fingerprint:
+        raise SystemExit(
+            f"Checkpoint {path} was written for {header.get('fingerprint')}, not {fingerprint}; "
+            "delete it to start over with the current inputs and settings.")
+    for line in lines[1:]:
+        record = json.loads(line)
+        done[record["index"]] = record
+    return done
+
+def generate_oracles(pool, sources, targets, checkpoint_path, fingerprint):
+    done = load_checkpoint(checkpoint_path, fingerprint)
+    pending = [(i, sources[i], targets[i]) for i in range(len(sources)) if i not in done]
+    pending.sort(key=lambda item: len(item[1]), reverse=True)
+    print(f"Resuming with {len(done)} docs done, {len(pending)} to go")
+
+    start = time.time()
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        if checkpoint.tell() == 0:
+            checkpoint.write(json.dumps({"fingerprint": fingerprint}) + "\n")
+        for count, record in enumerate(pool.imap_unordered(process_doc, pending, chunksize=CHUNKSIZE), 1):
+            checkpoint.write(json.dumps(record) + "\n")
+            checkpoint.flush()
+            done[record["index"]] = record
+            if count % PROGRESS_EVERY == 0 or count == len(pending):
+                rate = count / (time.time() - start)
+                eta = (len(pending) - count) / rate
+                print(f"Processed {count}/{len(pending)} docs, {rate:.2f} docs/s, ETA {eta / 60:.1f} min")
+
+    return [done[i] for i in range(len(sources))]
+
+def write_outputs(records, summaries_path, labels_path):
+    with open(summaries_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write("\n".join(record["selected"]) + "\n===\n")
+
+    with open(labels_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(" ".join(str(label) for label in record["labels"]) + "\n")
 
 if __name__ == "__main__":
-    with open("./data/eur-lexsum/raw-data/val.source", encoding="utf-8") as f:
+    source_path = f"{RAW_DIR}/{SPLIT}.source"
+    target_path = f"{RAW_DIR}/{SPLIT}.target"
+    with open(source_path, encoding="utf-8") as f:
         lines = f.readlines()
-    source_docs = [sent_tokenize(line.strip(), language='english') for line in lines]
 
-    with open("./data/eur-lexsum/raw-data/val.target", encoding="utf-8") as f:
+    with open(target_path, encoding="utf-8") as f:
         target_summaries = [line.strip() for line in f]
 
-    filtered_sources = []
-    filtered_targets = []
-    skipped_sources = []
-    skipped_targets = []
-
-    for source, target in zip(source_docs, target_summaries):
-        if len(source) <= MAX_DOC_SENTENCES:
-            filtered_sources.append(source)
-            filtered_targets.append(target)
-        else:
-            skipped_sources.append(source)
-            skipped_targets.append(target)
-
-    print(f"Kept {len(filtered_sources)} / {len(source_docs)} docs")
-    print(f"Skipped {len(skipped_sources)} docs")
-
-    # Save skipped docs for reference
-    with open("./data/eur-lexsum/raw-data/skipped-val.source", "w", encoding="utf-8") as f:
-        for doc in skipped_sources:
-            for sent in doc:
-                f.write(sent.strip() + "\n")
-            f.write("\n")
-    with open("./data/eur-lexsum/raw-data/skipped-val.target", "w", encoding="utf-8") as f:
-        for tgt in skipped_targets:
-            f.write(tgt.strip() + "\n")
-
-    # Save filtered docs for oracle generation
-    with open("./data/eur-lexsum/processed-data/filtered-val.source", "w", encoding="utf-8") as f:
-        for doc in filtered_sources:
-            for sent in doc:
-                f.write(sent.strip() + "\n")
-            f.write("\n")
-
-    with open("./data/eur-lexsum/processed-data/filtered-val.target", "w", encoding="utf-8") as f:
-        for tgt in filtered_targets:
-            f.write(tgt.strip() + "\n")
-
-    batch_size = 300
-    num_batches = (len(filtered_sources) + batch_size - 1) // batch_size
-
-    overall_rouge = 0.0
-
-    for batch in range(num_batches):
-        start = batch * batch_size
-        end = min((batch + 1) * batch_size, len(filtered_sources))
-
-        batch_sources = filtered_sources[start:end]
-        batch_targets = filtered_targets[start:end]
-
-        avg_rouge = process_batch(batch_sources, batch_targets, batch)
-        overall_rouge += avg_rouge * len(batch_sources)
-
-    overall_rouge /= len(filtered_sources)
-    print(f"Overall average ROUGE-1: {overall_rouge:.4f}")
\ No newline at end of file
+    with Pool(PROCESSES) as pool:
+        source_docs = pool.map(split_sentences, lines, chunksize=64)
+
+        filtered_sources = []
+        filtered_targets = []
+        skipped_sources = []
+        skipped_targets = []
+
+        for source, target in zip(source_docs, target_summaries):
+            if MAX_DOC_SENTENCES is None or len(source) <= MAX_DOC_SENTENCES:
+                filtered_sources.append(source)
+                filtered_targets.append(target)
+            else:
+                skipped_sources.append(source)
+                skipped_targets.append(target)
+
+        if VERIFY:
+            verify_incremental_rouge(filtered_sources, filtered_targets)
+        if SEARCH_MODE == "lazy":
+            # Lazy labels are approximate; always show how far they are from the exact ones
+            compare_search_modes(pool, filtered_sources, filtered_targets)
+
+        print(f"Kept {len(filtered_sources)} / {len(source_docs)} docs")
+        print(f"Skipped {len(skipped_sources)} docs")
+
+        # Save skipped docs for reference
+        with open(f"{RAW_DIR}/skipped-{SPLIT}.source", "w", encoding="utf-8") as f:
+            for doc in skipped_sources:
+                for sent in doc:
+                    f.write(sent.strip() + "\n")
+                f.write("\n")
+        with open(f"{RAW_DIR}/skipped-{SPLIT}.target", "w", encoding="utf-8") as f:
+            for tgt in skipped_targets:
+                f.write(tgt.strip() + "\n")
+
+        # Save filtered docs for oracle generation
+        with open(f"{PROCESSED_DIR}/filtered-{SPLIT}.source", "w", encoding="utf-8") as f:
+            for doc in filtered_sources:
+                for sent in doc:
+                    f.write(sent.strip() + "\n")
+                f.write("\n")
+
+        with open(f"{PROCESSED_DIR}/filtered-{SPLIT}.target", "w", encoding="utf-8") as f:
+            for tgt in filtered_targets:
+                f.write(tgt.strip() + "\n")
+
+        records = generate_oracles(
+            pool, filtered_sources, filtered_targets,
+            f"{PROCESSED_DIR}/{SPLIT}-oracle_checkpoint.jsonl",
+            checkpoint_fingerprint(source_path, target_path)
+        )
+
+    write_outputs(
+        records,
+        f"{PROCESSED_DIR}/{SPLIT}-oracle_summaries_merged.txt",
+        f"{PROCESSED_DIR}/{SPLIT}-oracle_labels_merged.txt"
+    )
+
+    if records:
+        overall_rouge = sum(record["score"] for record in records) / len(records)
+        print(f"Overall average ROUGE-1: {overall_rouge:.4f}")
+    else:
+        print(f"No docs in the {SPLIT} split were kept; nothing to score.")
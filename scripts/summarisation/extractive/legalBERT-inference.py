@@ -1,35 +1,16 @@
-import torch
-from transformers import BertTokenizer, BertForSequenceClassification
-from rouge_score import rouge_scorer
 import nltk
+import os
+import sys
 
-nltk.download('punkt')
-
-DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from evaluation import evaluate, print_scores
+from inference_runner import run_inference, write_predictions
 
-# Load model & tokenizer
-model_path = "./models/legalBERT" 
-model = BertForSequenceClassification.from_pretrained(model_path)
-tokenizer = BertTokenizer.from_pretrained(model_path)
-model.to(DEVICE)
-model.eval()
-
-# Load filtered source docs
-source_docs = []
-current_doc = []
-with open("./data/eur-lexsum/processed-data/val-textrank_train.source", encoding="utf-8") as f:
-    for line in f:
-        line = line.strip()
-        if line == "":
-            if current_doc:
-                source_docs.append(current_doc)
-                current_doc = []
-        else:
-            current_doc.append(line)
-if current_doc:
-    source_docs.append(current_doc)
+nltk.download('punkt')
 
-print(f"Loaded {len(source_docs)} docs for inference.")
+model_path = "./models/legalBERT"
+source_path = "./data/eur-lexsum/processed-data/val-textrank_train.source"
+output_dir = "./data/eur-lexsum/processed-data/val-legalbert_inference"
 
 # Load initial target summaries
 target_summaries = []
@@ -37,67 +18,23 @@ with open("./data/eur-lexsum/processed-data/filtered-val.target", encoding="utf-
     for line in f:
         target_summaries.append(line.strip())
 
-assert len(target_summaries) == len(source_docs), "Target and source count mismatch"
-
-# Inference 
-predictions = []
-extracted_summaries = []
-
-for doc_idx, sentences in enumerate(source_docs):
-    doc_preds = []
-    for sent in sentences:
-        inputs = tokenizer(sent, truncation=True, padding=True, return_tensors="pt").to(DEVICE)
-        with torch.no_grad():
-            outputs = model(**inputs)
-            logits = outputs.logits  
-            pred = torch.argmax(logits, dim=1).item()  
-        doc_preds.append(pred)
-    predictions.append(doc_preds)
-
-    # Build extractive summary
-    selected_sents = [s for s, l in zip(sentences, doc_preds) if l == 1]
-    extracted_summaries.append(" ".join(selected_sents))
+# Batched inference; logits and probabilities are kept in output_dir for threshold tuning
+logits, probs, offsets = run_inference(model_path, source_path, output_dir)
 
-    print(f"Doc {doc_idx+1}/{len(source_docs)} done.")
+assert len(target_summaries) == len(offsets) - 1, "Target and source count mismatch"
 
-# Save predictions
-with open("./data/eur-lexsum/processed-data/val-legalbert_preds.txt", "w", encoding="utf-8") as f:
-    for doc in predictions:
-        f.write(" ".join(map(str, doc)) + "\n")
-
-with open("./data/eur-lexsum/processed-data/val-legalbert_summaries.txt", "w", encoding="utf-8") as f:
-    for summary in extracted_summaries:
-        f.write(summary.strip() + "\n===\n")
+extracted_summaries = write_predictions(
+    source_path,
+    output_dir,
+    "./data/eur-lexsum/processed-data/val-legalbert_preds.txt",
+    "./data/eur-lexsum/processed-data/val-legalbert_summaries.txt",
+)
 
 print("Inference done. Predictions & summaries saved.")
 
-# Compute ROUGE scores
-scorer = rouge_scorer.RougeScorer(['rouge1', 'rouge2', 'rougeL'], use_stemmer=True)
-
-total_rouge1 = 0.0
-total_rouge2 = 0.0
-total_rougeL = 0.0
-
-for pred_sum, gold_sum in zip(extracted_summaries, target_summaries):
-    scores = scorer.score(gold_sum, pred_sum)
-    total_rouge1 += scores['rouge1'].fmeasure
-    total_rouge2 += scores['rouge2'].fmeasure
-    total_rougeL += scores['rougeL'].fmeasure
-
-n = len(extracted_summaries)
-avg_rouge1 = total_rouge1 / n
-avg_rouge2 = total_rouge2 / n
-avg_rougeL = total_rougeL / n
-
-print(f"\nAverage ROUGE-1 F1: {avg_rouge1:.4f}")
-print(f"Average ROUGE-2 F1: {avg_rouge2:.4f}")
-print(f"Average ROUGE-L F1: {avg_rougeL:.4f}")
-
-from bert_score import score
-
-P, R, F1 = score(extracted_summaries, target_summaries, lang="en", verbose=True)
-
-print("Average BERTScore F1:", F1.mean().item())
+# ROUGE and BERTScore; per-doc scores are kept so re-runs only score new docs
+averages = evaluate(extracted_summaries, target_summaries, results_path="./data/eur-lexsum/processed-data/val-legalbert_summaries_scores.jsonl")
+print_scores(averages)
 
 '''
 Average ROUGE-1 F1: 0.4691
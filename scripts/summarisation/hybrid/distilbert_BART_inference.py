@@ -11,8 +11,10 @@ from transformers import (
     BertForSequenceClassification,
     pipeline
 )
-from rouge_score import rouge_scorer
-from bert_score import score
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from evaluation import evaluate, print_scores
 
 nltk.download("punkt")
 nlp = spacy.load("en_core_web_sm", disable=["ner", "lemmatizer"])
@@ -85,22 +87,8 @@ def bart_summarise(text):
         return f"FAILED: {str(e)}"
 
 # Evaluate summaries using ROUGE and BERTScore
-def evaluate_summaries(preds, refs):
-    scorer = rouge_scorer.RougeScorer(["rouge1", "rouge2", "rougeL"], use_stemmer=True)
-    total_r1 = total_r2 = total_rl = 0.0
-    for pred, ref in zip(preds, refs):
-        scores = scorer.score(ref, pred)
-        total_r1 += scores["rouge1"].fmeasure
-        total_r2 += scores["rouge2"].fmeasure
-        total_rl += scores["rougeL"].fmeasure
-
-    n = len(preds)
-    print(f"\nAverage ROUGE-1 F1: {total_r1 / n:.4f}")
-    print(f"Average ROUGE-2 F1: {total_r2 / n:.4f}")
-    print(f"Average ROUGE-L F1: {total_rl / n:.4f}")
-
-    P, R, F1 = score(preds, refs, lang="en", verbose=True)
-    print("Average BERTScore F1:", F1.mean().item())
+def evaluate_summaries(preds, refs, results_path=None):
+    print_scores(evaluate(preds, refs, results_path=results_path))
 
 if __name__ == "__main__":
     with open("./data/eur-lexsum/raw-data/val.source", encoding="utf-8") as f:
@@ -137,4 +125,4 @@ if __name__ == "__main__":
         for s in generated_summaries:
             f.write(s + "\n===\n")
 
-    evaluate_summaries(generated_summaries, target_summaries)
+    evaluate_summaries(generated_summaries, target_summaries, "./data/eur-lexsum/processed-data/v2-distilbert_bart_abstractive_scores.jsonl")
@@ -3,11 +3,15 @@ import re
 import numpy as np
 from transformers import AutoTokenizer, AutoModel
 from nltk.tokenize import sent_tokenize
-from rouge_score import rouge_scorer
 from langchain_ollama import OllamaLLM
 import subprocess
 import time
 import requests
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from evaluation import evaluate, get_rouge_scorer, print_scores
 
 nlp = spacy.load("en_core_web_sm", disable=["ner", "lemmatizer"])
 
@@ -104,8 +108,7 @@ SUMMARY:
         return f"Error: {str(e)}"
 
 def evaluate_summary(generated, reference):
-    scorer = rouge_scorer.RougeScorer(["rouge1", "rouge2", "rougeL"], use_stemmer=True)
-    scores = scorer.score(reference, generated)
+    scores = get_rouge_scorer().score(reference, generated)
     return scores
 
 if __name__ == "__main__":
@@ -149,33 +152,9 @@ if __name__ == "__main__":
         for summary in generated_summaries:
             f.write(summary.strip() + "\n===\n")
 
-    # Compute ROUGE scores
-    scorer = rouge_scorer.RougeScorer(['rouge1', 'rouge2', 'rougeL'], use_stemmer=True)
-
-    total_rouge1 = 0.0
-    total_rouge2 = 0.0
-    total_rougeL = 0.0
-
-    for pred_sum, gold_sum in zip(generated_summaries, target_summaries):
-        scores = scorer.score(gold_sum, pred_sum)
-        total_rouge1 += scores['rouge1'].fmeasure
-        total_rouge2 += scores['rouge2'].fmeasure
-        total_rougeL += scores['rougeL'].fmeasure
-
-    n = len(generated_summaries)
-    avg_rouge1 = total_rouge1 / n
-    avg_rouge2 = total_rouge2 / n
-    avg_rougeL = total_rougeL / n
-
-    print(f"\nAverage ROUGE-1 F1: {avg_rouge1:.4f}")
-    print(f"Average ROUGE-2 F1: {avg_rouge2:.4f}")
-    print(f"Average ROUGE-L F1: {avg_rougeL:.4f}")
-
-    from bert_score import score
-
-    P, R, F1 = score(generated_summaries, target_summaries, lang="en", verbose=True)
-
-    print("Average BERTScore F1:", F1.mean().item())
+    # ROUGE and BERTScore; per-doc scores are kept so re-runs only score new docs
+    averages = evaluate(generated_summaries, target_summaries, results_path="./data/eur-lexsum/processed-data/v2-legalBERT_llama_summaries2_scores.jsonl")
+    print_scores(averages)
     
 '''
 Average ROUGE-1 F1: 0.3267
@@ -7,10 +7,13 @@ import time
 import requests
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 from nltk.tokenize import sent_tokenize
-from rouge_score import rouge_scorer
 from langchain_ollama import OllamaLLM
-from sklearn.feature_extraction.text import TfidfVectorizer
-import networkx as nx
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from evaluation import evaluate, print_scores
+from textrank_engine import textrank_keep, textrank_keep_many
 
 nlp = spacy.load("en_core_web_sm", disable=["ner", "lemmatizer"])
 
@@ -115,19 +118,21 @@ SUMMARY:
         return f"Error: {str(e)}"
 
 
-def textrank_filter(text, keep_ratio=0.75):
+def textrank_filter(text, keep_ratio=0.75, vectorizer=None, top_k=None):
     sentences = sent_tokenize(text)
     if len(sentences) <= 2:
         return text  # tiny doc, keep all
-    tfidf = TfidfVectorizer().fit_transform(sentences)
-    sim_matrix = (tfidf * tfidf.T).toarray()
-    nx_graph = nx.from_numpy_array(sim_matrix)
-    scores = nx.pagerank(nx_graph)
-    ranked_indices = sorted(scores, key=scores.get, reverse=True)
-    keep_n = max(1, int(len(sentences) * keep_ratio))
-    keep_indices = sorted(ranked_indices[:keep_n])
-    filtered_sentences = [sentences[i] for i in keep_indices]
-    return " ".join(filtered_sentences)
+    keep_indices = textrank_keep(sentences, keep_ratio, vectorizer, top_k)
+    return " ".join(sentences[i] for i in keep_indices)
+
+
+def textrank_filter_many(texts, keep_ratio=0.75, vectorizer=None, top_k=None, processes=None):
+    sentence_docs = [sent_tokenize(text) for text in texts]
+    kept = textrank_keep_many(sentence_docs, keep_ratio, vectorizer, top_k, processes)
+    return [
+        text if len(sentences) <= 2 else " ".join(sentences[i] for i in keep_indices)
+        for text, sentences, keep_indices in zip(texts, sentence_docs, kept)
+    ]
 
 
 if __name__ == "__main__":
@@ -151,10 +156,13 @@ if __name__ == "__main__":
     target_summaries = target_summaries[:100]
     generated_summaries = []
 
+    # TextRank for every doc up front across processes; the loop below is bound by the LLM
+    filtered_texts = textrank_filter_many(source_docs, keep_ratio=0.75)
+
     for doc_idx, document in enumerate(source_docs):
         print(f"\nProcessing document {doc_idx + 1}/{len(source_docs)}")
 
-        filtered_text = textrank_filter(document, keep_ratio=0.75)
+        filtered_text = filtered_texts[doc_idx]
 
         chunks = preprocess_eurlex(filtered_text, chunk_size=1500)
 
@@ -172,23 +180,7 @@ if __name__ == "__main__":
         for summary in generated_summaries:
             f.write(summary.strip() + "\n===\n")
 
-    # Compute ROUGE scores
-    scorer = rouge_scorer.RougeScorer(['rouge1', 'rouge2', 'rougeL'], use_stemmer=True)
-    total_rouge1 = total_rouge2 = total_rougeL = 0.0
-
-    for pred_sum, gold_sum in zip(generated_summaries, target_summaries):
-        scores = scorer.score(gold_sum, pred_sum)
-        total_rouge1 += scores['rouge1'].fmeasure
-        total_rouge2 += scores['rouge2'].fmeasure
-        total_rougeL += scores['rougeL'].fmeasure
-
-    n = len(generated_summaries)
-    print(f"\nAverage ROUGE-1 F1: {total_rouge1 / n:.4f}")
-    print(f"Average ROUGE-2 F1: {total_rouge2 / n:.4f}")
-    print(f"Average ROUGE-L F1: {total_rougeL / n:.4f}")
-
-    # Compute BERTScore
-    from bert_score import score
-    P, R, F1 = score(generated_summaries, target_summaries, lang="en", verbose=True)
-    print("Average BERTScore F1:", F1.mean().item())
+    # ROUGE and BERTScore; per-doc scores are kept so re-runs only score new docs
+    averages = evaluate(generated_summaries, target_summaries, results_path="./data/eur-lexsum/processed-data/ft-textrank_legalBERT_llama_summaries_scores.jsonl")
+    print_scores(averages)
 
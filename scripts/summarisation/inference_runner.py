@@ -0,0 +1,154 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import torch
+from multiprocessing import Pool
+from torch.utils.data import DataLoader
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from corpus import open_corpus
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "webapp", "backend"))
+from shard_manifest import prepare_shard_dir, path_fingerprint
+
+# Sentence classification over a whole corpus split. Documents are cut into shards; each
+# shard is tokenized, sorted by length and run in padded batches, and its logits are
+# written to <output_dir>/shards as soon as they are ready. Shards already on disk are
+# skipped, so an interrupted run resumes where it stopped. The manifest shared with the
+# corpus index (webapp/backend/shard_manifest.py) discards shards computed from another
+# model, tokenizer, corpus or batching setting.
+
+BATCH_SIZE = 64
+MAX_LENGTH = 512
+SHARD_DOCS = 256
+
+_worker = {}
+
+def _init_worker(model_path, source_path, threads, batch_size, max_length):
+    torch.set_num_threads(threads)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.to(device)
+    model.eval()
+    _worker.update(
+        model=model,
+        tokenizer=AutoTokenizer.from_pretrained(model_path),
+        corpus=open_corpus(source_path),
+        device=device,
+        batch_size=batch_size,
+        max_length=max_length,
+    )
+
+def length_batches(lengths, batch_size):
+    # Longest first so the slowest batches start early and padding stays within a bucket
+    order = np.argsort(-np.asarray(lengths), kind="stable")
+    return [order[i:i + batch_size].tolist() for i in range(0, len(order), batch_size)]
+
+def _run_shard(span):
+    first, last, shard_path = span
+    corpus, tokenizer, model = _worker["corpus"], _worker["tokenizer"], _worker["model"]
+    start, end = int(corpus.offsets[first]), int(corpus.offsets[last])
+    sentences = corpus.sentence_column.slice(start, end - start).to_pylist()
+
+    encodings = tokenizer(sentences, truncation=True, max_length=_worker["max_length"])
+    features = [{key: encodings[key][i] for key in encodings.keys()} for i in range(len(sentences))]
+    batches = length_batches([len(ids) for ids in encodings["input_ids"]], _worker["batch_size"])
+    loader = DataLoader(features, batch_sampler=batches, collate_fn=lambda batch: tokenizer.pad(batch, return_tensors="pt"))
+
+    logits = np.zeros((len(sentences), model.config.num_labels), dtype=np.float32)
+    with torch.inference_mode():
+        for indices, batch in zip(batches, loader):
+            batch = {key: value.to(_worker["device"]) for key, value in batch.items()}
+            logits[indices] = model(**batch).logits.float().cpu().numpy()
+
+    # Written under a temporary name and renamed, so a shard on disk is always complete
+    np.save(shard_path + ".tmp.npy", logits)
+    os.replace(shard_path + ".tmp.npy", shard_path)
+    return first, last, len(sentences)
+
+def shard_spans(num_docs, shard_docs, shard_dir):
+    for first in range(0, num_docs, shard_docs):
+        last = min(first + shard_docs, num_docs)
+        yield first, last, os.path.join(shard_dir, f"shard_{first:07d}_{last:07d}.npy")
+
+def shard_manifest(model_path, source_path, batch_size, max_length, shard_docs):
+    # The tokenizer is loaded from model_path, so fingerprinting the model covers it too
+    return {
+        "model": path_fingerprint(model_path),
+        "source": path_fingerprint(source_path),
+        "batch_size": batch_size,
+        "max_length": max_length,
+        "shard_docs": shard_docs,
+    }
+
+def softmax(logits):
+    shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+def run_inference(model_path, source_path, output_dir, batch_size=BATCH_SIZE, max_length=MAX_LENGTH,
+                  workers=1, threads_per_worker=None, shard_docs=SHARD_DOCS):
+    corpus = open_corpus(source_path)
+    shard_dir = os.path.join(output_dir, "shards")
+    prepare_shard_dir(shard_dir, shard_manifest(model_path, source_path, batch_size, max_length, shard_docs))
+
+    spans = list(shard_spans(len(corpus), shard_docs, shard_dir))
+    pending = [span for span in spans if not os.path.exists(span[2])]
+    print(f"{len(corpus)} docs in {len(spans)} shards, {len(spans) - len(pending)} already done.")
+
+    # Pin threads per worker so the workers do not oversubscribe the cores between them
+    threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    start = time.time()
+    with Pool(workers, initializer=_init_worker, initargs=(model_path, source_path, threads, batch_size, max_length)) as pool:
+        for done, (first, last, count) in enumerate(pool.imap_unordered(_run_shard, pending), 1):
+            print(f"Shard {done}/{len(pending)} (docs {first}-{last - 1}, {count} sentences): {count / (time.time() - start):.1f} sentences/s overall")
+
+    logits = np.concatenate([np.load(span[2]) for span in spans]) if spans else np.zeros((0, 2), dtype=np.float32)
+    if len(logits) != corpus.offsets[-1]:
+        raise RuntimeError(f"Shards hold {len(logits)} sentence logits but the corpus has {corpus.offsets[-1]} sentences; delete {shard_dir} and rerun")
+    np.save(os.path.join(output_dir, "logits.npy"), logits)
+    np.save(os.path.join(output_dir, "probs.npy"), softmax(logits))
+    np.save(os.path.join(output_dir, "offsets.npy"), np.asarray(corpus.offsets))
+    return load_predictions(output_dir)
+
+def load_predictions(output_dir):
+    return (
+        np.load(os.path.join(output_dir, "logits.npy"), mmap_mode="r"),
+        np.load(os.path.join(output_dir, "probs.npy"), mmap_mode="r"),
+        np.load(os.path.join(output_dir, "offsets.npy")),
+    )
+
+def predict_labels(probs, threshold=None):
+    # No threshold is argmax, as the per-sentence scripts did; otherwise P(label 1) >= threshold
+    if threshold is None:
+        return np.argmax(probs, axis=1)
+    return (np.asarray(probs[:, 1]) >= threshold).astype(np.int64)
+
+def write_predictions(source_path, output_dir, preds_path, summaries_path, threshold=None):
+    corpus = open_corpus(source_path)
+    _, probs, offsets = load_predictions(output_dir)
+    labels = predict_labels(probs, threshold)
+    summaries = []
+    with open(preds_path, "w", encoding="utf-8") as preds_out, open(summaries_path, "w", encoding="utf-8") as summaries_out:
+        for doc_idx in range(len(corpus)):
+            sentences = corpus.sentences(doc_idx)
+            doc_preds = labels[offsets[doc_idx]:offsets[doc_idx + 1]]
+            summary = " ".join(s for s, l in zip(sentences, doc_preds) if l == 1)
+            preds_out.write(" ".join(map(str, doc_preds)) + "\n")
+            summaries_out.write(summary.strip() + "\n===\n")
+            summaries.append(summary)
+    return summaries
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched sentence classification over a .source split.")
+    parser.add_argument("model_path")
+    parser.add_argument("source_path")
+    parser.add_argument("output_dir")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-length", type=int, default=MAX_LENGTH)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads-per-worker", type=int, default=None)
+    parser.add_argument("--shard-docs", type=int, default=SHARD_DOCS)
+    args = parser.parse_args()
+    run_inference(args.model_path, args.source_path, args.output_dir, args.batch_size, args.max_length,
+                  args.workers, args.threads_per_worker, args.shard_docs)
@@ -0,0 +1,33 @@
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+from textrank_engine import pagerank, similarity_graph, sentence_vectors, PAGERANK_TOL
+
+def networkx_scores(graph):
+    scores = nx.pagerank(nx.from_numpy_array(graph.toarray()), tol=PAGERANK_TOL)
+    return np.array([scores[i] for i in range(graph.shape[0])])
+
+def test_pagerank_matches_networkx_with_an_isolated_sentence():
+    rng = np.random.default_rng(7)
+    weights = rng.random((12, 12)) * (rng.random((12, 12)) < 0.4)
+    weights = np.triu(weights) + np.triu(weights, 1).T
+    # Sentence 5 shares no term with any sentence, not even itself: a dangling node
+    weights[5, :] = 0
+    weights[:, 5] = 0
+    graph = sp.csr_matrix(weights)
+
+    scores = pagerank(graph)
+    assert np.allclose(scores, networkx_scores(graph), atol=1e-6)
+    assert np.isclose(scores.sum(), 1.0)
+
+def test_textrank_graph_scores_match_networkx():
+    sentences = [
+        "The controller shall keep records of processing activities.",
+        "Records of processing shall be made available to the supervisory authority.",
+        "Each supervisory authority shall monitor the application of this Regulation.",
+        "!",
+        "The controller and the processor shall cooperate with the supervisory authority.",
+    ]
+    for top_k in (None, 2):
+        graph = similarity_graph(sentence_vectors(sentences), top_k)
+        assert np.allclose(pagerank(graph), networkx_scores(graph), atol=1e-6)
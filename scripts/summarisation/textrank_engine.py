@@ -0,0 +1,97 @@
+import numpy as np
+import scipy.sparse as sp
+from multiprocessing import Pool
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+
+# Sparse TextRank: cosine similarities stay in a CSR matrix and PageRank runs as a
+# vectorised power iteration with the same update, dangling handling and stopping rule
+# as nx.pagerank on nx.from_numpy_array(similarity), so rankings match networkx.
+
+PAGERANK_ALPHA = 0.85
+PAGERANK_MAX_ITER = 100
+PAGERANK_TOL = 1.0e-6
+HASHING_FEATURES = 2 ** 18
+
+def fit_corpus_vectorizer(documents):
+    # One vocabulary and idf for the whole corpus; documents is an iterable of sentence lists
+    return TfidfVectorizer().fit(sentence for sentences in documents for sentence in sentences)
+
+def hashing_vectorizer(n_features=HASHING_FEATURES):
+    # Stateless, so nothing to fit and nothing large to ship to worker processes
+    return HashingVectorizer(n_features=n_features, alternate_sign=False, norm="l2")
+
+def make_vectorizer(mode, documents=None):
+    if mode == "document":
+        return None
+    if mode == "corpus":
+        return fit_corpus_vectorizer(documents)
+    if mode == "hashing":
+        return hashing_vectorizer()
+    raise ValueError(f"Unknown vectorizer mode {mode!r}; expected document, corpus or hashing.")
+
+def sentence_vectors(sentences, vectorizer=None):
+    if vectorizer is None:
+        return TfidfVectorizer().fit_transform(sentences)
+    return vectorizer.transform(sentences)
+
+def similarity_graph(vectors, top_k=None):
+    similarity = (vectors @ vectors.T).tocsr()
+    if top_k is None or top_k >= similarity.shape[0]:
+        return similarity
+
+    # Keep each sentence's k strongest edges, then symmetrise so the graph stays undirected
+    rows, cols, values = [], [], []
+    for i in range(similarity.shape[0]):
+        start, end = similarity.indptr[i], similarity.indptr[i + 1]
+        row_values = similarity.data[start:end]
+        keep = np.argpartition(-row_values, top_k - 1)[:top_k] if len(row_values) > top_k else np.arange(len(row_values))
+        rows.append(np.full(len(keep), i))
+        cols.append(similarity.indices[start:end][keep])
+        values.append(row_values[keep])
+    pruned = sp.csr_matrix(
+        (np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+        shape=similarity.shape,
+    )
+    return pruned.maximum(pruned.T).tocsr()
+
+def pagerank(graph, alpha=PAGERANK_ALPHA, max_iter=PAGERANK_MAX_ITER, tol=PAGERANK_TOL):
+    n = graph.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    out_weight = np.asarray(graph.sum(axis=1)).ravel()
+    inverse = np.divide(1.0, out_weight, out=np.zeros(n), where=out_weight != 0)
+    transition = sp.diags(inverse) @ graph
+    dangling = out_weight == 0
+
+    x = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        previous = x
+        x = alpha * (x @ transition + previous[dangling].sum() / n) + (1 - alpha) / n
+        if np.abs(x - previous).sum() < n * tol:
+            return x
+    raise RuntimeError(f"PageRank failed to converge within {max_iter} iterations.")
+
+def textrank_scores(sentences, vectorizer=None, top_k=None):
+    return pagerank(similarity_graph(sentence_vectors(sentences, vectorizer), top_k))
+
+def textrank_keep(sentences, keep_ratio=0.75, vectorizer=None, top_k=None):
+    if len(sentences) <= 2:
+        # Tiny doc, just keep it
+        return list(range(len(sentences)))
+    scores = textrank_scores(sentences, vectorizer, top_k)
+    ranked_indices = sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True)
+    keep_n = max(1, int(len(sentences) * keep_ratio))
+    return sorted(ranked_indices[:keep_n])
+
+_worker_settings = {}
+
+def _init_worker(keep_ratio, vectorizer, top_k):
+    _worker_settings.update(keep_ratio=keep_ratio, vectorizer=vectorizer, top_k=top_k)
+
+def _keep_worker(sentences):
+    return textrank_keep(sentences, **_worker_settings)
+
+def textrank_keep_many(documents, keep_ratio=0.75, vectorizer=None, top_k=None, processes=None, chunksize=16):
+    # Yields keep indices per document, in input order; documents can be a lazy iterable
+    with Pool(processes, initializer=_init_worker, initargs=(keep_ratio, vectorizer, top_k)) as pool:
+        yield from pool.imap(_keep_worker, documents, chunksize=chunksize)
@@ -1,54 +1,224 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.schema import Document
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_ollama import OllamaLLM
-import subprocess
-import time
-import requests
-
-def check_ollama_server():
-    try:
-        response = requests.get("http://localhost:11434")
-        return response.status_code == 200
-    except requests.ConnectionError:
-        return False
-
-def start_ollama_server():
-    if not check_ollama_server():
-        print("Starting Ollama server...")
-        subprocess.Popen(["ollama", "serve"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        time.sleep(5)
-    if not check_ollama_server():
-        raise RuntimeError("Failed to start Ollama server.")
-    
-def parse_document(text):
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=200,
-        separators = ["\n\n", "\n", r"(?<=\. )", " ", ""]
-    )
-    docs = text_splitter.create_documents([text])
+from fastapi.concurrency import run_in_threadpool
+from ollama_client import ollama, supervisor
+from metrics import stage_timer
+from model_loader import lazy_model, warm_up
+from bm25 import BM25
+from act_structure import document_sections, make_splitter
+from collections import OrderedDict
+import hashlib
+import logging
+import os
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 200
+SEPARATORS = ["\n\n", "\n", r"(?<=\. )", " ", ""]
+VECTORSTORE_CACHE_SIZE = 16
+# "dense" embeds every chunk up front; "hybrid" (opt-in) embeds only the BM25 candidates for each question
+RETRIEVAL_MODE = os.environ.get("RAG_RETRIEVAL_MODE", "dense")
+RERANK_CANDIDATES = int(os.environ.get("RAG_RERANK_CANDIDATES", "40"))
+EMBEDDING_CACHE_SIZE = int(os.environ.get("RAG_EMBEDDING_CACHE_SIZE", "20000"))
 
-    embeddings = HuggingFaceEmbeddings(
-        model_name="BAAI/bge-small-en-v1.5",
+def _load_embeddings():
+    # langchain, FAISS and sentence-transformers are only imported once a model is needed
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
         model_kwargs={"device": "cpu"}
     )
 
-    vectorstore = FAISS.from_documents(docs, embeddings)
+_embeddings = lazy_model("embeddings", _load_embeddings)
+
+def get_embeddings():
+    return _embeddings.get()
+
+class VectorstoreCache:
+    def __init__(self, max_size=VECTORSTORE_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._stores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            store = self._stores.get(key)
+            if store is None:
+                self.misses += 1
+                return None
+            self._stores.move_to_end(key)
+            self.hits += 1
+            return store
+
+    def put(self, key, store):
+        with self._lock:
+            self._stores[key] = store
+            self._stores.move_to_end(key)
+            while len(self._stores) > self.max_size:
+                self._stores.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._stores.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._stores), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+vectorstore_cache = VectorstoreCache()
+# Chunk vectors outlive the per-document stores, so another act or consolidated version
+# containing the same article text reuses them
+chunk_embedding_cache = VectorstoreCache(max_size=EMBEDDING_CACHE_SIZE)
+
+def document_key(sections, celex_id=None, mode=None):
+    # The splitter and retrieval settings are part of the key so a config change never serves stale chunks
+    mode = mode or RETRIEVAL_MODE
+    digest = hashlib.sha256(f"{EMBEDDING_MODEL}|{CHUNK_SIZE}|{CHUNK_OVERLAP}|{SEPARATORS!r}|{mode}|{celex_id}".encode("utf-8"))
+    for article, text in sections:
+        digest.update(f"\n\0{article}\n{text}".encode("utf-8"))
+    return digest.hexdigest()
+
+def chunk_key(text):
+    # Keyed by content alone: the same article text embeds identically in any act
+    return hashlib.sha256(f"{EMBEDDING_MODEL}\n{text}".encode("utf-8")).hexdigest()
+
+def embed_chunks(texts, embeddings):
+    keys = [chunk_key(text) for text in texts]
+    vectors = [chunk_embedding_cache.get(key) for key in keys]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        with stage_timer("embedding"):
+            embedded = embeddings.embed_documents([texts[i] for i in missing])
+        for i, vector in zip(missing, embedded):
+            vectors[i] = np.asarray(vector, dtype="float32")
+            chunk_embedding_cache.put(keys[i], vectors[i])
+    return vectors
+
+class HybridIndex:
+    # BM25 shortlists chunks per question; only the shortlist is embedded, once per chunk,
+    # and reranked by the same L2 distance FAISS uses in dense mode
+    def __init__(self, chunks, embeddings, metadatas=None, candidates=RERANK_CANDIDATES, dense_key=None):
+        self.chunks = chunks
+        self.metadatas = metadatas or [{} for _ in chunks]
+        self.embeddings = embeddings
+        self.candidates = candidates
+        # vectorstore_cache key of the dense store for the same document, used when BM25 cannot shortlist
+        self.dense_key = dense_key
+        self.bm25 = BM25(chunks)
+        self._vectors = {}
+        self._lock = threading.Lock()
+
+    @property
+    def embedded(self):
+        return len(self._vectors)
+
+    def embed_ids(self, ids):
+        # The lock only guards the dict; embedding runs outside it so one question's
+        # candidates never hold up another's. Two threads may embed the same chunk, which
+        # chunk_embedding_cache makes cheap and both produce the same vector.
+        with self._lock:
+            missing = [i for i in ids if i not in self._vectors]
+        if missing:
+            embedded = embed_chunks([self.chunks[i] for i in missing], self.embeddings)
+            with self._lock:
+                self._vectors.update(zip(missing, embedded))
+        with self._lock:
+            return np.stack([self._vectors[i] for i in ids])
+
+    def dense_store(self):
+        store = vectorstore_cache.get(self.dense_key) if self.dense_key else None
+        if store is None:
+            store = build_dense_vectorstore(self.chunks, self.metadatas, self.embeddings)
+            if self.dense_key:
+                vectorstore_cache.put(self.dense_key, store)
+        return store
+
+    def search(self, query, k=4):
+        if not self.chunks:
+            return []
+        ids = self.bm25.top_n(query, max(self.candidates, k))
+        query_vector = np.asarray(self.embeddings.embed_query(query), dtype="float32")
+        if len(ids) < k:
+            # Too few chunks share a term with the question (paraphrases, different wording
+            # from the act), so BM25 cannot shortlist; search the document's dense store,
+            # the same one dense mode caches, whose FAISS positions are the chunk ids
+            distances, positions = self.dense_store().index.search(query_vector[None, :], min(k, len(self.chunks)))
+            return [(int(i), float(d)) for i, d in zip(positions[0], distances[0]) if i >= 0]
+        vectors = self.embed_ids(ids)
+        distances = ((vectors - query_vector) ** 2).sum(axis=1)
+        return [(ids[j], float(distances[j])) for j in np.argsort(distances, kind="stable")[:k]]
+
+    def similarity_search(self, query, k=4):
+        from langchain.schema import Document
+        return [Document(page_content=self.chunks[i], metadata={**self.metadatas[i], "chunk": i}) for i, _ in self.search(query, k)]
+
+def chunk_sections(sections, celex_id=None):
+    # Chunks never cross an article boundary; articles that fit stay whole
+    text_splitter = make_splitter(CHUNK_SIZE, CHUNK_OVERLAP, SEPARATORS)
+    chunks, metadatas = [], []
+    for article, text in sections:
+        text = text.strip()
+        if not text:
+            continue
+        pieces = [text] if len(text) <= CHUNK_SIZE else text_splitter.split_text(text)
+        # A heading line split off on its own joins the chunk it introduces
+        if len(pieces) > 1 and len(pieces[0]) < CHUNK_OVERLAP and len(pieces[0]) + len(pieces[1]) < CHUNK_SIZE:
+            pieces[:2] = [pieces[0] + "\n" + pieces[1]]
+        for chunk in pieces:
+            chunks.append(chunk)
+            metadatas.append({"celex_id": celex_id, "article": article})
+    return chunks, metadatas
+
+def build_dense_vectorstore(chunks, metadatas, embeddings=None):
+    from langchain_community.vectorstores import FAISS
+
+    embeddings = embeddings or get_embeddings()
+    vectors = embed_chunks(chunks, embeddings)
+    return FAISS.from_embeddings(list(zip(chunks, vectors)), embeddings, metadatas=metadatas)
+
+def build_vectorstore(sections, celex_id=None):
+    chunks, metadatas = chunk_sections(sections, celex_id)
+    if RETRIEVAL_MODE == "dense":
+        return build_dense_vectorstore(chunks, metadatas)
+    return HybridIndex(chunks, get_embeddings(), metadatas, dense_key=document_key(sections, celex_id, mode="dense"))
+
+def parse_document(text, celex_id=None, preamble=None, articles=None):
+    sections = document_sections(text, preamble, articles)
+    key = document_key(sections, celex_id)
+    vectorstore = vectorstore_cache.get(key)
+    if vectorstore is None:
+        vectorstore = build_vectorstore(sections, celex_id)
+        vectorstore_cache.put(key, vectorstore)
     return vectorstore
 
-def ask_legal_question(text, question, model_name="llama3.1"):
-    start_ollama_server()
-    vectorstore = parse_document(text)
-    llm = OllamaLLM(model=model_name, temperature=0.1)
-    relevant_docs = vectorstore.similarity_search(
-        question, 
-        k=5
-    )
-    context = "\n\nDOCUMENT EXCERPTS:\n" + "\n---\n".join([doc.page_content for doc in relevant_docs])
+def format_excerpt(doc):
+    # Label excerpts with their article so answers can cite it, unless the chunk opens with the heading
+    article = doc.metadata.get("article")
+    if not article or article == "preamble" or doc.page_content.startswith(article):
+        return doc.page_content
+    return f"[{article}] {doc.page_content}"
+
+def retrieve_excerpts(text, question, k=5, celex_id=None, preamble=None, articles=None):
+    vectorstore = parse_document(text, celex_id, preamble, articles)
+    with stage_timer("retrieval"):
+        relevant_docs = vectorstore.similarity_search(
+            question, 
+            k=k
+        )
+    return [format_excerpt(doc) for doc in relevant_docs]
+
+warm_up.add("retrieval", lambda: build_vectorstore([("Article 1", "This Regulation shall enter into force.")]).similarity_search("When does it apply?", k=1))
+
+def build_qa_prompt(excerpts, question):
+    context = "\n\nDOCUMENT EXCERPTS:\n" + "\n---\n".join(excerpts)
     
-    prompt = f"""You are a senior EU legal analyst explaining a legal document to a non-expert. Provide a complete response to the question using ONLY the provided legal document excerpts.
+    return f"""You are a senior EU legal analyst explaining a legal document to a non-expert. Provide a complete response to the question using ONLY the provided legal document excerpts.
 
     {context}
 
@@ -62,11 +232,29 @@ def ask_legal_question(text, question, model_name="llama3.1"):
     - If a legal instrument is cited, begin with: "Under [Legal Instrument]"
     - If the answer is not found in the text, say: "Not specified in document"""
 
+async def ask_legal_question(text, question, model_name="llama3.1", celex_id=None, preamble=None, articles=None):
+    supervisor.require_ready()
+    excerpts = await run_in_threadpool(retrieve_excerpts, text, question, celex_id=celex_id, preamble=preamble, articles=articles)
+    prompt = build_qa_prompt(excerpts, question)
+
     try:
-        response = llm.invoke(prompt)
-        print(f"debugging: {context}")
-        print("----------")
-        return response
+        response = await ollama.generate(prompt, model_name, temperature=0.1)
+        logger.debug("Retrieved excerpts: %s", excerpts)
+        return response["response"]
         
     except Exception as e:
         return f"Error: {str(e)}"
+
+async def ask_legal_question_stream(text, question, model_name="llama3.1", celex_id=None, preamble=None, articles=None):
+    supervisor.require_ready()
+    excerpts = await run_in_threadpool(retrieve_excerpts, text, question, celex_id=celex_id, preamble=preamble, articles=articles)
+    yield {"event": "excerpts", "excerpts": excerpts}
+
+    try:
+        async for chunk in ollama.stream(build_qa_prompt(excerpts, question), model_name, temperature=0.1):
+            if chunk.get("response"):
+                yield {"event": "token", "text": chunk["response"]}
+    except Exception as e:
+        yield {"event": "error", "detail": f"Error: {str(e)}"}
+        return
+    yield {"event": "done"}
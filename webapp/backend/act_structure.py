@@ -0,0 +1,58 @@
+import re
+
+# A heading is "Article N" followed by a capitalised title or paragraph; cross references
+# such as "referred to in Article 5 of" are filtered out by the preceding word
+ARTICLE_HEADING = re.compile(r"\b(Article\s+\d+[a-z]?)(?=\s+[A-Z(\d])")
+REFERENCE_WORDS = {"in", "of", "to", "and", "or", "under", "with", "see", "by", "pursuant", "from", "that"}
+
+def find_article_headings(text):
+    headings = []
+    for match in ARTICLE_HEADING.finditer(text):
+        preceding = text[max(0, match.start() - 20):match.start()].split()
+        if preceding and preceding[-1].lower().strip(",;") in REFERENCE_WORDS:
+            continue
+        headings.append(match)
+    return headings
+
+def split_articles(text):
+    # Everything before the first heading is kept as the preamble
+    headings = find_article_headings(text)
+    if not headings:
+        return [("preamble", 0, len(text))]
+    sections = []
+    if headings[0].start(1) > 0:
+        sections.append(("preamble", 0, headings[0].start(1)))
+    for current, following in zip(headings, headings[1:] + [None]):
+        end = following.start(1) if following else len(text)
+        sections.append((re.sub(r"\s+", " ", current.group(1)), current.start(1), end))
+    return sections
+
+ARTICLE_NUMBER = re.compile(r"\s*Article\s+(\d+[a-z]?)\b")
+
+def article_number(text, index):
+    # EUR-Lex article texts open with their own heading; fall back to position otherwise
+    match = ARTICLE_NUMBER.match(text)
+    return match.group(1) if match else str(index + 1)
+
+def structure_articles(articles):
+    return [{"number": article_number(article["text"], i), "text": article["text"]} for i, article in enumerate(articles)]
+
+def document_sections(text="", preamble=None, articles=None):
+    # Structured acts keep their own article boundaries; flat text is split at article headings
+    if articles:
+        sections = [("preamble", preamble)] if preamble and preamble.strip() else []
+        return sections + [(f"Article {article['number']}", article["text"]) for article in articles]
+    return [(label, text[start:end]) for label, start, end in split_articles(text)]
+
+def make_splitter(chunk_size, chunk_overlap, separators, **kwargs):
+    # Separators may be regular expressions (e.g. a sentence-end lookbehind); every chunker
+    # shares this so QA chunks and corpus-index chunks break text the same way
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=separators,
+        is_separator_regex=True,
+        **kwargs,
+    )
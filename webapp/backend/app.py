@@ -1,13 +1,54 @@
 from eurlex import get_data_by_celex_id, get_articles_by_celex_id
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.concurrency import run_in_threadpool
-from models import QARequest, SumRequest
-from summarisation import summarise_text
-from RAG import ask_legal_question
-import re
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from models import QARequest, SumRequest, CorpusSearchRequest
+from summarisation import summarise_text, summarise_text_or_raise, summarise_text_stream, summary_keys
+from RAG import ask_legal_question, ask_legal_question_stream, vectorstore_cache, chunk_embedding_cache
+from ollama_client import ollama, supervisor, OllamaUnavailableError
+from eurlex_cache import eurlex_cache, assemble_document
+from corpus_index import get_corpus_index, group_by_act
+from jobs import JobManager, QueueFullError
+from job_store import job_store
+from summary_store import summary_store
+from metrics import render_metrics, start_snapshots, register_caches, MetricsMiddleware, CONTENT_TYPE, METRICS_DIR
+from model_loader import warm_up, model_status
+import json
+import logging
+import os
 
-app = FastAPI()
+logging.basicConfig(level=os.environ.get("LEXBRIEF_LOG_LEVEL", "INFO").upper())
+
+# Load models and run one dummy inference in the background once the server is up
+WARM_UP_ON_START = os.environ.get("LEXBRIEF_WARM_UP", "1") == "1"
+
+# Jobs live in the shared database so any worker can report on or cancel them
+summary_jobs = JobManager(summarise_text_or_raise, key_func=lambda text: summary_keys(text)[1], store=job_store)
+
+register_caches({
+    "eurlex": lambda: (eurlex_cache.hits, eurlex_cache.misses),
+    "vectorstore": lambda: (vectorstore_cache.hits, vectorstore_cache.misses),
+    "chunk_embedding": lambda: (chunk_embedding_cache.hits, chunk_embedding_cache.misses),
+    "extractive_summary": lambda: (summary_store.hits["extractive"], summary_store.misses["extractive"]),
+    "abstractive_summary": lambda: (summary_store.hits["abstractive"], summary_store.misses["abstractive"]),
+})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    supervisor.start()
+    summary_jobs.start()
+    if METRICS_DIR:
+        start_snapshots()
+    if WARM_UP_ON_START:
+        warm_up.start()
+    yield
+    await summary_jobs.stop()
+    await supervisor.stop()
+    await ollama.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,38 +57,126 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(OllamaUnavailableError)
+async def ollama_unavailable_handler(request: Request, exc: OllamaUnavailableError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+async def ndjson(events):
+    async for event in events:
+        yield json.dumps(event) + "\n"
 
 @app.get("/")
 async def root():
     return {"message": "This is a test message!"}
 
-@app.get("/eurlex/{celex_id}")
-async def eurlex(celex_id: str): 
+def health_report():
+    return {"models": model_status(), "warm_up": warm_up.status(), "ollama": supervisor.status()}
+
+@app.get("/healthz")
+async def healthz():
+    # Liveness: the process is serving, whatever state the models are in
+    return {"status": "ok", **health_report()}
+
+@app.get("/readyz")
+async def readyz():
+    ready = warm_up.ready
+    return JSONResponse(status_code=200 if ready else 503, content={"status": "ready" if ready else "not_ready", **health_report()})
+
+@app.get("/metrics")
+async def metrics():
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+async def load_eurlex_document(celex_id):
     try:   
         data = await run_in_threadpool(get_data_by_celex_id, celex_id)
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Error fetching data for CELEX ID {celex_id}: {str(e)}")
-    preamble = data['preamble']['text']
-    articles = [data['articles'][i]['text'] for i in range(len(data['articles']))]
-    text = preamble + '\n\n' + '\n\n'.join(articles)
-    related_documents = data['related_documents']
-    title = re.sub(r'\s+', ' ', data['title'].replace('\n', '')).strip()
-    if not title:
+    document = assemble_document(data)
+    if not document['title']:
         raise HTTPException(status_code=404, detail="No data found for the provided CELEX ID.")
+    return document
 
-    return {
-        'title': title,
-        'text': text,
-        'related_documents': related_documents
-    }
+@app.get("/eurlex/{celex_id}")
+async def eurlex(celex_id: str): 
+    return await eurlex_cache.get_or_fetch(celex_id, load_eurlex_document)
     
+def document_structure(request):
+    articles = [article.model_dump() for article in request.articles] if request.articles else None
+    return {"celex_id": request.celex_id, "preamble": request.preamble, "articles": articles}
+
 @app.post("/ask_question")
 async def ask_question(request: QARequest):
-    response = await run_in_threadpool(ask_legal_question, request.text, request.question)
+    if not request.text and not request.articles:
+        raise HTTPException(status_code=422, detail="Send the document as text or as articles.")
+    response = await ask_legal_question(request.text, request.question, **document_structure(request))
     return {"question": request.question, "response": response}
 
 
 @app.post("/summarise_text")
 async def summarise_text_endpoint(request: SumRequest):
-    summary = await run_in_threadpool(summarise_text, request.text)
+    summary = await summarise_text(request.text)
     return {"summary": summary}
+
+
+@app.post("/search_corpus")
+async def search_corpus(request: CorpusSearchRequest):
+    try:
+        index = await run_in_threadpool(get_corpus_index)
+    except (OSError, RuntimeError) as e:
+        raise HTTPException(status_code=503, detail=f"Corpus index is not available: {str(e)}")
+    hits = await run_in_threadpool(index.search, request.question, request.k)
+    return {"question": request.question, "acts": group_by_act(hits), "excerpts": hits}
+
+
+def get_job_or_404(job_id):
+    job = summary_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No summarisation job with ID {job_id}.")
+    return job
+
+
+@app.post("/summarise_jobs", status_code=202)
+async def submit_summarise_job(request: SumRequest):
+    try:
+        job = summary_jobs.submit(request.text)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return job.to_dict()
+
+
+@app.get("/summarise_jobs/{job_id}")
+async def summarise_job_status(job_id: str):
+    return get_job_or_404(job_id).to_dict()
+
+
+@app.get("/summarise_jobs/{job_id}/result")
+async def summarise_job_result(job_id: str):
+    job = get_job_or_404(job_id)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job.status}.")
+    return {"job_id": job.id, "summary": job.result}
+
+
+@app.delete("/summarise_jobs/{job_id}")
+async def cancel_summarise_job(job_id: str):
+    get_job_or_404(job_id)
+    return summary_jobs.cancel(job_id).to_dict()
+
+
+@app.post("/ask_question/stream")
+async def ask_question_stream(request: QARequest):
+    # Checked up front so an unavailable server is a 503 rather than a broken stream
+    if not request.text and not request.articles:
+        raise HTTPException(status_code=422, detail="Send the document as text or as articles.")
+    supervisor.require_ready()
+    events = ask_legal_question_stream(request.text, request.question, **document_structure(request))
+    return StreamingResponse(ndjson(events), media_type="application/x-ndjson")
+
+
+@app.post("/summarise_text/stream")
+async def summarise_text_stream_endpoint(request: SumRequest):
+    supervisor.require_ready()
+    events = summarise_text_stream(request.text)
+    return StreamingResponse(ndjson(events), media_type="application/x-ndjson")
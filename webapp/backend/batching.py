@@ -0,0 +1,140 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, CancelledError
+
+logger = logging.getLogger(__name__)
+
+class _Request:
+    __slots__ = ("future", "items", "results", "taken", "remaining", "enqueued_at", "cancel_event")
+
+    def __init__(self, future, items, enqueued_at, cancel_event=None):
+        self.future = future
+        self.items = items
+        self.results = [None] * len(items)
+        self.taken = 0
+        self.remaining = len(items)
+        self.enqueued_at = enqueued_at
+        self.cancel_event = cancel_event
+
+    def drop_if_cancelled(self):
+        # Items not yet run are dropped; the caller sees CancelledError
+        if self.cancel_event is not None and self.cancel_event.is_set() and not self.future.done():
+            self.future.set_exception(CancelledError())
+        return self.future.done()
+
+class MicroBatcher:
+    # One worker thread runs every forward pass, merging items submitted concurrently by any
+    # number of callers. A pass starts once max_batch items are waiting or the oldest has
+    # waited max_wait seconds, so a lone caller pays at most max_wait extra latency. Passes
+    # are filled round-robin, so a short request is not queued behind a long document.
+    def __init__(self, run_batch, max_batch, max_wait, on_batch=None):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.on_batch = on_batch
+        self._reset()
+        # A worker thread started before fork does not exist in the child
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    if self._thread is not None:
+                        logger.error("Micro-batcher thread died; restarting")
+                    self._thread = threading.Thread(target=self._loop, args=(self._queue,), name="micro-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, items, cancel_event=None):
+        # Setting cancel_event (a threading.Event) drops the request's remaining items
+        future = Future()
+        if not items:
+            future.set_result([])
+            return future
+        self._ensure_started()
+        self._queue.put(_Request(future, list(items), time.monotonic(), cancel_event))
+        return future
+
+    def __call__(self, items, cancel_event=None):
+        return self.submit(items, cancel_event).result()
+
+    def _take_batch(self, active):
+        # Each in-flight request gets an equal share of the pass, in contiguous runs so its
+        # length-sorted items still pad well; shares left unused go round again
+        batch = []
+        while len(batch) < self.max_batch:
+            open_requests = [request for request in active if request.taken < len(request.items)]
+            if not open_requests:
+                break
+            share = max(1, (self.max_batch - len(batch)) // len(open_requests))
+            for request in open_requests:
+                take = min(share, len(request.items) - request.taken, self.max_batch - len(batch))
+                batch.extend((request, i) for i in range(request.taken, request.taken + take))
+                request.taken += take
+        return batch
+
+    def _run(self, batch):
+        if self.on_batch:
+            try:
+                self.on_batch(len(batch), len({id(request) for request, _ in batch}))
+            except Exception:
+                logger.exception("Micro-batch callback failed")
+        outputs = self.run_batch([request.items[i] for request, i in batch])
+        if len(outputs) != len(batch):
+            raise RuntimeError(f"Batch function returned {len(outputs)} outputs for {len(batch)} items")
+        for (request, i), output in zip(batch, outputs):
+            request.results[i] = output
+            request.remaining -= 1
+            if request.remaining == 0:
+                request.future.set_result(request.results)
+
+    def _loop(self, requests):
+        active = []
+
+        def add(request):
+            # Callers may cancel a future before the worker picks it up
+            if request.future.set_running_or_notify_cancel():
+                active.append(request)
+
+        def waiting():
+            return sum(len(request.items) - request.taken for request in active)
+
+        while True:
+            batch = []
+            try:
+                if not active:
+                    add(requests.get())
+                    continue
+                # Pick up every request that arrived during the last pass so it gets a share now
+                while True:
+                    try:
+                        add(requests.get_nowait())
+                    except queue.Empty:
+                        break
+                deadline = min(request.enqueued_at for request in active) + self.max_wait
+                while waiting() < self.max_batch:
+                    timeout = deadline - time.monotonic()
+                    try:
+                        add(requests.get(timeout=timeout) if timeout > 0 else requests.get_nowait())
+                    except queue.Empty:
+                        break
+
+                active = [request for request in active if not request.drop_if_cancelled()]
+                if not active:
+                    continue
+                batch = self._take_batch(active)
+                self._run(batch)
+            except Exception as e:
+                logger.exception("Micro-batch of %d items failed", len(batch))
+                for request in {id(request): request for request, _ in batch}.values():
+                    if not request.future.done():
+                        request.future.set_exception(e)
+            active = [request for request in active if not request.future.done()]
@@ -0,0 +1,55 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from summarisation import get_tokenizer, get_model, load_classifier, classify_encodings, CLASSIFIER_BACKENDS
+
+SENTENCES = [
+    "This Regulation lays down rules relating to the protection of natural persons with regard to the processing of personal data.",
+    "Member States shall provide for one or more independent public authorities to be responsible for monitoring the application of this Regulation.",
+    "It shall apply from 25 May 2018.",
+    "The controller shall implement appropriate technical and organisational measures to ensure a level of security appropriate to the risk.",
+    "Done at Brussels, 27 April 2016.",
+    "Any person who has suffered material or non-material damage as a result of an infringement shall have the right to receive compensation from the controller or processor for the damage suffered.",
+]
+
+def benchmark(backend, encodings, batch_size, repeats):
+    start = time.perf_counter()
+    classifier = load_classifier(get_model(), backend)
+    load_seconds = time.perf_counter() - start
+
+    # One untimed pass absorbs tracing/compilation warm-up
+    classify_encodings(encodings, batch_size=batch_size, backend=classifier)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        labels = classify_encodings(encodings, batch_size=batch_size, backend=classifier)
+    elapsed = time.perf_counter() - start
+    return {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "sentences_per_second": round(len(encodings) * repeats / elapsed, 1),
+        "labels": labels,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report LegalBERT classifier throughput per inference backend.")
+    parser.add_argument("--backends", nargs="+", default=list(CLASSIFIER_BACKENDS))
+    parser.add_argument("--sentences", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    sentences = [SENTENCES[i % len(SENTENCES)] for i in range(args.sentences)]
+    encodings = get_tokenizer()(sentences)["input_ids"]
+
+    results = [benchmark(backend, encodings, args.batch_size, args.repeats) for backend in args.backends]
+    eager = next((r["labels"] for r in results if r["backend"] == "eager"), None)
+    for result in results:
+        labels = result.pop("labels")
+        if eager is not None:
+            result["label_agreement"] = round(sum(a == b for a, b in zip(labels, eager)) / len(eager), 4)
+        print(json.dumps(result))
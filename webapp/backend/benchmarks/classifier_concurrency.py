@@ -0,0 +1,52 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import summarisation
+from summarisation import get_tokenizer, classify_encodings
+from benchmarks.classifier_backends import SENTENCES
+
+def run(concurrency, encodings, requests_per_caller, micro_batching):
+    # Each caller stands in for one request handler classifying a document on its own thread
+    summarisation.CLASSIFIER_MICRO_BATCHING = micro_batching
+    barrier = threading.Barrier(concurrency + 1)
+
+    def caller():
+        barrier.wait()
+        for _ in range(requests_per_caller):
+            classify_encodings(encodings)
+
+    threads = [threading.Thread(target=caller) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "micro_batching": micro_batching,
+        "sentences_per_second": round(len(encodings) * requests_per_caller * concurrency / elapsed, 1),
+        "seconds_per_request": round(elapsed / requests_per_caller, 4),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LegalBERT classification throughput under concurrent callers, with and without micro-batching.")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--sentences", type=int, default=12, help="Sentences per simulated request")
+    parser.add_argument("--requests", type=int, default=5, help="Requests per caller")
+    args = parser.parse_args()
+
+    sentences = [SENTENCES[i % len(SENTENCES)] for i in range(args.sentences)]
+    encodings = get_tokenizer()(sentences)["input_ids"]
+    # Untimed pass loads the model and absorbs first-call overhead
+    classify_encodings(encodings)
+
+    results = [run(c, encodings, args.requests, mode) for c in args.concurrency for mode in (False, True)]
+    print(json.dumps(results, indent=2))
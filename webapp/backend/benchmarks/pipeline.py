@@ -0,0 +1,220 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# Benchmarks never touch the developer's cache database
+os.environ.setdefault("LEXBRIEF_DB_URL", "sqlite://")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import torch
+from ollama_client import ollama, supervisor
+from summary_store import summary_store
+from summarisation import (
+    preprocess_eurlex, legal_bert_extract, extractive_summary, build_summary_prompt, summarise_text,
+    CHUNK_SIZE, EXTRACTIVE_MAX_TOKENS,
+)
+from RAG import parse_document, build_qa_prompt, ask_legal_question, vectorstore_cache, chunk_embedding_cache
+
+PREAMBLE = """REGULATION (EU) 2016/679 OF THE EUROPEAN PARLIAMENT AND OF THE COUNCIL
+of 27 April 2016
+on the protection of natural persons with regard to the processing of personal data and on the free movement of such data
+THE EUROPEAN PARLIAMENT AND THE COUNCIL OF THE EUROPEAN UNION,
+Having regard to the Treaty on the Functioning of the European Union, and in particular Article 16 thereof,
+Whereas:
+(1) The protection of natural persons in relation to the processing of personal data is a fundamental right.
+HAVE ADOPTED THIS REGULATION:
+"""
+
+ARTICLES = [
+    "This Regulation lays down rules relating to the protection of natural persons with regard to the processing of personal data and rules relating to the free movement of personal data. "
+    "It protects fundamental rights and freedoms of natural persons and in particular their right to the protection of personal data. "
+    "The free movement of personal data within the Union shall be neither restricted nor prohibited for reasons connected with the protection of natural persons.",
+    "Member States shall provide for one or more independent public authorities to be responsible for monitoring the application of this Regulation. "
+    "Each supervisory authority shall contribute to the consistent application of this Regulation throughout the Union. "
+    "Where more than one supervisory authority is established in a Member State, that Member State shall designate the authority which is to represent those authorities in the Board.",
+    "The controller shall implement appropriate technical and organisational measures to ensure a level of security appropriate to the risk. "
+    "Those measures shall include, as appropriate, the pseudonymisation and encryption of personal data and the ability to restore availability and access in a timely manner. "
+    "Adherence to an approved code of conduct may be used as an element by which to demonstrate compliance with these requirements.",
+    "Any person who has suffered material or non-material damage as a result of an infringement of this Regulation shall have the right to receive compensation from the controller or processor for the damage suffered. "
+    "A controller or processor shall be exempt from liability if it proves that it is not in any way responsible for the event giving rise to the damage. "
+    "Court proceedings for exercising the right to receive compensation shall be brought before the competent courts.",
+    "The Commission shall submit a report on the evaluation and review of this Regulation to the European Parliament and to the Council by 25 May 2020 and every four years thereafter. "
+    "The reports shall be made public. "
+    "Directive 95/46/EC is repealed with effect from 25 May 2018 and references to the repealed Directive shall be construed as references to this Regulation.",
+]
+
+# Article counts for the fixed documents, roughly 2k to 100k characters
+DOCUMENT_SIZES = {"xs": 3, "s": 12, "m": 48, "l": 192}
+QUESTION = "Who is responsible for monitoring the application of this Regulation?"
+
+def build_document(num_articles):
+    articles = [f"Article {i + 1}\n{ARTICLES[i % len(ARTICLES)]}" for i in range(num_articles)]
+    return PREAMBLE + "\n\n".join(articles) + "\n\nThis Regulation shall be binding in its entirety and directly applicable in all Member States.\nDone at Brussels, 27 April 2016."
+
+def stub_transport(tokens_per_second, response_tokens):
+    # Answers /api/generate like Ollama would, taking as long as a model at the given rate
+    words = ("The Regulation sets out obligations for controllers and processors across the Union " * response_tokens).split()[:response_tokens]
+    token_seconds = 1.0 / tokens_per_second
+
+    async def stream_lines():
+        for word in words:
+            await asyncio.sleep(token_seconds)
+            yield (json.dumps({"response": word + " ", "done": False}) + "\n").encode()
+        yield (json.dumps({"response": "", "done": True, "eval_count": len(words), "eval_duration": int(len(words) * token_seconds * 1e9)}) + "\n").encode()
+
+    async def handler(request):
+        if request.url.path != "/api/generate":
+            return httpx.Response(200, text="Ollama is running")
+        if json.loads(request.content).get("stream"):
+            return httpx.Response(200, content=stream_lines())
+        await asyncio.sleep(len(words) * token_seconds)
+        return httpx.Response(200, json={"response": " ".join(words), "done": True, "eval_count": len(words), "eval_duration": int(len(words) * token_seconds * 1e9)})
+
+    return httpx.MockTransport(handler)
+
+def reset_peak_rss():
+    # Linux resets VmHWM when 5 is written to clear_refs; elsewhere the peak is process-wide
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure(func, repeats, setup=None):
+    # tracemalloc hooks every allocation and slows allocation-heavy stages several times
+    # over, so the timed passes run untraced and one extra pass records the Python peak
+    seconds, rss = [], []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        reset_peak_rss()
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+        rss.append(peak_rss_mb())
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        python_peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds_median": round(statistics.median(seconds), 4),
+        "seconds_min": round(min(seconds), 4),
+        "peak_rss_mb": round(max(rss), 1),
+        "python_peak_mb": round(python_peak, 2),
+    }
+
+def clear_caches():
+    summary_store.clear()
+    vectorstore_cache.clear()
+    chunk_embedding_cache.clear()
+
+def benchmark_document(name, text, repeats, loop):
+    chunks = preprocess_eurlex(text, CHUNK_SIZE)
+    vectorstore = parse_document(text)
+    excerpts = [doc.page_content for doc in vectorstore.similarity_search(QUESTION, k=5)]
+    extract = extractive_summary(text)
+
+    stages = {
+        "preprocess_eurlex": (lambda: preprocess_eurlex(text, CHUNK_SIZE), None),
+        "legal_bert_extract": (lambda: [legal_bert_extract(chunk, max_tokens=EXTRACTIVE_MAX_TOKENS) for chunk in chunks], None),
+        "extractive_summary": (lambda: extractive_summary(text), None),
+        "parse_document": (lambda: parse_document(text), clear_caches),
+        "similarity_search": (lambda: vectorstore.similarity_search(QUESTION, k=5), None),
+        "build_summary_prompt": (lambda: build_summary_prompt(extract), None),
+        "build_qa_prompt": (lambda: build_qa_prompt(excerpts, QUESTION), None),
+        # End to end with cold caches; the LLM share is the stub's fixed generation time
+        "summarise_text": (lambda: loop.run_until_complete(summarise_text(text)), clear_caches),
+        "ask_legal_question": (lambda: loop.run_until_complete(ask_legal_question(text, QUESTION)), clear_caches),
+    }
+
+    results = []
+    for stage, (func, setup) in stages.items():
+        result = {"document": name, "chars": len(text), "chunks": len(chunks), "stage": stage, **measure(func, repeats, setup)}
+        print(json.dumps(result), file=sys.stderr)
+        results.append(result)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["document"], r["stage"]): r for r in json.load(f)["results"]}
+    for result in results:
+        before = baseline.get((result["document"], result["stage"]))
+        if before and before["seconds_median"]:
+            ratio = result["seconds_median"] / before["seconds_median"]
+            print(f"{result['document']:>4} {result['stage']:<22} {before['seconds_median']:>9.4f}s -> {result['seconds_median']:>9.4f}s  x{ratio:.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage latency and peak memory of the summarisation and QA pipelines.")
+    parser.add_argument("--documents", nargs="+", default=list(DOCUMENT_SIZES), choices=list(DOCUMENT_SIZES))
+    parser.add_argument("--texts", nargs="+", help="Benchmark these text files instead of the built-in documents")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--tokens-per-second", type=float, default=30.0, help="Generation rate of the stubbed LLM")
+    parser.add_argument("--response-tokens", type=int, default=200)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Earlier JSON report to print per-stage speed ratios against")
+    args = parser.parse_args()
+
+    if args.texts:
+        documents = {}
+        for path in args.texts:
+            with open(path, encoding="utf-8") as f:
+                documents[os.path.basename(path)] = f.read()
+    else:
+        documents = {name: build_document(DOCUMENT_SIZES[name]) for name in args.documents}
+
+    ollama.transport = stub_transport(args.tokens_per_second, args.response_tokens)
+    supervisor.state = "ready"
+    loop = asyncio.new_event_loop()
+
+    results = []
+    for name, text in documents.items():
+        results.extend(benchmark_document(name, text, args.repeats, loop))
+    loop.run_until_complete(ollama.aclose())
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "threads": torch.get_num_threads(),
+        "repeats": args.repeats,
+        "tokens_per_second": args.tokens_per_second,
+        "response_tokens": args.response_tokens,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.baseline:
+        compare(results, args.baseline)
@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Unique (USS), proportional (PSS) and resident (RSS) memory of a server's processes, read
+# from /proc/<pid>/smaps_rollup (Linux 4.14+). USS is what a worker costs on its own: the
+# memory freed if it exited. Weights shared copy-on-write show up in PSS but not in USS.
+
+def smaps_rollup(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields
+
+def process_memory(pid):
+    fields = smaps_rollup(pid)
+    return {
+        "pid": pid,
+        "uss_mb": round((fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        "shared_mb": round((fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)) / 1024, 1),
+    }
+
+def children(pid):
+    pids = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            pids.extend(int(child) for child in f.read().split())
+    return pids
+
+def descendants(pid):
+    pids = children(pid)
+    for child in list(pids):
+        pids.extend(descendants(child))
+    return pids
+
+def server_memory(pid):
+    parent = process_memory(pid)
+    workers = [process_memory(child) for child in descendants(pid)]
+    processes = [parent] + workers
+    return {
+        "parent": parent,
+        "workers": workers,
+        "total_uss_mb": round(sum(p["uss_mb"] for p in processes), 1),
+        # PSS splits shared pages between the processes mapping them, so it sums to real usage
+        "total_pss_mb": round(sum(p["pss_mb"] for p in processes), 1),
+    }
+
+def server_command(mode, workers, port):
+    if mode == "preload":
+        return [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port)]
+    return [sys.executable, "-m", "uvicorn", "app:app", "--workers", str(workers), "--port", str(port)]
+
+def wait_until_ready(url, workers, timeout):
+    # Requests land on arbitrary workers, so require a run of ready answers before measuring
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while time.monotonic() < deadline:
+        try:
+            streak = streak + 1 if httpx.get(f"{url}/readyz", timeout=5).status_code == 200 else 0
+        except httpx.HTTPError:
+            streak = 0
+        if streak >= 3 * workers:
+            return
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} was not ready after {timeout}s")
+
+def launch_and_measure(mode, workers, port, timeout, settle_seconds):
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ)
+    if mode == "uvicorn":
+        # Plain uvicorn workers each warm up their own models
+        env["LEXBRIEF_WARM_UP"] = "1"
+    server = subprocess.Popen(server_command(mode, workers, port), cwd=BACKEND_DIR, env=env)
+    try:
+        wait_until_ready(url, workers, timeout)
+        time.sleep(settle_seconds)
+        return {"mode": mode, "num_workers": workers, **server_memory(server.pid)}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report per-process USS/PSS of a multi-worker server.")
+    parser.add_argument("--pid", type=int, help="Measure this running server (parent pid) instead of launching one")
+    parser.add_argument("--modes", nargs="+", default=["preload", "uvicorn"], choices=["preload", "uvicorn"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=600.0, help="Seconds to wait for the server to become ready")
+    parser.add_argument("--settle-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    if args.pid:
+        print(json.dumps(server_memory(args.pid), indent=2))
+    else:
+        reports = [launch_and_measure(mode, args.workers, args.port, args.timeout, args.settle_seconds) for mode in args.modes]
+        print(json.dumps(reports, indent=2))
+        for report in reports:
+            worker_uss = [w["uss_mb"] for w in report["workers"]]
+            print(f"{report['mode']:>8}: {len(worker_uss)} processes under the parent, USS per worker {worker_uss} MB, "
+                  f"total PSS {report['total_pss_mb']} MB", file=sys.stderr)
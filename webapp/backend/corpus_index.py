@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import threading
+import time
+import numpy as np
+from RAG import EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP, SEPARATORS, get_embeddings
+from act_structure import split_articles, make_splitter
+from shard_manifest import prepare_shard_dir, path_fingerprint
+
+CORPUS_INDEX_DIR = os.environ.get("CORPUS_INDEX_DIR", "./data/corpus-index")
+SHARD_SIZE = 20000
+
+def chunk_corpus_document(celex_id, text):
+    splitter = make_splitter(CHUNK_SIZE, CHUNK_OVERLAP, SEPARATORS, add_start_index=True)
+    chunks = []
+    for article, start, end in split_articles(text):
+        for doc in splitter.create_documents([text[start:end]]):
+            chunk_start = start + doc.metadata["start_index"]
+            chunks.append({
+                "celex_id": celex_id,
+                "article": article,
+                "start": chunk_start,
+                "end": chunk_start + len(doc.page_content),
+                "text": doc.page_content,
+            })
+    return chunks
+
+def read_corpus(source_path, ids_path=None):
+    split = os.path.splitext(os.path.basename(source_path))[0]
+    ids = None
+    if ids_path:
+        with open(ids_path, encoding="utf-8") as f:
+            ids = [line.strip() for line in f]
+    with open(source_path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            text = line.strip()
+            if text:
+                yield (ids[line_no] if ids else f"{split}:{line_no}"), text
+
+def shard_manifest(source_path, ids_path, shard_size):
+    return {
+        "embedding_model": EMBEDDING_MODEL,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "separators": SEPARATORS,
+        "shard_size": shard_size,
+        "source": path_fingerprint(source_path),
+        "ids": path_fingerprint(ids_path) if ids_path else None,
+    }
+
+def build_index(source_path, output_dir=CORPUS_INDEX_DIR, ids_path=None, shard_size=SHARD_SIZE, processes=None, batch_size=64):
+    chunks = [chunk for celex_id, text in read_corpus(source_path, ids_path) for chunk in chunk_corpus_document(celex_id, text)]
+    if not chunks:
+        raise ValueError(f"No passages to index in {source_path}")
+    prepare_shard_dir(output_dir, shard_manifest(source_path, ids_path, shard_size))
+    num_shards = (len(chunks) + shard_size - 1) // shard_size
+    print(f"Chunked corpus into {len(chunks)} passages across {num_shards} shards")
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    pool = model.start_multi_process_pool(["cpu"] * (processes or os.cpu_count()))
+    try:
+        for shard in range(num_shards):
+            embeddings_path = os.path.join(output_dir, f"shard_{shard:05d}.npy")
+            if os.path.exists(embeddings_path):
+                # Completed shards are checkpoints; a restarted build skips them
+                continue
+            shard_chunks = chunks[shard * shard_size:(shard + 1) * shard_size]
+            start = time.time()
+            embeddings = model.encode(
+                [chunk["text"] for chunk in shard_chunks],
+                pool=pool,
+                batch_size=batch_size,
+                normalize_embeddings=True,
+            ).astype("float32")
+            with open(os.path.join(output_dir, f"shard_{shard:05d}.jsonl"), "w", encoding="utf-8") as f:
+                for chunk in shard_chunks:
+                    f.write(json.dumps(chunk) + "\n")
+            # Written last and atomically so a partial shard is never mistaken for a checkpoint
+            np.save(embeddings_path + ".tmp.npy", embeddings)
+            os.replace(embeddings_path + ".tmp.npy", embeddings_path)
+            print(f"Shard {shard + 1}/{num_shards}: {len(shard_chunks) / (time.time() - start):.1f} passages/s")
+    finally:
+        model.stop_multi_process_pool(pool)
+
+    merge_shards(output_dir, num_shards)
+
+def merge_shards(output_dir, num_shards):
+    import faiss
+
+    if num_shards < 1:
+        raise ValueError(f"No shards to merge in {output_dir}")
+    index = None
+    with open(os.path.join(output_dir, "metadata.jsonl"), "w", encoding="utf-8") as out:
+        for shard in range(num_shards):
+            embeddings = np.load(os.path.join(output_dir, f"shard_{shard:05d}.npy"))
+            if index is None:
+                index = faiss.IndexFlatIP(embeddings.shape[1])
+            index.add(embeddings)
+            with open(os.path.join(output_dir, f"shard_{shard:05d}.jsonl"), encoding="utf-8") as f:
+                out.write(f.read())
+    faiss.write_index(index, os.path.join(output_dir, "index.faiss"))
+    print(f"Wrote index with {index.ntotal} passages to {output_dir}")
+
+class CorpusIndex:
+    def __init__(self, index, metadata, embed_query):
+        self.index = index
+        self.metadata = metadata
+        self.embed_query = embed_query
+
+    @classmethod
+    def load(cls, index_dir=CORPUS_INDEX_DIR):
+        import faiss
+
+        index = faiss.read_index(os.path.join(index_dir, "index.faiss"))
+        with open(os.path.join(index_dir, "metadata.jsonl"), encoding="utf-8") as f:
+            metadata = [json.loads(line) for line in f]
+        return cls(index, metadata, lambda query: get_embeddings().embed_query(query))
+
+    def search(self, query, k=10):
+        import faiss
+
+        vector = np.asarray(self.embed_query(query), dtype="float32").reshape(1, -1)
+        faiss.normalize_L2(vector)
+        scores, ids = self.index.search(vector, k)
+        hits = []
+        for score, idx in zip(scores[0], ids[0]):
+            if idx >= 0:
+                hits.append({**self.metadata[idx], "score": float(score)})
+        return hits
+
+def group_by_act(hits):
+    acts = {}
+    for hit in hits:
+        act = acts.setdefault(hit["celex_id"], {"celex_id": hit["celex_id"], "score": hit["score"], "articles": []})
+        act["score"] = max(act["score"], hit["score"])
+        if hit["article"] not in act["articles"]:
+            act["articles"].append(hit["article"])
+    return sorted(acts.values(), key=lambda act: act["score"], reverse=True)
+
+_corpus_index = None
+_corpus_index_lock = threading.Lock()
+
+def get_corpus_index():
+    global _corpus_index
+    if _corpus_index is None:
+        with _corpus_index_lock:
+            if _corpus_index is None:
+                _corpus_index = CorpusIndex.load()
+    return _corpus_index
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the corpus-wide FAISS index used by /search_corpus.")
+    parser.add_argument("source", help="Corpus file with one document per line, e.g. ./data/eur-lexsum/raw-data/train.source")
+    parser.add_argument("--ids", help="Optional file with one CELEX ID per line, aligned with the source file")
+    parser.add_argument("--output-dir", default=CORPUS_INDEX_DIR)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+    build_index(args.source, args.output_dir, args.ids, args.shard_size, args.processes)
@@ -0,0 +1,132 @@
+import asyncio
+import re
+import threading
+import time
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Table, Column, String, Text, Float, JSON, select, delete, func
+from storage import engine, metadata, add_missing_columns
+from act_structure import structure_articles
+
+EURLEX_TTL_SECONDS = 7 * 24 * 60 * 60
+EURLEX_CACHE_MAX_ENTRIES = 500
+
+eurlex_documents = Table(
+    "eurlex_documents",
+    metadata,
+    Column("celex_id", String, primary_key=True),
+    Column("title", Text, nullable=False),
+    Column("text", Text, nullable=False),
+    Column("related_documents", JSON),
+    Column("preamble", Text),
+    Column("articles", JSON),
+    Column("fetched_at", Float, nullable=False),
+    Column("accessed_at", Float, nullable=False, index=True),
+)
+
+def assemble_document(data):
+    preamble = data['preamble']['text']
+    articles = [data['articles'][i]['text'] for i in range(len(data['articles']))]
+    return {
+        'title': re.sub(r'\s+', ' ', data['title'].replace('\n', '')).strip(),
+        'text': preamble + '\n\n' + '\n\n'.join(articles),
+        # The flat text stays for summarisation; QA chunks along the structure below
+        'preamble': preamble,
+        'articles': structure_articles(data['articles']),
+        'related_documents': data['related_documents'],
+    }
+
+class EurlexCache:
+    def __init__(self, engine=engine, ttl=EURLEX_TTL_SECONDS, max_entries=EURLEX_CACHE_MAX_ENTRIES):
+        self.engine = engine
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._inflight = {}
+        self._counter_lock = threading.Lock()
+        metadata.create_all(engine, tables=[eurlex_documents])
+        add_missing_columns(engine, eurlex_documents)
+
+    def get(self, celex_id):
+        now = time.time()
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                select(eurlex_documents).where(eurlex_documents.c.celex_id == celex_id)
+            ).mappings().first()
+            if row is None or now - row["fetched_at"] > self.ttl:
+                with self._counter_lock:
+                    self.misses += 1
+                return None
+            conn.execute(
+                eurlex_documents.update()
+                .where(eurlex_documents.c.celex_id == celex_id)
+                .values(accessed_at=now)
+            )
+        with self._counter_lock:
+            self.hits += 1
+        document = {
+            'title': row["title"],
+            'text': row["text"],
+            'related_documents': row["related_documents"],
+        }
+        # Rows cached before articles were stored only have the flat text
+        if row["articles"] is not None:
+            document['preamble'] = row["preamble"]
+            document['articles'] = row["articles"]
+        return document
+
+    def put(self, celex_id, document):
+        now = time.time()
+        with self.engine.begin() as conn:
+            conn.execute(delete(eurlex_documents).where(eurlex_documents.c.celex_id == celex_id))
+            conn.execute(eurlex_documents.insert().values(
+                celex_id=celex_id,
+                title=document['title'],
+                text=document['text'],
+                related_documents=document['related_documents'],
+                preamble=document.get('preamble'),
+                articles=document.get('articles'),
+                fetched_at=now,
+                accessed_at=now,
+            ))
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute(delete(eurlex_documents).where(eurlex_documents.c.fetched_at < now - self.ttl))
+        count = conn.execute(select(func.count()).select_from(eurlex_documents)).scalar()
+        if count > self.max_entries:
+            oldest = (
+                select(eurlex_documents.c.celex_id)
+                .order_by(eurlex_documents.c.accessed_at)
+                .limit(count - self.max_entries)
+            )
+            conn.execute(delete(eurlex_documents).where(eurlex_documents.c.celex_id.in_(oldest)))
+
+    def clear(self):
+        with self.engine.begin() as conn:
+            conn.execute(delete(eurlex_documents))
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "in_flight": len(self._inflight)}
+
+    async def get_or_fetch(self, celex_id, loader):
+        document = await run_in_threadpool(self.get, celex_id)
+        if document is not None:
+            return document
+
+        # Concurrent misses for the same CELEX ID all wait on one fetch
+        task = self._inflight.get(celex_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load(celex_id, loader))
+            self._inflight[celex_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(celex_id, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, celex_id, loader):
+        document = await loader(celex_id)
+        await run_in_threadpool(self.put, celex_id, document)
+        return document
+
+eurlex_cache = EurlexCache()
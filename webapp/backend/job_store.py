@@ -0,0 +1,107 @@
+import os
+import time
+from sqlalchemy import Table, Column, String, Text, Float, Integer, Boolean, Index, select, update, delete
+from sqlalchemy.exc import IntegrityError
+from storage import engine, metadata
+from jobs import Job, ACTIVE_STATUSES, FINISHED_JOBS_KEPT
+
+# Summary jobs shared by every worker process: serve.py forks workers behind one socket, so
+# the request polling a job rarely lands on the worker that accepted it. Each worker still
+# runs its own jobs; the table is how the others see their state and ask for cancellation.
+
+summary_jobs = Table(
+    "summary_jobs",
+    metadata,
+    Column("id", String(32), primary_key=True),
+    Column("key", String(64), nullable=False),
+    Column("status", String(16), nullable=False),
+    Column("result", Text),
+    Column("error", Text),
+    Column("created_at", Float, nullable=False),
+    Column("started_at", Float),
+    Column("finished_at", Float),
+    Column("worker_pid", Integer, nullable=False),
+    Column("cancel_requested", Boolean, nullable=False, default=False),
+)
+# At most one queued or running job per input, whichever worker accepted it
+Index(
+    "summary_jobs_active_key", summary_jobs.c.key, unique=True,
+    sqlite_where=summary_jobs.c.status.in_(ACTIVE_STATUSES),
+    postgresql_where=summary_jobs.c.status.in_(ACTIVE_STATUSES),
+)
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class JobStore:
+    def __init__(self, engine=engine, finished_kept=FINISHED_JOBS_KEPT):
+        self.engine = engine
+        self.finished_kept = finished_kept
+        metadata.create_all(engine, tables=[summary_jobs])
+
+    def add(self, job):
+        # False when another worker already holds an active job for the same input
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(summary_jobs.insert().values(
+                    id=job.id, key=job.key, status=job.status, created_at=job.created_at,
+                    worker_pid=os.getpid(), cancel_requested=False,
+                ))
+        except IntegrityError:
+            return False
+        return True
+
+    def save(self, job):
+        with self.engine.begin() as conn:
+            conn.execute(update(summary_jobs).where(summary_jobs.c.id == job.id).values(
+                status=job.status, result=job.result, error=job.error,
+                started_at=job.started_at, finished_at=job.finished_at,
+            ))
+            if not job.active:
+                self._prune(conn)
+
+    def get(self, job_id):
+        with self.engine.connect() as conn:
+            row = conn.execute(select(summary_jobs).where(summary_jobs.c.id == job_id)).first()
+        return self._job(row)
+
+    def find_active(self, key):
+        with self.engine.connect() as conn:
+            row = conn.execute(select(summary_jobs).where(
+                summary_jobs.c.key == key, summary_jobs.c.status.in_(ACTIVE_STATUSES))).first()
+        return self._job(row)
+
+    def request_cancel(self, job_id):
+        with self.engine.begin() as conn:
+            conn.execute(update(summary_jobs).where(
+                summary_jobs.c.id == job_id, summary_jobs.c.status.in_(ACTIVE_STATUSES)).values(cancel_requested=True))
+
+    def cancel_requested(self, job_ids):
+        with self.engine.connect() as conn:
+            return set(conn.execute(select(summary_jobs.c.id).where(
+                summary_jobs.c.id.in_(job_ids), summary_jobs.c.cancel_requested)).scalars())
+
+    def _prune(self, conn):
+        kept = (select(summary_jobs.c.id).where(summary_jobs.c.finished_at.is_not(None))
+                .order_by(summary_jobs.c.finished_at.desc()).limit(self.finished_kept))
+        conn.execute(delete(summary_jobs).where(summary_jobs.c.finished_at.is_not(None), summary_jobs.c.id.not_in(kept)))
+
+    def _job(self, row):
+        if row is None:
+            return None
+        job = Job.restore(row.id, row.key, row.status, row.result, row.error, row.created_at, row.started_at, row.finished_at)
+        if job.active and not process_alive(row.worker_pid):
+            # The worker running it exited (crashed or was restarted) before finishing
+            job.status = "failed"
+            job.error = "The worker running this job exited before it finished."
+            job.finished_at = time.time()
+            self.save(job)
+        return job
+
+job_store = JobStore()
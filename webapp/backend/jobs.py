@@ -0,0 +1,211 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+JOB_WORKERS = int(os.environ.get("SUMMARY_JOB_WORKERS", "2"))
+JOB_QUEUE_DEPTH = int(os.environ.get("SUMMARY_JOB_QUEUE_DEPTH", "32"))
+FINISHED_JOBS_KEPT = 256
+# How often a worker looks for cancellations requested through another worker
+CANCEL_POLL_SECONDS = float(os.environ.get("SUMMARY_JOB_CANCEL_POLL_SECONDS", "0.5"))
+ACTIVE_STATUSES = ("queued", "running")
+
+class QueueFullError(RuntimeError):
+    pass
+
+class JobCancelledError(RuntimeError):
+    pass
+
+# Cancelling a job cancels its asyncio task, but work already handed to run_in_threadpool
+# keeps running; thread-side stages call raise_if_cancelled() between steps to stop early.
+# run_in_threadpool copies the calling context, so the job's event is visible in the thread.
+_cancel_event = contextvars.ContextVar("job_cancel_event", default=None)
+
+def current_cancel_event():
+    # The running job's cancel event, for work that blocks outside the job's own thread
+    return _cancel_event.get()
+
+def raise_if_cancelled():
+    event = _cancel_event.get()
+    if event is not None and event.is_set():
+        raise JobCancelledError("Job was cancelled.")
+
+class Job:
+    __slots__ = ("id", "key", "text", "status", "result", "error", "created_at", "started_at", "finished_at", "task", "cancel_event")
+
+    def __init__(self, key, text):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.text = text
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+        self.cancel_event = threading.Event()
+
+    @classmethod
+    def restore(cls, id, key, status, result, error, created_at, started_at, finished_at):
+        job = cls(key, None)
+        job.id = id
+        job.status = status
+        job.result = result
+        job.error = error
+        job.created_at = created_at
+        job.started_at = started_at
+        job.finished_at = finished_at
+        return job
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATUSES
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+class JobManager:
+    # With a store (job_store.JobStore), jobs are visible to and cancellable from every
+    # process sharing its database, and one input maps to one active job across all of them
+    def __init__(self, handler, key_func, workers=JOB_WORKERS, queue_depth=JOB_QUEUE_DEPTH, store=None):
+        self.handler = handler
+        self.key_func = key_func
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.store = store
+        self._jobs = OrderedDict()
+        self._active_by_key = {}
+        self._queue = None
+        self._worker_tasks = []
+
+    def start(self):
+        if not self._worker_tasks:
+            self._queue = asyncio.Queue(maxsize=self.queue_depth)
+            self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            if self.store is not None:
+                self._worker_tasks.append(asyncio.create_task(self._watch_cancellations()))
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        for job in list(self._jobs.values()):
+            if job.active:
+                self._finish(job, "cancelled")
+
+    def submit(self, text):
+        key = self.key_func(text)
+        existing = self._active_by_key.get(key)
+        if existing is None and self.store is not None:
+            existing = self.store.find_active(key)
+        if existing is not None:
+            # Identical input already queued or running: share its job
+            return existing
+        if self._queue.full():
+            raise QueueFullError(f"Summarisation queue is full ({self.queue_depth} jobs waiting).")
+        job = Job(key, text)
+        if self.store is not None:
+            while not self.store.add(job):
+                # Another worker accepted the same input since the lookup
+                existing = self.store.find_active(key)
+                if existing is not None:
+                    return existing
+        self._queue.put_nowait(job)
+        self._jobs[job.id] = job
+        self._active_by_key[key] = job
+        return job
+
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.get(job_id)
+        return job
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            # Owned by another worker, which stops it within CANCEL_POLL_SECONDS
+            self.store.request_cancel(job_id)
+            return self.store.get(job_id)
+        if job is None or not job.active:
+            return job
+        job.cancel_event.set()
+        if job.task is not None:
+            job.task.cancel()
+        else:
+            # Still queued; the worker drops it when dequeued
+            self._finish(job, "cancelled")
+        return job
+
+    def stats(self):
+        counts = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.workers, "queue_depth": self.queue_depth, "queued": self._queue.qsize() if self._queue else 0, "jobs": counts}
+
+    def _finish(self, job, status, result=None, error=None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        job.task = None
+        job.text = None
+        if self._active_by_key.get(job.key) is job:
+            del self._active_by_key[job.key]
+        if self.store is not None:
+            self.store.save(job)
+        self._prune()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self._jobs[job_id]
+
+    async def _run(self, job):
+        _cancel_event.set(job.cancel_event)
+        return await self.handler(job.text)
+
+    async def _watch_cancellations(self):
+        while True:
+            await asyncio.sleep(CANCEL_POLL_SECONDS)
+            active = [job.id for job in self._jobs.values() if job.active]
+            if active:
+                for job_id in self.store.cancel_requested(active):
+                    self.cancel(job_id)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status != "queued":
+                    continue
+                job.status = "running"
+                job.started_at = time.time()
+                if self.store is not None:
+                    self.store.save(job)
+                job.task = asyncio.create_task(self._run(job))
+                try:
+                    result = await job.task
+                except asyncio.CancelledError:
+                    self._finish(job, "cancelled")
+                    if asyncio.current_task().cancelling():
+                        # The worker itself is being stopped, not just this job
+                        raise
+                except Exception as e:
+                    self._finish(job, "failed", error=str(e))
+                else:
+                    self._finish(job, "done", result=result)
+            finally:
+                self._queue.task_done()
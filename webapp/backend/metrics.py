@@ -0,0 +1,343 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from starlette.routing import Match
+
+# Minimal Prometheus text-format metrics (exposition format 0.0.4), kept dependency free.
+
+logger = logging.getLogger(__name__)
+
+# Forked workers (serve.py) each hold their own values. With LEXBRIEF_METRICS_DIR set, every
+# worker writes its samples there and /metrics on any worker renders all of them combined:
+# counters and histograms are summed over every worker that ever ran, gauges over the live ones.
+METRICS_DIR = os.environ.get("LEXBRIEF_METRICS_DIR")
+METRICS_FLUSH_SECONDS = 1.0
+
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class Metric:
+    kind = "untyped"
+    # Values that cannot be summed across workers (ratios) get a worker label instead
+    per_worker = False
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0.0)
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0.0)
+
+class GaugeFunction(Metric):
+    # Read at scrape time from a callback returning {label tuple: value}
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames, func, per_worker=False):
+        super().__init__(name, documentation, labelnames)
+        self.func = func
+        self.per_worker = per_worker
+
+    def samples(self):
+        for key, value in self.func().items():
+            if value is not None:
+                yield self.name, tuple(zip(self.labelnames, key)), value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state["count"] if state else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, {"counts": list(state["counts"]), "sum": state["sum"], "count": state["count"]}) for key, state in self._values.items()]
+        for key, state in items:
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + (("le", format_value(bound)),), cumulative
+            yield f"{self.name}_sum", labels, state["sum"]
+            yield f"{self.name}_count", labels, state["count"]
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def gauge_function(self, name, documentation, labelnames, func, per_worker=False):
+        return self.register(GaugeFunction(name, documentation, labelnames, func, per_worker))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def clear(self):
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def render(self):
+        return self._render((metric, metric.samples()) for metric in self._metrics.values())
+
+    def _render(self, collected):
+        lines = []
+        for metric, samples in collected:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, directory, pid=None):
+        # Gauges go to live_<pid>.json, dropped once the worker dies; counters and
+        # histograms to total_<pid>.json, kept so totals never go backwards
+        pid = pid or os.getpid()
+        files = {"live": {}, "total": {}}
+        for metric in self._metrics.values():
+            samples = [[name, labels, value] for name, labels, value in metric.samples()]
+            files["live" if metric.kind == "gauge" else "total"][metric.name] = samples
+        for prefix, data in files.items():
+            path = os.path.join(directory, f"{prefix}_{pid}.json")
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(path + ".tmp", path)
+
+    def render_merged(self, directory):
+        self.write_snapshot(directory)
+        merged = {name: {} for name in self._metrics}
+        for path in sorted(glob.glob(os.path.join(directory, "*_*.json"))):
+            pid = os.path.basename(path)[:-len(".json")].split("_", 1)[1]
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                # Removed by mark_process_dead since the listing
+                continue
+            for metric_name, samples in data.items():
+                if metric_name not in merged:
+                    continue
+                per_worker = self._metrics[metric_name].per_worker
+                for name, labels, value in samples:
+                    labels = tuple(tuple(label) for label in labels) + ((("worker", pid),) if per_worker else ())
+                    merged[metric_name][(name, labels)] = merged[metric_name].get((name, labels), 0.0) + value
+        return self._render(
+            (metric, [(name, labels, value) for (name, labels), value in merged[metric.name].items()])
+            for metric in self._metrics.values()
+        )
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "lexbrief_http_requests_total", "HTTP requests by route template and status code.", ("method", "endpoint", "status"))
+http_in_flight = registry.gauge(
+    "lexbrief_http_requests_in_flight", "HTTP requests currently being served.", ("method", "endpoint"))
+http_duration = registry.histogram(
+    "lexbrief_http_request_duration_seconds", "Time until the last byte of the response body, streams included.", ("method", "endpoint"))
+stage_duration = registry.histogram(
+    "lexbrief_stage_duration_seconds", "Time spent in each pipeline stage.", ("stage",))
+ollama_tokens = registry.counter(
+    "lexbrief_ollama_tokens_total", "Tokens reported by Ollama, by model and kind (prompt or completion).", ("model", "kind"))
+ollama_generation = registry.histogram(
+    "lexbrief_ollama_generation_seconds", "Ollama eval_duration per generation.", ("model",))
+ollama_prompt_eval = registry.histogram(
+    "lexbrief_ollama_prompt_eval_seconds", "Ollama prompt_eval_duration per generation.", ("model",))
+classifier_batch_sentences = registry.histogram(
+    "lexbrief_classifier_batch_sentences", "Sentences per micro-batched LegalBERT forward pass.", buckets=BATCH_BUCKETS)
+classifier_batch_requests = registry.histogram(
+    "lexbrief_classifier_batch_requests", "Distinct callers merged into each micro-batched forward pass.", buckets=BATCH_BUCKETS)
+
+def stage_timer(stage):
+    return stage_duration.time(stage=stage)
+
+def record_generation(model, response):
+    # Fields come from the final /api/generate message; absent fields (e.g. cached prompts) are skipped
+    if response.get("prompt_eval_count") is not None:
+        ollama_tokens.inc(response["prompt_eval_count"], model=model, kind="prompt")
+    if response.get("eval_count") is not None:
+        ollama_tokens.inc(response["eval_count"], model=model, kind="completion")
+    if response.get("eval_duration") is not None:
+        ollama_generation.observe(response["eval_duration"] / 1e9, model=model)
+    if response.get("prompt_eval_duration") is not None:
+        ollama_prompt_eval.observe(response["prompt_eval_duration"] / 1e9, model=model)
+
+def record_classifier_batch(sentences, requests):
+    classifier_batch_sentences.observe(sentences)
+    classifier_batch_requests.observe(requests)
+
+def register_caches(caches):
+    # caches maps a cache name to a callable returning (hits, misses)
+    def lookups():
+        values = {}
+        for name, stats in caches.items():
+            hits, misses = stats()
+            values[(name, "hit")] = hits
+            values[(name, "miss")] = misses
+        return values
+
+    def hit_ratios():
+        values = {}
+        for name, stats in caches.items():
+            hits, misses = stats()
+            values[(name,)] = hits / (hits + misses) if hits + misses else None
+        return values
+
+    registry.gauge_function("lexbrief_cache_lookups", "Cache lookups since start or last clear, by result.", ("cache", "result"), lookups)
+    registry.gauge_function("lexbrief_cache_hit_ratio", "Cache hits divided by lookups since start or last clear.", ("cache",), hit_ratios, per_worker=True)
+
+def render_metrics():
+    return registry.render_merged(METRICS_DIR) if METRICS_DIR else registry.render()
+
+def start_snapshots(directory=METRICS_DIR, interval=METRICS_FLUSH_SECONDS):
+    # Keeps this worker's samples current for scrapes served by the other workers
+    def flush():
+        while True:
+            time.sleep(interval)
+            try:
+                registry.write_snapshot(directory)
+            except OSError:
+                logger.exception("Could not write metrics snapshot to %s", directory)
+
+    thread = threading.Thread(target=flush, name="metrics-snapshot", daemon=True)
+    thread.start()
+    return thread
+
+def mark_process_dead(pid, directory=METRICS_DIR):
+    # Called by the parent when a worker exits: its gauges no longer describe anything
+    try:
+        os.remove(os.path.join(directory, f"live_{pid}.json"))
+    except FileNotFoundError:
+        pass
+
+def route_template(scope):
+    # Label by route template, not raw path, so IDs in URLs do not explode cardinality
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method, endpoint = scope["method"], route_template(scope)
+        status = {"code": 500}
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_in_flight.inc(method=method, endpoint=endpoint)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec(method=method, endpoint=endpoint)
+            http_requests.inc(method=method, endpoint=endpoint, status=status["code"])
+            http_duration.observe(time.perf_counter() - start, method=method, endpoint=endpoint)
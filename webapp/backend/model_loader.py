@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import threading
+import time
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+class LazyModel:
+    # Loads on first get(); concurrent first callers wait on one load instead of racing
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.state = "not_loaded"
+        self.error = None
+        self.load_seconds = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.state == "ready"
+
+    def get(self):
+        if self.state != "ready":
+            with self._lock:
+                if self.state != "ready":
+                    self.state = "loading"
+                    start = time.perf_counter()
+                    try:
+                        self._value = self.loader()
+                    except Exception as e:
+                        self.state = "failed"
+                        self.error = str(e)
+                        raise
+                    self.load_seconds = round(time.perf_counter() - start, 3)
+                    self.error = None
+                    self.state = "ready"
+                    logger.info("Loaded %s in %.1fs", self.name, self.load_seconds)
+        return self._value
+
+    def status(self):
+        return {"state": self.state, "load_seconds": self.load_seconds, "error": self.error}
+
+models = {}
+
+def lazy_model(name, loader):
+    model = models[name] = LazyModel(name, loader)
+    return model
+
+def model_status():
+    return {name: model.status() for name, model in models.items()}
+
+def share_memory():
+    # Move loaded tensors into shared memory so forked workers map the parent's copy.
+    # Wrappers such as HuggingFaceEmbeddings keep their torch module on _client.
+    shared = []
+    for name, model in models.items():
+        if not model.loaded:
+            continue
+        module = model._value if hasattr(model._value, "share_memory") else getattr(model._value, "_client", None)
+        if hasattr(module, "share_memory"):
+            module.share_memory()
+            shared.append(name)
+    return shared
+
+class WarmUp:
+    # Loads every model and runs one dummy inference per pipeline, off the event loop
+    def __init__(self):
+        self.steps = {}
+        self.state = "pending"
+        self.error = None
+        self._task = None
+
+    def add(self, name, func):
+        self.steps[name] = func
+
+    def run(self):
+        self.state = "running"
+        for name, func in self.steps.items():
+            try:
+                func()
+            except Exception as e:
+                logger.exception("Warm-up step %s failed", name)
+                self.state = "failed"
+                self.error = f"{name}: {e}"
+                return
+        self.state = "done"
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(run_in_threadpool(self.run))
+        return self._task
+
+    @property
+    def ready(self):
+        return self.state == "done" and all(model.loaded for model in models.values())
+
+    def status(self):
+        return {"state": self.state, "error": self.error}
+
+warm_up = WarmUp()
@@ -1,8 +1,21 @@
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
-class QARequest(BaseModel):
+class Article(BaseModel):
+    number: str
     text: str
+
+class QARequest(BaseModel):
+    # Structured acts send celex_id, preamble and articles so retrieval can chunk per article
+    text: str = ""
     question: str
+    celex_id: Optional[str] = None
+    preamble: Optional[str] = None
+    articles: Optional[List[Article]] = None
 
 class SumRequest(BaseModel):
-    text: str
\ No newline at end of file
+    text: str
+
+class CorpusSearchRequest(BaseModel):
+    question: str
+    k: int = Field(10, ge=1, le=100)
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import subprocess
+import time
+import httpx
+from metrics import stage_timer, stage_duration, record_generation
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_URL = "http://localhost:11434"
+# Start `ollama serve` when no server answers; off where another process (or nothing) owns it
+SPAWN_OLLAMA = os.environ.get("LEXBRIEF_SPAWN_OLLAMA", "1") == "1"
+
+class OllamaUnavailableError(RuntimeError):
+    pass
+
+class OllamaClient:
+    def __init__(self, base_url=OLLAMA_URL, max_connections=10, timeout=300.0, transport=None):
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.transport = transport
+        self._client = None
+
+    @property
+    def client(self):
+        # Created on first use so it binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=5.0),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def ping(self):
+        try:
+            response = await self.client.get("/", timeout=2.0)
+            return response.status_code == 200
+        except httpx.TransportError:
+            return False
+
+    async def generate(self, prompt, model, temperature=0.1):
+        payload = {"model": model, "prompt": prompt, "stream": False, "options": {"temperature": temperature}}
+        try:
+            with stage_timer("llm"):
+                response = await self.client.post("/api/generate", json=payload)
+        except httpx.TransportError:
+            supervisor.report_failure()
+            raise
+        response.raise_for_status()
+        data = response.json()
+        record_generation(model, data)
+        return data
+
+    async def stream(self, prompt, model, temperature=0.1):
+        payload = {"model": model, "prompt": prompt, "stream": True, "options": {"temperature": temperature}}
+        start = time.perf_counter()
+        try:
+            async with self.client.stream("POST", "/api/generate", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line:
+                        chunk = json.loads(line)
+                        if chunk.get("done"):
+                            record_generation(model, chunk)
+                        yield chunk
+        except httpx.TransportError:
+            supervisor.report_failure()
+            raise
+        finally:
+            stage_duration.observe(time.perf_counter() - start, stage="llm")
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class OllamaSupervisor:
+    def __init__(self, client, poll_interval=15.0, initial_backoff=0.5, max_backoff=30.0, spawn_server=True):
+        self.client = client
+        self.poll_interval = poll_interval
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.spawn_server = spawn_server
+        self.state = "stopped"
+        self.last_error = None
+        self._process = None
+        self._task = None
+        self._wake = None
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def status(self):
+        return {"state": self.state, "url": self.client.base_url, "last_error": self.last_error}
+
+    def require_ready(self):
+        if not self.ready:
+            raise OllamaUnavailableError(f"Ollama server is not ready (state: {self.state}).")
+
+    def report_failure(self):
+        # Called by request paths on connection errors; the supervisor re-probes immediately
+        if self.state == "ready":
+            self.state = "unavailable"
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self.state = "starting"
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.state = "stopped"
+
+    @property
+    def server_running(self):
+        return self._process is not None and self._process.poll() is None
+
+    def spawn(self):
+        if not self.spawn_server or self.server_running:
+            return
+        if shutil.which("ollama") is None:
+            self.last_error = "ollama executable not found"
+            return
+        logger.info("Starting Ollama server...")
+        self._process = subprocess.Popen(["ollama", "serve"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    async def check(self):
+        if await self.client.ping():
+            self.state = "ready"
+            self.last_error = None
+            return True
+        return False
+
+    async def run(self):
+        backoff = self.initial_backoff
+        while True:
+            if await self.check():
+                backoff = self.initial_backoff
+                delay = self.poll_interval
+            else:
+                self.spawn()
+                self.state = "unavailable"
+                delay = backoff
+                backoff = min(backoff * 2, self.max_backoff)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+ollama = OllamaClient()
+supervisor = OllamaSupervisor(ollama, spawn_server=SPAWN_OLLAMA)
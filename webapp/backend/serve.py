@@ -0,0 +1,144 @@
+import argparse
+import gc
+import glob
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+
+# Workers inherit models that the parent has already loaded, so they must not warm up again
+os.environ["LEXBRIEF_WARM_UP"] = "0"
+# Workers only probe Ollama; the parent starts it once so they do not race to spawn it
+SPAWN_OLLAMA = os.environ.get("LEXBRIEF_SPAWN_OLLAMA", "1") == "1"
+os.environ["LEXBRIEF_SPAWN_OLLAMA"] = "0"
+# Each worker writes its metrics here so a scrape of any worker reports all of them
+OWN_METRICS_DIR = "LEXBRIEF_METRICS_DIR" not in os.environ
+if OWN_METRICS_DIR:
+    os.environ["LEXBRIEF_METRICS_DIR"] = tempfile.mkdtemp(prefix="lexbrief-metrics-")
+
+import httpx
+import torch
+import uvicorn
+from app import app
+from model_loader import warm_up, model_status, share_memory
+from ollama_client import ollama, OllamaSupervisor
+from metrics import registry, mark_process_dead, METRICS_DIR
+from storage import engine
+
+logger = logging.getLogger("serve")
+
+# Preload-and-fork serving: load every model once in this process, then fork uvicorn workers
+# that share the weights copy-on-write instead of each loading their own copy.
+
+RESTART_DELAY_SECONDS = 1.0
+OLLAMA_CHECK_SECONDS = 15.0
+
+ollama_supervisor = OllamaSupervisor(ollama, spawn_server=SPAWN_OLLAMA)
+
+def supervise_ollama():
+    if not SPAWN_OLLAMA or ollama_supervisor.server_running:
+        return
+    try:
+        if httpx.get(ollama.base_url, timeout=2.0).status_code == 200:
+            return
+    except httpx.HTTPError:
+        pass
+    ollama_supervisor.spawn()
+
+def preload():
+    # No intra-op thread pool may exist at fork time; OpenMP pools do not survive fork
+    torch.set_num_threads(1)
+    start = time.perf_counter()
+    warm_up.run()
+    if warm_up.status()["state"] != "done":
+        raise RuntimeError(f"Warm-up failed: {warm_up.status()['error']}")
+    shared = share_memory()
+    # Objects created so far are never collected; keeping the GC off them stops it writing
+    # to their headers, which would otherwise copy every touched page into each worker
+    gc.collect()
+    gc.freeze()
+    # Warm-up timings are counted once, from here, and workers start from zero; the parent
+    # serves no requests, so none of its gauges are reported
+    registry.write_snapshot(METRICS_DIR)
+    mark_process_dead(os.getpid())
+    logger.info("Preloaded %s in %.1fs; shared tensors of %s", ", ".join(model_status()), time.perf_counter() - start, ", ".join(shared))
+
+def run_worker(sock, threads, log_level):
+    # Connections pooled by the parent during warm-up belong to the parent; an in-memory
+    # database only exists in its inherited connection, so each worker keeps its own copy
+    if engine.url.database not in (None, "", ":memory:"):
+        engine.dispose(close=False)
+    registry.clear()
+    torch.set_num_threads(threads)
+    config = uvicorn.Config(app, log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+def bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+def serve(host, port, workers, threads, log_level):
+    if workers > 1 and engine.url.database in (None, "", ":memory:"):
+        logger.warning("An in-memory database is private to each worker; summary jobs will not be visible across workers")
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        # Left over from an earlier run in the same directory
+        os.remove(path)
+    supervise_ollama()
+    preload()
+    sock = bind_socket(host, port)
+    context = multiprocessing.get_context("fork")
+    stopping = False
+
+    def spawn():
+        process = context.Process(target=run_worker, args=(sock, threads, log_level), daemon=False)
+        process.start()
+        logger.info("Started worker %d", process.pid)
+        return process
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    processes = [spawn() for _ in range(workers)]
+    next_ollama_check = time.monotonic() + OLLAMA_CHECK_SECONDS
+    while not stopping:
+        time.sleep(0.5)
+        for i, process in enumerate(processes):
+            if not process.is_alive() and not stopping:
+                logger.warning("Worker %d exited with %s; restarting", process.pid, process.exitcode)
+                mark_process_dead(process.pid)
+                time.sleep(RESTART_DELAY_SECONDS)
+                processes[i] = spawn()
+        if time.monotonic() >= next_ollama_check:
+            supervise_ollama()
+            next_ollama_check = time.monotonic() + OLLAMA_CHECK_SECONDS
+
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+    sock.close()
+    if OWN_METRICS_DIR:
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the API from forked workers that share one copy of the models.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, help="Torch threads per worker (default: cores divided by workers)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+    serve(args.host, args.port, args.workers, threads, args.log_level)
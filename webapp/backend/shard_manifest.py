@@ -0,0 +1,38 @@
+import glob
+import json
+import os
+
+# Resumable builds (corpus_index.build_index and scripts/summarisation/inference_runner.py)
+# write their output in shards and skip shards already on disk. manifest.json next to the
+# shards records what they were computed from; when that changes the old shards are deleted
+# rather than mixed with new ones.
+
+MANIFEST_NAME = "manifest.json"
+
+def path_fingerprint(path):
+    # Size and mtime of a file, or of every file under a directory (a local model); anything
+    # else, such as a Hugging Face model id, stands for itself
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return [[os.path.abspath(path), stat.st_size, stat.st_mtime]]
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        return [entry for file in files for entry in path_fingerprint(file)]
+    return [path]
+
+def prepare_shard_dir(directory, manifest, pattern="shard_*"):
+    # manifest must be JSON-native (dicts, lists, strings, numbers) to compare equal on reload
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            if json.load(f) == manifest:
+                return
+    stale = glob.glob(os.path.join(directory, pattern))
+    if stale:
+        print(f"Shards in {directory} were built from different inputs or settings; discarding {len(stale)} files.")
+    for path in stale:
+        os.remove(path)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
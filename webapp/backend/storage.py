@@ -0,0 +1,26 @@
+import os
+from sqlalchemy import create_engine, MetaData, inspect, text
+from sqlalchemy.pool import StaticPool
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexbrief.db")
+DB_URL = os.environ.get("LEXBRIEF_DB_URL", f"sqlite:///{DEFAULT_DB_PATH}")
+
+metadata = MetaData()
+
+def make_engine(url=DB_URL):
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        # A single shared connection keeps an in-memory database alive across threads
+        return create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    if url.startswith("sqlite"):
+        return create_engine(url, connect_args={"check_same_thread": False, "timeout": 30})
+    return create_engine(url)
+
+engine = make_engine()
+
+def add_missing_columns(engine, table):
+    # create_all never alters an existing table; nullable columns added since are added here
+    existing = {column["name"] for column in inspect(engine).get_columns(table.name)}
+    with engine.begin() as conn:
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}'))
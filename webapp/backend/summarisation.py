@@ -1,38 +1,127 @@
-import spacy
+import asyncio
+import logging
+import os
 import re
+from concurrent.futures import CancelledError
 import numpy as np
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
 from nltk.tokenize import sent_tokenize
-from rouge_score import rouge_scorer
-from langchain_ollama import OllamaLLM
-import subprocess
+from fastapi.concurrency import run_in_threadpool
+from ollama_client import ollama, supervisor
+from summary_store import summary_store, content_key
+from jobs import raise_if_cancelled, current_cancel_event
+from metrics import stage_timer, record_classifier_batch
+from batching import MicroBatcher
+from model_loader import lazy_model, warm_up
 import torch
-import time
-import requests
 
-nlp = spacy.load("en_core_web_sm", disable=["ner", "lemmatizer"])
+logger = logging.getLogger(__name__)
 
 LEGAL_BERT_MODEL = "emmabry/legalBERTft"
-tokenizer = AutoTokenizer.from_pretrained(LEGAL_BERT_MODEL)
-model = AutoModelForSequenceClassification.from_pretrained(LEGAL_BERT_MODEL)
-model.eval()
+CLASSIFIER_BATCH_SIZE = 32
+CLASSIFIER_BACKENDS = ("eager", "int8", "torchscript", "compile")
+CLASSIFIER_BACKEND = os.environ.get("LEGAL_BERT_BACKEND", "eager")
+# Concurrent requests share forward passes on one thread instead of each running their own
+CLASSIFIER_MICRO_BATCHING = os.environ.get("LEGAL_BERT_MICRO_BATCHING", "1") == "1"
+CLASSIFIER_MAX_WAIT_MS = float(os.environ.get("LEGAL_BERT_MAX_WAIT_MS", "5"))
+SEGMENTER_MODEL = "en_core_web_sm"
+CHUNK_SIZE = 1500
+CHUNK_OVERLAP = 3
+EXTRACTIVE_MAX_TOKENS = 1024
+SUMMARY_MODEL = "llama3"
+SUMMARY_TEMPERATURE = 0.1
+# Bump whenever build_summary_prompt changes so stored summaries are regenerated
+SUMMARY_PROMPT_VERSION = 1
+# "single" sends all extracts in one prompt; "map_reduce" summarises chunks concurrently and merges them
+SUMMARY_MODE = os.environ.get("SUMMARY_MODE", "single")
+MAP_CONCURRENCY = int(os.environ.get("SUMMARY_MAP_CONCURRENCY", "4"))
+REDUCE_INPUT_TOKENS = 3000
+MAP_REDUCE_PROMPT_VERSION = 1
+# Cleaned sentences never contain newlines, so chunk extracts are newline-separated
+CHUNK_SEPARATOR = "\n"
 
-def check_ollama_server():
-    try:
-        response = requests.get("http://localhost:11434")
-        return response.status_code == 200
-    except requests.ConnectionError:
-        return False
-
-def start_ollama_server():
-    if not check_ollama_server():
-        print("Starting Ollama server...")
-        subprocess.Popen(["ollama", "serve"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        time.sleep(5)
-    if not check_ollama_server():
-        raise RuntimeError("Failed to start Ollama server. Ensure it's installed and port 11434 is free.")
+def _load_nlp():
+    import spacy
+    return spacy.load(SEGMENTER_MODEL, disable=["ner", "lemmatizer"])
 
-def preprocess_eurlex(text, chunk_size=1024):
+def _load_tokenizer():
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(LEGAL_BERT_MODEL)
+
+def _load_model():
+    from transformers import AutoModelForSequenceClassification
+    model = AutoModelForSequenceClassification.from_pretrained(LEGAL_BERT_MODEL)
+    model.eval()
+    return model
+
+# Nothing is loaded at import; the app's warm-up (or the first request) loads each model once
+_nlp = lazy_model("segmenter", _load_nlp)
+_tokenizer = lazy_model("legal_bert_tokenizer", _load_tokenizer)
+_model = lazy_model("legal_bert", _load_model)
+_classifier = lazy_model("classifier", lambda: load_classifier(get_model()))
+
+def get_nlp():
+    return _nlp.get()
+
+def get_tokenizer():
+    return _tokenizer.get()
+
+def get_model():
+    return _model.get()
+
+def get_classifier():
+    return _classifier.get()
+
+class LogitsModule(torch.nn.Module):
+    # Tuple-free forward so every backend (including TorchScript) has the same call signature
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask, return_dict=False)[0]
+
+def load_classifier(model, backend=CLASSIFIER_BACKEND):
+    if backend not in CLASSIFIER_BACKENDS:
+        raise ValueError(f"Unknown classifier backend '{backend}'. Expected one of {', '.join(CLASSIFIER_BACKENDS)}.")
+    if backend == "int8":
+        # Dynamic quantisation returns a copy; the eager model stays fp32
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    classifier = LogitsModule(model).eval()
+
+    if backend == "torchscript":
+        example = get_tokenizer()(["This Regulation shall enter into force.", "It applies."], padding=True, return_tensors="pt")
+        with torch.no_grad():
+            traced = torch.jit.trace(classifier, (example["input_ids"], example["attention_mask"]), strict=False)
+        classifier = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+    elif backend == "compile":
+        classifier = torch.compile(classifier, dynamic=True)
+    return classifier
+
+class Sentence:
+    __slots__ = ("start", "end", "input_ids", "token_count", "label")
+
+    def __init__(self, start, end, input_ids):
+        self.start = start
+        self.end = end
+        self.input_ids = input_ids
+        self.token_count = len(input_ids)
+        self.label = None
+
+class SegmentedDocument:
+    __slots__ = ("text", "sentences")
+
+    def __init__(self, text, sentences):
+        self.text = text
+        self.sentences = sentences
+
+    def sentence_text(self, index):
+        sent = self.sentences[index]
+        return self.text[sent.start:sent.end]
+
+    def join(self, indices):
+        return " ".join(self.sentence_text(i) for i in indices)
+
+def clean_eurlex(text):
     text = re.sub(
         r"\[\d+\]|\(\d+\)|Official Journal.*?L \d+/\d+|^\s*Having regard.*?\n|"
         r"^\s*Whereas.*?\n|^ANNEX.*?\n|//.*?\);",
@@ -40,39 +129,123 @@ def preprocess_eurlex(text, chunk_size=1024):
         text,
         flags=re.MULTILINE
     )
-    text = re.sub(r"\s+", " ", text).strip()
+    return re.sub(r"\s+", " ", text).strip()
+
+def segment_document(text):
+    with stage_timer("cleaning"):
+        text = clean_eurlex(text)
+
+    with stage_timer("segmentation"):
+        doc = get_nlp()(text)
 
-    doc = nlp(text)
-    sentences = [sent.text.strip() for sent in doc.sents if len(sent.text.strip()) > 10]
+        spans = []
+        for sent in doc.sents:
+            raw = sent.text
+            stripped = raw.strip()
+            if len(stripped) > 10:
+                start = sent.start_char + (len(raw) - len(raw.lstrip()))
+                spans.append((start, start + len(stripped)))
 
+        # One batched tokenizer call covers chunking, classification and budgeting
+        texts = [text[start:end] for start, end in spans]
+        encodings = get_tokenizer()(texts)["input_ids"] if texts else []
+    sentences = [Sentence(start, end, ids) for (start, end), ids in zip(spans, encodings)]
+    return SegmentedDocument(text, sentences)
+
+def chunk_document(document, chunk_size=1024, overlap=3):
     chunks, current_chunk, current_tokens = [], [], 0
-    for sent in sentences:
-        tokens = len(tokenizer(sent)["input_ids"])
-        if current_tokens + tokens <= chunk_size:
-            current_chunk.append(sent)
-            current_tokens += tokens
+    for index, sent in enumerate(document.sentences):
+        if current_tokens + sent.token_count <= chunk_size:
+            current_chunk.append(index)
+            current_tokens += sent.token_count
         else:
-            chunks.append(" ".join(current_chunk))
-            overlap = 3
+            chunks.append(current_chunk)
             overlap_start = max(0, len(current_chunk) - overlap)
-            current_chunk = current_chunk[overlap_start:] + [sent]
-            current_tokens = sum(len(tokenizer(s)["input_ids"]) for s in current_chunk)
+            current_chunk = current_chunk[overlap_start:] + [index]
+            current_tokens = sum(document.sentences[i].token_count for i in current_chunk)
     if current_chunk:
-        chunks.append(" ".join(current_chunk))
+        chunks.append(current_chunk)
     return chunks
 
-def legal_bert_extract(text, max_tokens=512):
+def preprocess_eurlex(text, chunk_size=1024):
+    document = segment_document(text)
+    return [document.join(chunk) for chunk in chunk_document(document, chunk_size)]
+
+def truncate_ids(ids, max_length=512):
+    if len(ids) > max_length:
+        # Same truncation as tokenizer(..., truncation=True): keep [CLS] and the final [SEP]
+        return ids[:max_length - 1] + ids[-1:]
+    return ids
+
+def predict_batch(batch_ids, backend=None):
+    backend = get_classifier() if backend is None else backend
+    inputs = get_tokenizer().pad({"input_ids": batch_ids}, return_tensors="pt")
+    with torch.no_grad():
+        logits = backend(inputs["input_ids"], inputs["attention_mask"])
+    return torch.argmax(logits, dim=1).tolist()
+
+classifier_batcher = MicroBatcher(
+    predict_batch, max_batch=CLASSIFIER_BATCH_SIZE, max_wait=CLASSIFIER_MAX_WAIT_MS / 1000, on_batch=record_classifier_batch)
+
+def classify_encodings(encodings, batch_size=CLASSIFIER_BATCH_SIZE, max_length=512, backend=None):
+    # backend lets callers such as the parity tests and benchmarks pass a specific loaded classifier
+    # Sorting by length keeps padding within each batch to a minimum
+    order = sorted(range(len(encodings)), key=lambda i: len(encodings[i]))
+    ordered = [truncate_ids(encodings[i], max_length) for i in order]
+    predictions = [0] * len(encodings)
+
+    with stage_timer("classification"):
+        # Shared passes are CLASSIFIER_BATCH_SIZE wide; a caller asking for another size runs its own
+        if backend is None and CLASSIFIER_MICRO_BATCHING and batch_size == CLASSIFIER_BATCH_SIZE:
+            # A cancelled job's sentences still waiting in the batcher are dropped
+            try:
+                labels = classifier_batcher(ordered, cancel_event=current_cancel_event())
+            except CancelledError:
+                raise_if_cancelled()
+                raise
+        else:
+            labels = []
+            for start in range(0, len(ordered), batch_size):
+                raise_if_cancelled()
+                labels.extend(predict_batch(ordered[start:start + batch_size], backend))
+
+    for i, label in zip(order, labels):
+        predictions[i] = label
+    return predictions
+
+def classify_sentences(sentences, batch_size=CLASSIFIER_BATCH_SIZE, max_length=512, backend=None):
+    # Encode every sentence once; the full-length ids double as token counts
+    encodings = get_tokenizer()(sentences)["input_ids"] if sentences else []
+    predictions = classify_encodings(encodings, batch_size=batch_size, max_length=max_length, backend=backend)
+    return predictions, [len(ids) for ids in encodings]
+
+def classify_document(document, batch_size=CLASSIFIER_BATCH_SIZE):
+    # Sentences shared by overlapping chunks keep the label from their first pass
+    pending = [sent for sent in document.sentences if sent.label is None]
+    predictions = classify_encodings([sent.input_ids for sent in pending], batch_size=batch_size)
+    for sent, pred in zip(pending, predictions):
+        sent.label = pred
+
+def extract_chunk(document, chunk, max_tokens=512):
+    selected, current_tokens = [], 0
+    for index in chunk:
+        sent = document.sentences[index]
+        if sent.label == 1:
+            if current_tokens + sent.token_count <= max_tokens:
+                selected.append(index)
+                current_tokens += sent.token_count
+            else:
+                break
+    return document.join(selected)
+
+def legal_bert_extract(text, max_tokens=512, batch_size=CLASSIFIER_BATCH_SIZE):
     sentences = sent_tokenize(text)
+    predictions, token_counts = classify_sentences(sentences, batch_size=batch_size)
     selected_sentences = []
     current_tokens = 0
 
-    for sent in sentences:
-        inputs = tokenizer(sent, return_tensors="pt", truncation=True, max_length=512)
-        with torch.no_grad():
-            logits = model(**inputs).logits
-            pred = torch.argmax(logits, dim=1).item()
+    for sent, pred, tokens in zip(sentences, predictions, token_counts):
         if pred == 1:
-            tokens = len(tokenizer(sent)["input_ids"])
             if current_tokens + tokens <= max_tokens:
                 selected_sentences.append(sent)
                 current_tokens += tokens
@@ -80,9 +253,19 @@ def legal_bert_extract(text, max_tokens=512):
                 break
     return " ".join(selected_sentences)
 
-def llama_summary(text, model_name="llama3"):
-    llm = OllamaLLM(model=model_name, temperature=0.1)
-    prompt = (
+def extractive_summary(text, chunk_size=CHUNK_SIZE, max_tokens=EXTRACTIVE_MAX_TOKENS):
+    document = segment_document(text)
+    raise_if_cancelled()
+    chunks = chunk_document(document, chunk_size, overlap=CHUNK_OVERLAP)
+    classify_document(document)
+    raise_if_cancelled()
+    extractive_summaries = [extract_chunk(document, chunk, max_tokens) for chunk in chunks]
+    return CHUNK_SEPARATOR.join(filter(None, extractive_summaries))
+
+warm_up.add("summarisation", lambda: extractive_summary("This Regulation shall enter into force on the twentieth day. It applies to all Member States."))
+
+def build_summary_prompt(text):
+    return (
     f'''You are a summarisation engine for official EU legal and policy documents.
 Summarise the document below in two distinct sections:
 
@@ -105,19 +288,172 @@ TEXT:
 Output the SUMMARY section first, then the KEY INSIGHTS section clearly labeled.
 '''
 )
+
+def build_map_prompt(text):
+    return f'''You are a summarisation engine for official EU legal and policy documents.
+The text below is one excerpt of a longer document. Summarise it in a single short, formal paragraph.
+Keep every obligation, scope condition, date and legal reference it contains. Do not invent information
+and do not introduce the summary.
+
+TEXT:
+{text}
+
+SUMMARY:
+'''
+
+def build_reduce_prompt(text):
+    return f'''You are a summarisation engine for official EU legal and policy documents.
+The partial summaries below cover consecutive parts of one document. Merge them into a single short,
+formal paragraph that keeps every obligation, scope condition, date and legal reference, removes
+repetition and does not invent information. Do not introduce the summary.
+
+PARTIAL SUMMARIES:
+{text}
+
+MERGED SUMMARY:
+'''
+
+def llm_token_estimate(text):
+    # LegalBERT word pieces are a close enough proxy for LLaMa tokens to size reduce groups
+    return len(get_tokenizer()(text)["input_ids"])
+
+def group_partials(partials, max_tokens=REDUCE_INPUT_TOKENS):
+    groups, current, current_tokens = [], [], 0
+    for partial in partials:
+        tokens = llm_token_estimate(partial)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(partial)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+async def map_reduce(chunk_summaries, model_name=SUMMARY_MODEL, concurrency=None):
+    semaphore = asyncio.Semaphore(concurrency or MAP_CONCURRENCY)
+
+    async def generate(prompt):
+        async with semaphore:
+            response = await ollama.generate(prompt, model_name, temperature=SUMMARY_TEMPERATURE)
+        return response["response"].strip()
+
+    partials = await asyncio.gather(*[generate(build_map_prompt(chunk)) for chunk in chunk_summaries])
+    while len(partials) > 1 and llm_token_estimate("\n\n".join(partials)) > REDUCE_INPUT_TOKENS:
+        groups = group_partials(partials, REDUCE_INPUT_TOKENS)
+        if len(groups) == len(partials):
+            # Every partial already fills a group on its own; merging pairs still shrinks the input
+            groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+        partials = await asyncio.gather(*[generate(build_reduce_prompt("\n\n".join(group))) for group in groups])
+    return "\n\n".join(partials)
+
+async def summary_input(full_extractive_summary, mode=None):
+    if (mode or SUMMARY_MODE) == "map_reduce":
+        chunk_summaries = [chunk for chunk in full_extractive_summary.split(CHUNK_SEPARATOR) if chunk]
+        return await map_reduce(chunk_summaries)
+    return full_extractive_summary
+
+async def llama_summary(text, model_name=SUMMARY_MODEL):
+    try:
+        response = await ollama.generate(build_summary_prompt(text), model_name, temperature=SUMMARY_TEMPERATURE)
+        return response["response"].strip()
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+async def llama_summary_stream(text, model_name=SUMMARY_MODEL):
+    async for chunk in ollama.stream(build_summary_prompt(text), model_name, temperature=SUMMARY_TEMPERATURE):
+        if chunk.get("response"):
+            yield chunk["response"]
+
+def summary_keys(text):
+    extractive_key = content_key(text, {
+        "segmenter": SEGMENTER_MODEL,
+        "classifier": LEGAL_BERT_MODEL,
+        # Quantised and compiled backends can flip labels, so each keeps its own extracts
+        "backend": CLASSIFIER_BACKEND,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "max_tokens": EXTRACTIVE_MAX_TOKENS,
+        "chunk_separator": CHUNK_SEPARATOR,
+    })
+    # Chained off the extractive key, so a prompt or model change only invalidates the LLM stage
+    abstractive_key = content_key(extractive_key, {
+        "model": SUMMARY_MODEL,
+        "temperature": SUMMARY_TEMPERATURE,
+        "prompt_version": SUMMARY_PROMPT_VERSION,
+        "mode": SUMMARY_MODE,
+        "map_reduce_prompt_version": MAP_REDUCE_PROMPT_VERSION if SUMMARY_MODE == "map_reduce" else None,
+        # The reduce budget decides how partials are grouped and merged, so it shapes the output
+        "reduce_input_tokens": REDUCE_INPUT_TOKENS if SUMMARY_MODE == "map_reduce" else None,
+    })
+    return extractive_key, abstractive_key
+
+def stored_extractive_summary(text, extractive_key):
+    summary = summary_store.get_extractive(extractive_key)
+    if summary is None:
+        summary = extractive_summary(text, chunk_size=CHUNK_SIZE, max_tokens=EXTRACTIVE_MAX_TOKENS)
+        summary_store.put_extractive(extractive_key, summary)
+    return summary
+
+async def summarise_text(text):
+    extractive_key, abstractive_key = summary_keys(text)
+    stored = await run_in_threadpool(summary_store.get_abstractive, abstractive_key)
+    if stored is not None:
+        return stored
+
+    supervisor.require_ready()
+    full_extractive_summary = await run_in_threadpool(stored_extractive_summary, text, extractive_key)
+
+    logger.debug("Extractive summary: %s", full_extractive_summary)
     try:
-        return llm.invoke(prompt).strip()
+        reduced_summary = await summary_input(full_extractive_summary)
     except Exception as e:
         return f"Error: {str(e)}"
+    abstractive_summary = await llama_summary(reduced_summary)
+    logger.debug("Abstractive summary: %s", abstractive_summary)
+
+    if not abstractive_summary.startswith("Error:"):
+        await run_in_threadpool(summary_store.put_abstractive, abstractive_key, extractive_key, abstractive_summary)
+    return abstractive_summary
+
+class SummaryError(RuntimeError):
+    pass
+
+async def summarise_text_or_raise(text):
+    # summarise_text reports LLM failures in the returned text for the synchronous endpoint;
+    # the job API needs them raised so the job ends as failed with the error set
+    summary = await summarise_text(text)
+    if summary.startswith("Error:"):
+        raise SummaryError(summary[len("Error:"):].strip())
+    return summary
 
-def summarise_text(text):
-    start_ollama_server()
-    chunks = preprocess_eurlex(text, chunk_size=1500)
-    extractive_summaries = [legal_bert_extract(chunk, max_tokens=1024) for chunk in chunks]
-    full_extractive_summary = " ".join(filter(None, extractive_summaries))
-
-    print("\nExtractive Summary:\n", full_extractive_summary)
-    abstractive_summary = llama_summary(full_extractive_summary)
-    print("\nAbstractive Summary:\n", abstractive_summary)
-    
-    return abstractive_summary
\ No newline at end of file
+async def summarise_text_stream(text):
+    extractive_key, abstractive_key = summary_keys(text)
+    yield {"event": "status", "stage": "extraction"}
+    full_extractive_summary = await run_in_threadpool(stored_extractive_summary, text, extractive_key)
+    yield {"event": "extractive_summary", "text": full_extractive_summary}
+
+    stored = await run_in_threadpool(summary_store.get_abstractive, abstractive_key)
+    if stored is not None:
+        yield {"event": "token", "text": stored}
+        yield {"event": "done"}
+        return
+
+    supervisor.require_ready()
+    tokens = []
+    try:
+        if SUMMARY_MODE == "map_reduce":
+            yield {"event": "status", "stage": "map_reduce"}
+        reduced_summary = await summary_input(full_extractive_summary)
+        yield {"event": "status", "stage": "generation"}
+        async for token in llama_summary_stream(reduced_summary):
+            tokens.append(token)
+            yield {"event": "token", "text": token}
+    except Exception as e:
+        yield {"event": "error", "detail": f"Error: {str(e)}"}
+        return
+    abstractive_summary = "".join(tokens).strip()
+    # An empty generation is not a summary; storing it would serve it to every later request
+    if abstractive_summary:
+        await run_in_threadpool(summary_store.put_abstractive, abstractive_key, extractive_key, abstractive_summary)
+    yield {"event": "done"}
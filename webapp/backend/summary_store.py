@@ -0,0 +1,76 @@
+import hashlib
+import json
+import threading
+import time
+from sqlalchemy import Table, Column, String, Text, Float, select, delete
+from storage import engine, metadata
+
+extractive_summaries = Table(
+    "extractive_summaries",
+    metadata,
+    Column("key", String(64), primary_key=True),
+    Column("summary", Text, nullable=False),
+    Column("created_at", Float, nullable=False),
+)
+
+abstractive_summaries = Table(
+    "abstractive_summaries",
+    metadata,
+    Column("key", String(64), primary_key=True),
+    Column("extractive_key", String(64), nullable=False, index=True),
+    Column("summary", Text, nullable=False),
+    Column("created_at", Float, nullable=False),
+)
+
+def content_key(content, config):
+    # Config is serialised with sorted keys so dict ordering never changes the hash
+    settings = json.dumps(config, sort_keys=True)
+    return hashlib.sha256(f"{settings}\n{content}".encode("utf-8")).hexdigest()
+
+class SummaryStore:
+    def __init__(self, engine=engine):
+        self.engine = engine
+        self.hits = {"extractive": 0, "abstractive": 0}
+        self.misses = {"extractive": 0, "abstractive": 0}
+        self._counter_lock = threading.Lock()
+        metadata.create_all(engine, tables=[extractive_summaries, abstractive_summaries])
+
+    def _get(self, table, stage, key):
+        with self.engine.connect() as conn:
+            summary = conn.execute(select(table.c.summary).where(table.c.key == key)).scalar()
+        with self._counter_lock:
+            if summary is None:
+                self.misses[stage] += 1
+            else:
+                self.hits[stage] += 1
+        return summary
+
+    def get_extractive(self, key):
+        return self._get(extractive_summaries, "extractive", key)
+
+    def get_abstractive(self, key):
+        return self._get(abstractive_summaries, "abstractive", key)
+
+    def put_extractive(self, key, summary):
+        with self.engine.begin() as conn:
+            conn.execute(delete(extractive_summaries).where(extractive_summaries.c.key == key))
+            conn.execute(extractive_summaries.insert().values(key=key, summary=summary, created_at=time.time()))
+
+    def put_abstractive(self, key, extractive_key, summary):
+        with self.engine.begin() as conn:
+            conn.execute(delete(abstractive_summaries).where(abstractive_summaries.c.key == key))
+            conn.execute(abstractive_summaries.insert().values(
+                key=key, extractive_key=extractive_key, summary=summary, created_at=time.time()
+            ))
+
+    def clear(self):
+        with self.engine.begin() as conn:
+            conn.execute(delete(abstractive_summaries))
+            conn.execute(delete(extractive_summaries))
+        self.hits = {"extractive": 0, "abstractive": 0}
+        self.misses = {"extractive": 0, "abstractive": 0}
+
+    def stats(self):
+        return {"hits": dict(self.hits), "misses": dict(self.misses)}
+
+summary_store = SummaryStore()
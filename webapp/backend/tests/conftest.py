@@ -0,0 +1,8 @@
+import os
+
+# Keep caches out of the developer's on-disk database during tests
+os.environ.setdefault("LEXBRIEF_DB_URL", "sqlite://")
+# Models load on demand in tests; the background warm-up would only duplicate that work
+os.environ.setdefault("LEXBRIEF_WARM_UP", "0")
+# The app lifespan must never start a real `ollama serve` from whatever is on the host's PATH
+os.environ.setdefault("LEXBRIEF_SPAWN_OLLAMA", "0")
@@ -1,12 +1,13 @@
+import asyncio
+import numpy as np
 from unittest.mock import patch
 from RAG import ask_legal_question
 
-@patch("RAG.OllamaLLM.invoke")
-@patch("RAG.start_ollama_server")
+@patch("RAG.ollama.generate")
+@patch("RAG.supervisor")
 @patch("RAG.parse_document")
-def test_ask_legal_question(mock_parse, mock_start, mock_invoke):
-    mock_start.return_value = None
-    mock_invoke.return_value = "Legal answer"
+def test_ask_legal_question(mock_parse, mock_supervisor, mock_generate):
+    mock_generate.return_value = {"response": "Legal answer"}
     
     class MockVectorStore:
         def similarity_search(self, question, k):
@@ -15,5 +16,146 @@ def test_ask_legal_question(mock_parse, mock_start, mock_invoke):
     
     mock_parse.return_value = MockVectorStore()
     
-    response = ask_legal_question("Doc text", "What is the obligation?")
+    response = asyncio.run(ask_legal_question("Doc text", "What is the obligation?"))
     assert "Legal answer" == response
+
+@patch("RAG.build_vectorstore")
+def test_parse_document_reuses_cached_vectorstore(mock_build):
+    from RAG import parse_document, vectorstore_cache
+    vectorstore_cache.clear()
+    mock_build.side_effect = lambda sections, celex_id=None: object()
+
+    first = parse_document("Doc text")
+    second = parse_document("Doc text")
+
+    assert first is second
+    assert mock_build.call_count == 1
+    assert vectorstore_cache.stats()["hits"] == 1
+    assert vectorstore_cache.stats()["misses"] == 1
+
+def test_vectorstore_cache_evicts_least_recently_used():
+    from RAG import VectorstoreCache
+    cache = VectorstoreCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+@patch("RAG.ollama.stream")
+@patch("RAG.supervisor")
+@patch("RAG.retrieve_excerpts")
+def test_ask_legal_question_stream_sends_excerpts_first(mock_retrieve, mock_supervisor, mock_stream):
+    from RAG import ask_legal_question_stream
+
+    async def chunks():
+        yield {"response": "Legal ", "done": False}
+        yield {"response": "answer", "done": False}
+        yield {"response": "", "done": True, "eval_count": 2}
+
+    async def collect():
+        return [event async for event in ask_legal_question_stream("Doc text", "What is the obligation?")]
+
+    mock_retrieve.return_value = ["Doc excerpt 1", "Doc excerpt 2"]
+    mock_stream.return_value = chunks()
+
+    events = asyncio.run(collect())
+
+    assert events[0] == {"event": "excerpts", "excerpts": ["Doc excerpt 1", "Doc excerpt 2"]}
+    assert [e["text"] for e in events if e["event"] == "token"] == ["Legal ", "answer"]
+    assert events[-1] == {"event": "done"}
+
+class CountingEmbeddings:
+    # Bag-of-keywords vectors are enough to check the rerank and the memoisation
+    KEYWORDS = ["controller", "supervisory", "authority", "compensation", "repealed"]
+
+    def __init__(self):
+        self.embedded = []
+
+    def vector(self, text):
+        text = text.lower()
+        return [float(text.count(word)) for word in self.KEYWORDS]
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.vector(text)
+
+def test_hybrid_index_embeds_only_lexical_candidates_once():
+    from RAG import HybridIndex
+    chunks = [f"Recital {i} on the free movement of goods." for i in range(200)] + [
+        "The supervisory authority shall monitor the application.",
+        "Any person shall have the right to receive compensation.",
+    ]
+    embeddings = CountingEmbeddings()
+    index = HybridIndex(chunks, embeddings, candidates=5)
+
+    # Only the chunks sharing a term with the question are embedded
+    assert index.search("Which supervisory authority monitors the application?", k=1)[0][0] == 200
+    assert len(embeddings.embedded) == 5
+    index.search("Which supervisory authority monitors the application?", k=1)
+    assert len(embeddings.embedded) == 5
+    assert index.search("Who may claim compensation?", k=1)[0][0] == 201
+    assert index.embedded < len(chunks)
+
+def test_chunk_embeddings_are_reused_across_documents():
+    from RAG import embed_chunks, chunk_embedding_cache
+    chunk_embedding_cache.clear()
+    embeddings = CountingEmbeddings()
+    article = "The supervisory authority shall monitor the application."
+
+    embed_chunks([article, "Consolidated text of Article 2 on compensation."], embeddings)
+    embed_chunks([article, "Amended Article 2 on compensation."], embeddings)
+
+    assert embeddings.embedded.count(article) == 1
+    assert len(embeddings.embedded) == 3
+
+def test_chunks_stay_within_articles_and_carry_metadata():
+    from RAG import chunk_sections, CHUNK_SIZE
+    long_article = "Article 3\n" + "The controller shall keep records of processing activities. " * 40
+    sections = [("preamble", "Whereas: (1) Recital."), ("Article 1", "Article 1\nShort."), ("Article 3", long_article)]
+
+    chunks, metadatas = chunk_sections(sections, celex_id="32016R0679")
+
+    assert chunks[:2] == ["Whereas: (1) Recital.", "Article 1\nShort."]
+    assert all(len(chunk) <= CHUNK_SIZE for chunk in chunks)
+    # The heading stays with its text and long articles break at sentence ends
+    assert chunks[2].startswith("Article 3\nThe controller")
+    assert all(chunk.endswith("activities.") for chunk in chunks[2:])
+    assert {m["article"] for m in metadatas[2:]} == {"Article 3"}
+    assert all(m["celex_id"] == "32016R0679" for m in metadatas)
+
+class FlatL2Store:
+    # Stands in for the FAISS store: chunk ids are positions in a flat L2 index
+    def __init__(self, chunks, metadatas, embeddings):
+        from RAG import embed_chunks
+        self.index = self
+        self.vectors = np.stack(embed_chunks(chunks, embeddings))
+
+    def search(self, queries, k):
+        distances = ((self.vectors - queries[0]) ** 2).sum(axis=1)
+        positions = np.argsort(distances, kind="stable")[:k]
+        return distances[positions][None, :], positions[None, :]
+
+@patch("RAG.build_dense_vectorstore", side_effect=FlatL2Store)
+def test_hybrid_index_falls_back_to_dense_without_lexical_matches(mock_build):
+    from RAG import HybridIndex, chunk_embedding_cache, vectorstore_cache
+    chunk_embedding_cache.clear()
+    vectorstore_cache.clear()
+    chunks = [f"Recital {i} on the free movement of goods." for i in range(10)] + ["Each supervisory authority monitors compliance."]
+    embeddings = CountingEmbeddings()
+    index = HybridIndex(chunks, embeddings, candidates=3, dense_key="dense-doc")
+
+    # No token of the question occurs in any chunk, yet the dense search still finds the authority
+    assert index.search("Who acts as supervisoryauthority?", k=1)[0][0] == 10
+    assert index.search("Who acts as supervisoryauthority?", k=1)[0][0] == 10
+    # The dense store is built once and cached where dense mode would look for it
+    assert mock_build.call_count == 1
+    assert vectorstore_cache.get("dense-doc") is index.dense_store()
+    assert sorted(embeddings.embedded) == sorted(chunks)
+    assert index.embedded == 0
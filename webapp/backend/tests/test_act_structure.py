@@ -0,0 +1,22 @@
+from act_structure import article_number, structure_articles, document_sections
+
+def test_article_number_reads_heading_or_falls_back_to_position():
+    assert article_number("Article 12a\nTransparent information", 0) == "12a"
+    assert article_number("  Article 3\nDefinitions", 5) == "3"
+    assert article_number("Member States shall ensure compliance.", 5) == "6"
+
+def test_structure_articles_numbers_each_article():
+    articles = structure_articles([{"text": "Article 1\nSubject-matter"}, {"text": "Article 2\nScope"}])
+    assert [article["number"] for article in articles] == ["1", "2"]
+
+def test_structured_sections_follow_the_articles():
+    sections = document_sections(
+        "ignored flat text", preamble="Whereas: (1) Recital.",
+        articles=[{"number": "1", "text": "Article 1\nSubject-matter"}, {"number": "2", "text": "Article 2\nScope"}])
+    assert sections == [("preamble", "Whereas: (1) Recital."), ("Article 1", "Article 1\nSubject-matter"), ("Article 2", "Article 2\nScope")]
+
+def test_flat_text_is_split_at_article_headings():
+    text = "THE EUROPEAN PARLIAMENT,\nWhereas:\n\nArticle 1\nSubject-matter as referred to in Article 2 thereof\n\nArticle 2\nScope"
+    sections = document_sections(text)
+    assert [label for label, _ in sections] == ["preamble", "Article 1", "Article 2"]
+    assert "".join(section for _, section in sections) == text
@@ -1,11 +1,19 @@
+import json
+import time
 from fastapi.testclient import TestClient
 from unittest.mock import patch
-from app import app
+from app import app, summary_jobs
+from eurlex_cache import eurlex_cache
 
 client = TestClient(app)
 
+async def async_events(events):
+    for event in events:
+        yield event
+
 @patch("app.get_data_by_celex_id")
 def test_eurlex_endpoint(mock_get):
+    eurlex_cache.clear()
     mock_get.return_value = {
         "title": "Test Title",
         "preamble": {"text": "Preamble text"},
@@ -17,6 +25,36 @@ def test_eurlex_endpoint(mock_get):
     data = response.json()
     assert "Test Title" in data["title"]
     assert "Preamble text" in data["text"]
+    assert data["preamble"] == "Preamble text"
+    assert data["articles"] == [{"number": "1", "text": "Article 1"}]
+
+@patch("app.get_data_by_celex_id")
+def test_eurlex_endpoint_serves_repeat_requests_from_cache(mock_get):
+    eurlex_cache.clear()
+    mock_get.return_value = {
+        "title": "Test\n  Title",
+        "preamble": {"text": "Preamble text"},
+        "articles": [{"text": "Article 1"}],
+        "related_documents": ["doc1"]
+    }
+    first = client.get("/eurlex/32016R0679")
+    second = client.get("/eurlex/32016R0679")
+    assert first.json() == second.json()
+    assert second.json()["title"] == "Test Title"
+    assert mock_get.call_count == 1
+
+@patch("app.get_data_by_celex_id")
+def test_eurlex_endpoint_does_not_cache_missing_documents(mock_get):
+    eurlex_cache.clear()
+    mock_get.return_value = {
+        "title": "",
+        "preamble": {"text": ""},
+        "articles": [],
+        "related_documents": []
+    }
+    assert client.get("/eurlex/000").status_code == 404
+    assert client.get("/eurlex/000").status_code == 404
+    assert mock_get.call_count == 2
 
 @patch("app.ask_legal_question")
 def test_ask_question_endpoint(mock_ask):
@@ -26,6 +64,25 @@ def test_ask_question_endpoint(mock_ask):
     assert response.status_code == 200
     assert response.json()["response"] == "Legal answer"
 
+@patch("app.ask_legal_question")
+def test_ask_question_endpoint_passes_article_structure(mock_ask):
+    mock_ask.return_value = "Legal answer"
+    payload = {
+        "question": "Who monitors the Regulation?",
+        "celex_id": "32016R0679",
+        "preamble": "Preamble text",
+        "articles": [{"number": "51", "text": "Article 51\nSupervisory authority"}],
+    }
+    response = client.post("/ask_question", json=payload)
+    assert response.status_code == 200
+    mock_ask.assert_called_once_with(
+        "", "Who monitors the Regulation?", celex_id="32016R0679", preamble="Preamble text",
+        articles=[{"number": "51", "text": "Article 51\nSupervisory authority"}])
+
+def test_ask_question_requires_a_document():
+    response = client.post("/ask_question", json={"question": "What is the obligation?"})
+    assert response.status_code == 422
+
 @patch("app.summarise_text")
 def test_summarise_text_endpoint(mock_summarise):
     mock_summarise.return_value = "Abstractive summary"
@@ -33,3 +90,87 @@ def test_summarise_text_endpoint(mock_summarise):
     response = client.post("/summarise_text", json=payload)
     assert response.status_code == 200
     assert "Abstractive summary" in response.json()["summary"]
+
+@patch("app.supervisor")
+@patch("app.summarise_text_stream")
+def test_summarise_text_stream_endpoint(mock_stream, mock_supervisor):
+    mock_stream.return_value = async_events([
+        {"event": "extractive_summary", "text": "Extract"},
+        {"event": "token", "text": "Abs"},
+        {"event": "token", "text": "tract"},
+        {"event": "done"},
+    ])
+    response = client.post("/summarise_text/stream", json={"text": "Some legal text."})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0]["event"] == "extractive_summary"
+    assert "".join(e["text"] for e in events if e["event"] == "token") == "Abstract"
+
+@patch("app.supervisor")
+@patch("app.ask_legal_question_stream")
+def test_ask_question_stream_endpoint(mock_stream, mock_supervisor):
+    mock_stream.return_value = async_events([
+        {"event": "excerpts", "excerpts": ["Doc excerpt 1"]},
+        {"event": "token", "text": "Legal answer"},
+        {"event": "done"},
+    ])
+    payload = {"text": "Doc text", "question": "What is the obligation?"}
+    response = client.post("/ask_question/stream", json=payload)
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0] == {"event": "excerpts", "excerpts": ["Doc excerpt 1"]}
+    assert events[-1] == {"event": "done"}
+
+def test_summarise_text_stream_returns_503_when_ollama_not_ready():
+    response = client.post("/summarise_text/stream", json={"text": "Some legal text."})
+    assert response.status_code == 503
+
+def test_summarise_job_lifecycle():
+    async def fake_summarise(text):
+        return "Job summary"
+
+    with patch.object(summary_jobs, "handler", fake_summarise), TestClient(app) as lifespan_client:
+        submitted = lifespan_client.post("/summarise_jobs", json={"text": "Some legal text."})
+        assert submitted.status_code == 202
+        job_id = submitted.json()["job_id"]
+
+        for _ in range(100):
+            if lifespan_client.get(f"/summarise_jobs/{job_id}").json()["status"] == "done":
+                break
+            time.sleep(0.01)
+        result = lifespan_client.get(f"/summarise_jobs/{job_id}/result")
+        assert result.status_code == 200
+        assert result.json()["summary"] == "Job summary"
+
+    assert client.get("/summarise_jobs/missing").status_code == 404
+
+def test_metrics_endpoint_exposes_request_and_cache_metrics():
+    client.get("/")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'lexbrief_http_requests_total{method="GET",endpoint="/",status="200"}' in response.text
+    assert "# TYPE lexbrief_stage_duration_seconds histogram" in response.text
+    assert 'lexbrief_cache_lookups{cache="eurlex",result="hit"}' in response.text
+
+def test_healthz_reports_model_states_without_loading_them():
+    response = client.get("/healthz")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ok"
+    assert {"segmenter", "legal_bert", "classifier", "embeddings"} <= set(data["models"])
+    assert "warm_up" in data and "ollama" in data
+
+@patch("app.warm_up")
+def test_readyz_is_503_until_warm_up_finishes(mock_warm_up):
+    mock_warm_up.status.return_value = {"state": "running", "error": None}
+    mock_warm_up.ready = False
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["status"] == "not_ready"
+
+    mock_warm_up.ready = True
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
@@ -0,0 +1,147 @@
+import threading
+import time
+import pytest
+from batching import MicroBatcher
+
+def test_concurrent_callers_share_forward_passes():
+    batches = []
+
+    def run_batch(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    batcher = MicroBatcher(run_batch, max_batch=64, max_wait=0.05)
+    results = {}
+    barrier = threading.Barrier(8)
+
+    def caller(n):
+        barrier.wait()
+        results[n] = batcher([n * 100 + i for i in range(3)])
+
+    threads = [threading.Thread(target=caller, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {n: [(n * 100 + i) * 10 for i in range(3)] for n in range(8)}
+    assert len(batches) < 8
+    assert sum(len(batch) for batch in batches) == 24
+
+def test_large_requests_are_split_at_max_batch():
+    sizes = []
+
+    def run_batch(items):
+        sizes.append(len(items))
+        return items
+
+    batcher = MicroBatcher(run_batch, max_batch=4, max_wait=0.001)
+    assert batcher(list(range(10))) == list(range(10))
+    assert sizes == [4, 4, 2]
+
+def test_lone_caller_waits_at_most_max_wait():
+    batcher = MicroBatcher(lambda items: items, max_batch=64, max_wait=0.02)
+    start = time.perf_counter()
+    assert batcher([1]) == [1]
+    assert time.perf_counter() - start < 0.5
+    assert batcher([]) == []
+
+def test_failed_pass_fails_only_its_callers():
+    def run_batch(items):
+        if "bad" in items:
+            raise ValueError("forward failed")
+        return items
+
+    batcher = MicroBatcher(run_batch, max_batch=2, max_wait=0.001)
+    with pytest.raises(ValueError):
+        batcher(["bad", "x", "y"])
+    assert batcher(["ok"]) == ["ok"]
+
+def test_batch_callback_reports_sentences_and_callers():
+    seen = []
+    batcher = MicroBatcher(lambda items: items, max_batch=8, max_wait=0.001, on_batch=lambda n, callers: seen.append((n, callers)))
+    batcher([1, 2, 3])
+    assert seen == [(3, 1)]
+
+def test_short_request_is_not_queued_behind_a_long_one():
+    started = threading.Event()
+    release = threading.Event()
+    batches = []
+
+    def run_batch(items):
+        batches.append(list(items))
+        if len(batches) == 1:
+            started.set()
+            release.wait(5)
+        return items
+
+    batcher = MicroBatcher(run_batch, max_batch=4, max_wait=0.001)
+    long_future = batcher.submit([("long", i) for i in range(40)])
+    started.wait(5)
+    short_future = batcher.submit([("short", i) for i in range(2)])
+    release.set()
+
+    assert short_future.result(5) == [("short", 0), ("short", 1)]
+    short_batch = next(i for i, batch in enumerate(batches) if ("short", 0) in batch)
+    assert short_batch == 1
+    assert len(long_future.result(5)) == 40
+
+def test_cancelled_request_does_not_stop_the_worker():
+    release = threading.Event()
+
+    def run_batch(items):
+        release.wait(5)
+        return items
+
+    batcher = MicroBatcher(run_batch, max_batch=1, max_wait=0.001)
+    first = batcher.submit([1])
+    cancelled = batcher.submit([2])
+    assert cancelled.cancel()
+    release.set()
+    assert first.result(5) == [1]
+    assert batcher([3]) == [3]
+
+def test_callback_errors_do_not_fail_the_batch():
+    def on_batch(n, callers):
+        raise RuntimeError("metrics down")
+
+    batcher = MicroBatcher(lambda items: items, max_batch=4, max_wait=0.001, on_batch=on_batch)
+    assert batcher([1, 2]) == [1, 2]
+
+def test_short_outputs_fail_the_callers_instead_of_hanging():
+    calls = []
+
+    def run_batch(items):
+        calls.append(1)
+        return items[:-1] if len(calls) == 1 else items
+
+    batcher = MicroBatcher(run_batch, max_batch=4, max_wait=0.001)
+    with pytest.raises(RuntimeError):
+        batcher.submit([1, 2, 3]).result(5)
+    assert batcher([4]) == [4]
+
+def test_dead_worker_thread_is_restarted():
+    batcher = MicroBatcher(lambda items: items, max_batch=4, max_wait=0.001)
+    assert batcher([1]) == [1]
+    dead = threading.Thread(target=lambda: None)
+    dead.start()
+    dead.join()
+    batcher._thread = dead
+    assert batcher([2]) == [2]
+
+def test_cancel_event_drops_remaining_items():
+    from concurrent.futures import CancelledError
+    cancel = threading.Event()
+    passes = []
+
+    def run_batch(items):
+        passes.append(len(items))
+        cancel.set()
+        return items
+
+    batcher = MicroBatcher(run_batch, max_batch=4, max_wait=0.001)
+    with pytest.raises(CancelledError):
+        batcher(list(range(40)), cancel_event=cancel)
+    assert passes == [4]
+    # Other callers are unaffected
+    assert batcher([1, 2]) == [1, 2]
@@ -0,0 +1,31 @@
+import math
+from bm25 import BM25, tokenize
+
+CHUNKS = [
+    "The controller shall implement appropriate technical and organisational measures.",
+    "Member States shall provide for independent supervisory authorities.",
+    "Each supervisory authority shall monitor the application of this Regulation.",
+    "Article 16 lays down the right to rectification.",
+]
+
+def test_tokenize_keeps_numbers_and_drops_single_letters():
+    assert tokenize("Article 5(1)(a) of Regulation (EU) 2016/679") == ["article", "5", "1", "of", "regulation", "eu", "2016", "679"]
+
+def test_top_n_ranks_lexical_matches_first():
+    index = BM25(CHUNKS)
+    assert index.top_n("Which supervisory authority monitors the Regulation?", 2) == [2, 1]
+    assert index.top_n("Article 16", 1) == [3]
+    assert index.top_n("controller", 10) == [0]
+    assert index.top_n("nothing matches", 10) == []
+
+def test_scores_follow_okapi_bm25():
+    index = BM25(CHUNKS, k1=1.5, b=0.75)
+    lengths = [len(tokenize(chunk)) for chunk in CHUNKS]
+    average = sum(lengths) / len(lengths)
+    idf = math.log(1 + (len(CHUNKS) - 1 + 0.5) / (1 + 0.5))
+    expected = idf * 1 * 2.5 / (1 + 1.5 * (1 - 0.75 + 0.75 * lengths[0] / average))
+    assert math.isclose(index.scores("controller")[0], expected)
+    assert index.scores("nothing matches")[0] == 0
+
+def test_empty_collection():
+    assert BM25([]).top_n("anything", 5) == []
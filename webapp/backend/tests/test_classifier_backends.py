@@ -0,0 +1,37 @@
+import pytest
+from summarisation import classify_sentences, load_classifier, get_model, CLASSIFIER_BACKENDS
+
+PARITY_SENTENCES = [
+    "This Regulation lays down rules relating to the protection of natural persons with regard to the processing of personal data.",
+    "Member States shall provide for one or more independent public authorities to be responsible for monitoring the application of this Regulation.",
+    "This Regulation shall enter into force on the twentieth day following that of its publication in the Official Journal of the European Union.",
+    "It shall apply from 25 May 2018.",
+    "Done at Brussels, 27 April 2016.",
+    "For the European Parliament, The President.",
+    "The controller shall implement appropriate technical and organisational measures to ensure a level of security appropriate to the risk.",
+    "Directive 95/46/EC is repealed with effect from 25 May 2018.",
+    "The Commission shall submit a report on the evaluation and review of this Regulation to the European Parliament and to the Council.",
+    "Any person who has suffered material or non-material damage as a result of an infringement shall have the right to receive compensation.",
+    "Article 12",
+    "Whereas:",
+]
+
+@pytest.fixture(scope="module")
+def eager_labels():
+    return classify_sentences(PARITY_SENTENCES, batch_size=4, backend=load_classifier(get_model(), "eager"))[0]
+
+@pytest.mark.parametrize("backend", ["torchscript", "compile"])
+def test_exact_backends_match_eager_labels(backend, eager_labels):
+    labels, _ = classify_sentences(PARITY_SENTENCES, batch_size=4, backend=load_classifier(get_model(), backend))
+    assert labels == eager_labels
+
+def test_int8_backend_agrees_with_eager_labels(eager_labels):
+    labels, _ = classify_sentences(PARITY_SENTENCES, batch_size=4, backend=load_classifier(get_model(), "int8"))
+    agreement = sum(a == b for a, b in zip(labels, eager_labels)) / len(eager_labels)
+    # Quantisation can flip sentences sitting right on the decision boundary
+    assert agreement >= 0.9
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        load_classifier(get_model(), "onnx")
+    assert "eager" in CLASSIFIER_BACKENDS
@@ -0,0 +1,73 @@
+import os
+import faiss
+import numpy as np
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app import app
+from corpus_index import CorpusIndex, split_articles, chunk_corpus_document, group_by_act, build_index, shard_manifest, prepare_shard_dir
+
+TEXT = (
+    "THE EUROPEAN PARLIAMENT AND THE COUNCIL HAVE ADOPTED THIS REGULATION: "
+    "Article 1 Subject matter This Regulation lays down rules referred to in Article 2 of Directive 95/46/EC. "
+    "Article 2 Scope It applies to the processing of personal data."
+)
+
+def test_split_articles_ignores_cross_references():
+    sections = split_articles(TEXT)
+    assert [label for label, _, _ in sections] == ["preamble", "Article 1", "Article 2"]
+    assert TEXT[sections[1][1]:sections[1][2]].startswith("Article 1 Subject matter")
+
+def test_chunk_metadata_spans_point_into_source():
+    for chunk in chunk_corpus_document("32016R0679", TEXT):
+        assert chunk["celex_id"] == "32016R0679"
+        assert TEXT[chunk["start"]:chunk["end"]] == chunk["text"]
+
+def test_search_groups_hits_by_act():
+    index = faiss.IndexFlatIP(2)
+    index.add(np.array([[1.0, 0.0], [0.0, 1.0], [0.8, 0.6]], dtype="float32"))
+    metadata = [
+        {"celex_id": "A", "article": "Article 1", "start": 0, "end": 10, "text": "a1"},
+        {"celex_id": "B", "article": "Article 3", "start": 0, "end": 10, "text": "b3"},
+        {"celex_id": "A", "article": "Article 2", "start": 10, "end": 20, "text": "a2"},
+    ]
+    corpus = CorpusIndex(index, metadata, lambda query: [1.0, 0.0])
+
+    hits = corpus.search("data protection", k=3)
+    acts = group_by_act(hits)
+
+    assert hits[0]["text"] == "a1"
+    assert acts[0]["celex_id"] == "A"
+    assert acts[0]["articles"] == ["Article 1", "Article 2"]
+
+@patch("app.get_corpus_index")
+def test_search_corpus_rejects_out_of_range_k(mock_get_index):
+    client = TestClient(app)
+    for k in (0, -1, 101):
+        response = client.post("/search_corpus", json={"question": "Which acts cover data protection?", "k": k})
+        assert response.status_code == 422
+    mock_get_index.assert_not_called()
+
+@patch("app.get_corpus_index")
+def test_search_corpus_endpoint_without_index(mock_get_index):
+    mock_get_index.side_effect = FileNotFoundError("index.faiss")
+    response = TestClient(app).post("/search_corpus", json={"question": "Which acts cover data protection?"})
+    assert response.status_code == 503
+
+def test_empty_corpus_is_rejected(tmp_path):
+    source = tmp_path / "empty.source"
+    source.write_text("\n\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="No passages"):
+        build_index(str(source), str(tmp_path / "index"))
+
+def test_shards_from_another_shard_size_are_discarded(tmp_path):
+    source = tmp_path / "train.source"
+    source.write_text(TEXT + "\n", encoding="utf-8")
+    output_dir = tmp_path / "index"
+    prepare_shard_dir(str(output_dir), shard_manifest(str(source), None, 10))
+    (output_dir / "shard_00000.npy").write_bytes(b"")
+
+    prepare_shard_dir(str(output_dir), shard_manifest(str(source), None, 10))
+    assert (output_dir / "shard_00000.npy").exists()
+    prepare_shard_dir(str(output_dir), shard_manifest(str(source), None, 20))
+    assert os.listdir(output_dir) == ["manifest.json"]
@@ -0,0 +1,33 @@
+import asyncio
+from eurlex_cache import EurlexCache
+from storage import make_engine
+
+DOCUMENT = {"title": "Title", "text": "Text", "related_documents": []}
+
+def test_concurrent_misses_fetch_once():
+    cache = EurlexCache(engine=make_engine("sqlite://"))
+    calls = []
+
+    async def loader(celex_id):
+        calls.append(celex_id)
+        await asyncio.sleep(0.05)
+        return DOCUMENT
+
+    async def run():
+        return await asyncio.gather(*[cache.get_or_fetch("32016R0679", loader) for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert calls == ["32016R0679"]
+    assert all(result == DOCUMENT for result in results)
+
+def test_expired_entries_are_misses():
+    cache = EurlexCache(engine=make_engine("sqlite://"), ttl=-1)
+    cache.put("32016R0679", DOCUMENT)
+    assert cache.get("32016R0679") is None
+
+def test_cache_is_bounded():
+    cache = EurlexCache(engine=make_engine("sqlite://"), max_entries=2)
+    for celex_id in ["A", "B", "C"]:
+        cache.put(celex_id, DOCUMENT)
+    assert cache.get("A") is None
+    assert cache.get("C") == DOCUMENT
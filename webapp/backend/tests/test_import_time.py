@@ -0,0 +1,29 @@
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Generous by default so slow CI machines pass; tighten locally to catch regressions
+IMPORT_BUDGET_SECONDS = float(os.environ.get("LEXBRIEF_IMPORT_BUDGET_SECONDS", "15"))
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+from model_loader import models
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "loaded": [name for name, model in models.items() if model.loaded],
+    "modules": [name for name in ("spacy", "langchain_community.vectorstores", "sentence_transformers") if name in sys.modules],
+}))
+"""
+
+def test_importing_app_loads_no_models():
+    env = {**os.environ, "LEXBRIEF_DB_URL": "sqlite://"}
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert report["loaded"] == []
+    assert report["modules"] == []
+    assert report["seconds"] < IMPORT_BUDGET_SECONDS
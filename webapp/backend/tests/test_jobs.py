@@ -0,0 +1,183 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
+from jobs import JobManager, QueueFullError
+
+async def wait_for(job, statuses=("done", "failed", "cancelled")):
+    while job.status not in statuses:
+        await asyncio.sleep(0.01)
+
+def test_identical_inputs_share_one_job():
+    calls = []
+
+    async def handler(text):
+        calls.append(text)
+        await asyncio.sleep(0.05)
+        return text.upper()
+
+    async def run():
+        manager = JobManager(handler, key_func=lambda text: text, workers=1)
+        manager.start()
+        first = manager.submit("regulation")
+        second = manager.submit("regulation")
+        await wait_for(first)
+        await manager.stop()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is second
+    assert first.status == "done"
+    assert first.result == "REGULATION"
+    assert calls == ["regulation"]
+
+def test_queue_depth_is_bounded():
+    async def handler(text):
+        await asyncio.sleep(1)
+
+    async def run():
+        manager = JobManager(handler, key_func=lambda text: text, workers=1, queue_depth=1)
+        manager.start()
+        manager.submit("a")
+        await asyncio.sleep(0.01)
+        manager.submit("b")
+        with pytest.raises(QueueFullError):
+            manager.submit("c")
+        await manager.stop()
+
+    asyncio.run(run())
+
+def test_cancel_running_and_queued_jobs():
+    async def handler(text):
+        await asyncio.sleep(10)
+
+    async def run():
+        manager = JobManager(handler, key_func=lambda text: text, workers=1)
+        manager.start()
+        running = manager.submit("a")
+        queued = manager.submit("b")
+        await wait_for(running, ("running",))
+        manager.cancel(queued.id)
+        manager.cancel(running.id)
+        await wait_for(running)
+        await manager.stop()
+        return running, queued
+
+    running, queued = asyncio.run(run())
+    assert running.status == "cancelled"
+    assert queued.status == "cancelled"
+
+def test_failed_jobs_record_the_error():
+    async def handler(text):
+        raise RuntimeError("model unavailable")
+
+    async def run():
+        manager = JobManager(handler, key_func=lambda text: text, workers=1)
+        manager.start()
+        job = manager.submit("a")
+        await wait_for(job)
+        await manager.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert job.status == "failed"
+    assert job.error == "model unavailable"
+
+def test_cancel_stops_threadpool_work_between_steps():
+    import threading
+    from fastapi.concurrency import run_in_threadpool
+    from jobs import raise_if_cancelled, JobCancelledError
+    steps = []
+    stopped = threading.Event()
+
+    def extract():
+        try:
+            for step in range(500):
+                raise_if_cancelled()
+                steps.append(step)
+                time.sleep(0.01)
+        except JobCancelledError:
+            stopped.set()
+
+    async def handler(text):
+        await run_in_threadpool(extract)
+
+    async def run():
+        manager = JobManager(handler, key_func=lambda text: text, workers=1)
+        manager.start()
+        job = manager.submit("a")
+        await wait_for(job, ("running",))
+        await asyncio.sleep(0.05)
+        manager.cancel(job.id)
+        await wait_for(job)
+        await manager.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert job.status == "cancelled"
+    assert stopped.wait(2)
+    assert len(steps) < 500
+
+def test_raise_if_cancelled_is_a_no_op_outside_jobs():
+    from jobs import raise_if_cancelled
+    raise_if_cancelled()
+
+def test_jobs_are_shared_between_workers():
+    from job_store import JobStore
+    from storage import make_engine
+    release = None
+
+    async def handler(text):
+        await release.wait()
+        return text.upper()
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        # Two workers behind one socket, sharing the database but nothing in memory
+        store = JobStore(make_engine("sqlite://"))
+        first = JobManager(handler, key_func=lambda text: text, workers=1, store=store)
+        second = JobManager(handler, key_func=lambda text: text, workers=1, store=store)
+        first.start()
+        second.start()
+
+        job = first.submit("regulation")
+        await wait_for(job, ("running",))
+        seen = second.get(job.id)
+        assert seen is not None and seen.status == "running"
+        assert second.submit("regulation").id == job.id
+
+        release.set()
+        await wait_for(job)
+        polled = second.get(job.id)
+        assert polled.status == "done"
+        assert polled.result == "REGULATION"
+        assert second.get("missing") is None
+
+        # A cancel sent to the other worker reaches the one running the job
+        release.clear()
+        other = first.submit("directive")
+        await wait_for(other, ("running",))
+        second.cancel(other.id)
+        await wait_for(other)
+        assert second.get(other.id).status == "cancelled"
+
+        await first.stop()
+        await second.stop()
+
+    asyncio.run(run())
+
+def test_jobs_of_an_exited_worker_are_reported_failed():
+    from jobs import Job
+    from job_store import JobStore
+    from storage import make_engine
+    store = JobStore(make_engine("sqlite://"))
+    job = Job("key", "text")
+    assert store.add(job)
+    # One active job per input, even when two workers insert at the same time
+    assert not store.add(Job("key", "text"))
+
+    with patch("job_store.process_alive", return_value=False):
+        assert store.find_active("key").status == "failed"
+    assert store.get(job.id).error.startswith("The worker running this job exited")
+    assert store.find_active("key") is None
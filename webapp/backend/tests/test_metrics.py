@@ -0,0 +1,79 @@
+import os
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from metrics import Registry, MetricsMiddleware, http_requests, http_duration, record_generation, ollama_tokens, ollama_generation
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    requests = registry.counter("test_requests_total", "Requests.", ("endpoint",))
+    latency = registry.histogram("test_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    registry.gauge_function("test_ratio", "Ratio.", ("cache",), lambda: {("a",): 0.5, ("b",): None})
+
+    requests.inc(endpoint='/say "hi"')
+    requests.inc(2, endpoint='/say "hi"')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    text = registry.render()
+
+    assert "# TYPE test_requests_total counter" in text
+    assert 'test_requests_total{endpoint="/say \\"hi\\""} 3.0' in text
+    assert 'test_latency_seconds_bucket{le="0.1"} 1.0' in text
+    assert 'test_latency_seconds_bucket{le="1.0"} 2.0' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"} 2.0' in text
+    assert "test_latency_seconds_count 2.0" in text
+    assert 'test_ratio{cache="a"} 0.5' in text
+    assert 'cache="b"' not in text
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    before = http_requests.value(method="GET", endpoint="/items/{item_id}", status=200)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+
+    assert http_requests.value(method="GET", endpoint="/items/{item_id}", status=200) == before + 2
+    assert http_requests.value(method="GET", endpoint="unmatched", status=404) >= 1
+    assert http_duration.count(method="GET", endpoint="/items/{item_id}") >= 2
+
+def test_generation_metadata_is_recorded():
+    before = ollama_tokens.value(model="test-model", kind="completion")
+    record_generation("test-model", {"response": "", "done": True, "prompt_eval_count": 40, "eval_count": 12, "eval_duration": 1_500_000_000})
+    assert ollama_tokens.value(model="test-model", kind="completion") == before + 12
+    assert ollama_tokens.value(model="test-model", kind="prompt") >= 40
+    assert ollama_generation.count(model="test-model") >= 1
+
+def test_worker_snapshots_are_combined(tmp_path):
+    from metrics import mark_process_dead
+
+    def worker_registry(requests, in_flight, ratio):
+        registry = Registry()
+        registry.counter("test_requests_total", "Requests.", ("endpoint",)).inc(requests, endpoint="/")
+        registry.histogram("test_latency_seconds", "Latency.", buckets=(1.0,)).observe(0.5)
+        registry.gauge("test_in_flight", "In flight.").set(in_flight)
+        registry.gauge_function("test_ratio", "Ratio.", (), lambda: {(): ratio}, per_worker=True)
+        return registry
+
+    worker_registry(2, 1, 0.25).write_snapshot(str(tmp_path), pid=101)
+    # The scraped worker adds its own current values
+    scraped = worker_registry(3, 2, 0.75)
+    text = scraped.render_merged(str(tmp_path))
+
+    assert 'test_requests_total{endpoint="/"} 5.0' in text
+    assert 'test_latency_seconds_bucket{le="1.0"} 2.0' in text
+    assert "test_in_flight 3.0" in text
+    assert 'test_ratio{worker="101"} 0.25' in text
+    assert f'test_ratio{{worker="{os.getpid()}"}} 0.75' in text
+
+    # A dead worker's requests still count; its gauges no longer do
+    mark_process_dead(101, str(tmp_path))
+    text = scraped.render_merged(str(tmp_path))
+    assert 'test_requests_total{endpoint="/"} 5.0' in text
+    assert "test_in_flight 2.0" in text
+    assert 'worker="101"' not in text
@@ -0,0 +1,55 @@
+import threading
+import time
+import pytest
+from model_loader import LazyModel, WarmUp
+
+def test_lazy_model_loads_once_under_concurrent_first_use():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    model = LazyModel("test", loader)
+    assert model.status()["state"] == "not_loaded"
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(model.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert model.loaded
+    assert model.status()["load_seconds"] is not None
+
+def test_lazy_model_records_failure_and_retries():
+    attempts = []
+
+    def loader():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("weights missing")
+        return "model"
+
+    model = LazyModel("test", loader)
+    with pytest.raises(OSError):
+        model.get()
+    assert model.status() == {"state": "failed", "load_seconds": None, "error": "weights missing"}
+    assert model.get() == "model"
+    assert model.loaded
+
+def test_warm_up_stops_at_first_failing_step():
+    ran = []
+    warm_up = WarmUp()
+    warm_up.add("first", lambda: ran.append("first"))
+    warm_up.add("broken", lambda: 1 / 0)
+    warm_up.add("last", lambda: ran.append("last"))
+    warm_up.run()
+
+    assert ran == ["first"]
+    assert warm_up.status()["state"] == "failed"
+    assert warm_up.status()["error"].startswith("broken")
+    assert not warm_up.ready
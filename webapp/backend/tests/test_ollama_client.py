@@ -0,0 +1,63 @@
+import asyncio
+import httpx
+import pytest
+from unittest.mock import patch
+from ollama_client import OllamaClient, OllamaSupervisor, OllamaUnavailableError
+
+def make_client(handler):
+    return OllamaClient(base_url="http://ollama.test", transport=httpx.MockTransport(handler))
+
+def test_generate_posts_prompt_and_returns_metadata():
+    def handler(request):
+        if request.url.path == "/api/generate":
+            return httpx.Response(200, json={"response": "Summary", "done": True, "eval_count": 12})
+        return httpx.Response(200, text="Ollama is running")
+
+    async def run():
+        client = make_client(handler)
+        try:
+            return await client.generate("Prompt", "llama3")
+        finally:
+            await client.aclose()
+
+    result = asyncio.run(run())
+    assert result["response"] == "Summary"
+    assert result["eval_count"] == 12
+
+def test_supervisor_reports_readiness():
+    healthy = {"value": False}
+
+    def handler(request):
+        if healthy["value"]:
+            return httpx.Response(200, text="Ollama is running")
+        raise httpx.ConnectError("connection refused", request=request)
+
+    async def run():
+        client = make_client(handler)
+        supervisor = OllamaSupervisor(client, spawn_server=False)
+        assert not await supervisor.check()
+        with pytest.raises(OllamaUnavailableError):
+            supervisor.require_ready()
+
+        healthy["value"] = True
+        assert await supervisor.check()
+        supervisor.require_ready()
+        assert supervisor.status()["state"] == "ready"
+        await client.aclose()
+
+    asyncio.run(run())
+
+def test_tests_never_spawn_a_real_server():
+    from ollama_client import supervisor
+
+    async def run():
+        supervisor.start()
+        await asyncio.sleep(0.05)
+        await supervisor.stop()
+
+    unreachable = make_client(lambda request: httpx.Response(503))
+    with patch.object(supervisor, "client", unreachable), patch.object(supervisor, "initial_backoff", 0.01), \
+            patch("ollama_client.shutil.which", return_value="/usr/bin/ollama"), patch("ollama_client.subprocess.Popen") as popen:
+        asyncio.run(run())
+    assert not supervisor.spawn_server
+    popen.assert_not_called()
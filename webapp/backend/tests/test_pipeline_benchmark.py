@@ -0,0 +1,28 @@
+import asyncio
+import time
+from benchmarks.pipeline import build_document, stub_transport, DOCUMENT_SIZES
+from ollama_client import OllamaClient
+
+def test_documents_grow_with_size():
+    lengths = [len(build_document(DOCUMENT_SIZES[name])) for name in ("xs", "s", "m", "l")]
+    assert lengths == sorted(lengths)
+    assert "Article 12\n" in build_document(DOCUMENT_SIZES["s"])
+
+def test_stub_generates_at_configured_rate():
+    client = OllamaClient(base_url="http://ollama.test", transport=stub_transport(tokens_per_second=200, response_tokens=20))
+
+    async def run():
+        try:
+            start = time.perf_counter()
+            response = await client.generate("Prompt", "llama3")
+            elapsed = time.perf_counter() - start
+            chunks = [chunk async for chunk in client.stream("Prompt", "llama3")]
+            return response, elapsed, chunks
+        finally:
+            await client.aclose()
+
+    response, elapsed, chunks = asyncio.run(run())
+    assert response["eval_count"] == 20
+    assert elapsed >= 0.1
+    assert len([chunk for chunk in chunks if chunk["response"]]) == 20
+    assert chunks[-1]["done"]
@@ -0,0 +1,27 @@
+import os
+from shard_manifest import prepare_shard_dir, path_fingerprint
+
+def test_shards_are_kept_only_while_the_manifest_matches(tmp_path):
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    (model_dir / "tokenizer.json").write_text("{}", encoding="utf-8")
+    shard_dir = tmp_path / "shards"
+
+    def manifest(batch_size):
+        return {"model": path_fingerprint(str(model_dir)), "batch_size": batch_size}
+
+    prepare_shard_dir(str(shard_dir), manifest(64))
+    (shard_dir / "shard_0000000_0000256.npy").write_bytes(b"")
+    prepare_shard_dir(str(shard_dir), manifest(64))
+    assert (shard_dir / "shard_0000000_0000256.npy").exists()
+
+    prepare_shard_dir(str(shard_dir), manifest(32))
+    assert os.listdir(shard_dir) == ["manifest.json"]
+
+    (shard_dir / "shard_0000000_0000256.npy").write_bytes(b"")
+    (model_dir / "tokenizer.json").write_text('{"changed": true}', encoding="utf-8")
+    prepare_shard_dir(str(shard_dir), manifest(32))
+    assert os.listdir(shard_dir) == ["manifest.json"]
+
+def test_model_ids_fingerprint_as_themselves():
+    assert path_fingerprint("nlpaueb/legal-bert-base-uncased") == ["nlpaueb/legal-bert-base-uncased"]
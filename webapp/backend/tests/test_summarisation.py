@@ -1,6 +1,12 @@
+import asyncio
 import pytest
 from unittest.mock import patch
-from summarisation import summarise_text, preprocess_eurlex, legal_bert_extract
+import torch
+from summarisation import (
+    summarise_text, preprocess_eurlex, legal_bert_extract, classify_sentences,
+    segment_document, chunk_document, extractive_summary, get_tokenizer, get_model
+)
+from summary_store import summary_store
 
 def test_preprocess_eurlex_chunks():
     text = "Sentence one. Sentence two. Sentence three."
@@ -8,14 +14,220 @@ def test_preprocess_eurlex_chunks():
     assert len(chunks) > 0
     assert all(isinstance(c, str) for c in chunks)
 
-@patch("summarisation.legal_bert_extract")
+def test_classify_sentences_matches_unbatched():
+    sentences = [
+        "This Regulation lays down rules on the protection of natural persons.",
+        "Member States shall ensure that the supervisory authority is independent.",
+        "It applies from 25 May 2018.",
+        "Short one.",
+        "The Commission shall adopt implementing acts laying down the procedural rules " * 3,
+    ]
+    tokenizer, model = get_tokenizer(), get_model()
+    expected = []
+    for sent in sentences:
+        inputs = tokenizer(sent, return_tensors="pt", truncation=True, max_length=512)
+        with torch.no_grad():
+            expected.append(torch.argmax(model(**inputs).logits, dim=1).item())
+
+    predictions, token_counts = classify_sentences(sentences, batch_size=2)
+    assert predictions == expected
+    assert token_counts == [len(tokenizer(s)["input_ids"]) for s in sentences]
+
+def test_segment_document_records_offsets_and_token_counts():
+    document = segment_document("This Regulation applies to all Member States. It enters into force on the twentieth day.")
+    assert len(document.sentences) == 2
+    for i, sent in enumerate(document.sentences):
+        text = document.sentence_text(i)
+        assert text == text.strip()
+        assert sent.token_count == len(get_tokenizer()(text)["input_ids"])
+
+def test_chunk_document_overlaps_by_sentence_index():
+    text = " ".join(f"Article {i} sets out the obligations of the Member States." for i in range(20))
+    document = segment_document(text)
+    chunks = chunk_document(document, chunk_size=60, overlap=3)
+    assert len(chunks) > 1
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current[0] in previous
+
+@patch("summarisation.classify_encodings")
+def test_extractive_summary_classifies_each_sentence_once(mock_classify):
+    mock_classify.side_effect = lambda encodings, batch_size: [1] * len(encodings)
+    text = " ".join(f"Article {i} sets out the obligations of the Member States." for i in range(20))
+
+    summary = extractive_summary(text, chunk_size=60, max_tokens=1024)
+
+    assert mock_classify.call_count == 1
+    assert len(mock_classify.call_args.args[0]) == len(segment_document(text).sentences)
+    assert "Article 0" in summary
+
+@patch("summarisation.extractive_summary")
 @patch("summarisation.llama_summary")
-@patch("summarisation.start_ollama_server")
-def test_summarise_text(mock_start, mock_llama, mock_extract):
-    mock_start.return_value = None
-    mock_extract.side_effect = lambda chunk, max_tokens: chunk
+@patch("summarisation.supervisor")
+def test_summarise_text(mock_supervisor, mock_llama, mock_extract):
+    summary_store.clear()
+    mock_extract.side_effect = lambda text, chunk_size, max_tokens: text
     mock_llama.return_value = "Abstractive summary"
 
     text = "This is a legal text. It contains multiple sentences."
-    summary = summarise_text(text)
+    summary = asyncio.run(summarise_text(text))
     assert "Abstractive summary" in summary
+
+@patch("summarisation.extractive_summary")
+@patch("summarisation.llama_summary")
+@patch("summarisation.supervisor")
+def test_summarise_text_reuses_stored_summaries(mock_supervisor, mock_llama, mock_extract):
+    summary_store.clear()
+    mock_extract.side_effect = lambda text, chunk_size, max_tokens: text
+    mock_llama.return_value = "Abstractive summary"
+    text = "This Regulation applies to all Member States."
+
+    assert asyncio.run(summarise_text(text)) == "Abstractive summary"
+    assert asyncio.run(summarise_text(text)) == "Abstractive summary"
+    assert mock_extract.call_count == 1
+    assert mock_llama.call_count == 1
+
+@patch("summarisation.SUMMARY_PROMPT_VERSION", 999)
+@patch("summarisation.extractive_summary")
+@patch("summarisation.llama_summary")
+@patch("summarisation.supervisor")
+def test_prompt_change_only_reruns_llm_stage(mock_supervisor, mock_llama, mock_extract):
+    import summarisation
+    summary_store.clear()
+    text = "This Regulation applies to all Member States."
+    extractive_key, _ = summarisation.summary_keys(text)
+    summary_store.put_extractive(extractive_key, "Stored extract")
+    mock_llama.return_value = "New summary"
+
+    assert asyncio.run(summarise_text(text)) == "New summary"
+    mock_extract.assert_not_called()
+    mock_llama.assert_called_once_with("Stored extract")
+
+@patch("summarisation.extractive_summary")
+@patch("summarisation.llama_summary")
+@patch("summarisation.supervisor")
+def test_llm_errors_are_not_stored(mock_supervisor, mock_llama, mock_extract):
+    summary_store.clear()
+    mock_extract.side_effect = lambda text, chunk_size, max_tokens: text
+    mock_llama.return_value = "Error: connection refused"
+    text = "This Regulation applies to all Member States."
+
+    asyncio.run(summarise_text(text))
+    asyncio.run(summarise_text(text))
+    assert mock_llama.call_count == 2
+
+@patch("summarisation.REDUCE_INPUT_TOKENS", 40)
+@patch("summarisation.ollama.generate")
+def test_map_reduce_limits_concurrency_and_reduces_recursively(mock_generate):
+    from summarisation import map_reduce
+    state = {"active": 0, "peak": 0, "prompts": []}
+
+    async def fake_generate(prompt, model, temperature):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        state["prompts"].append(prompt)
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        return {"response": "The Member States shall apply the measures laid down in this act."}
+
+    mock_generate.side_effect = fake_generate
+    chunks = [f"Extract {i} of the regulation." for i in range(8)]
+
+    result = asyncio.run(map_reduce(chunks, concurrency=3))
+
+    assert state["peak"] <= 3
+    map_prompts = [p for p in state["prompts"] if "one excerpt of a longer document" in p]
+    reduce_prompts = [p for p in state["prompts"] if "PARTIAL SUMMARIES" in p]
+    assert len(map_prompts) == 8
+    assert reduce_prompts
+    assert result
+
+@patch("summarisation.SUMMARY_MODE", "map_reduce")
+@patch("summarisation.map_reduce")
+@patch("summarisation.extractive_summary")
+@patch("summarisation.llama_summary")
+@patch("summarisation.supervisor")
+def test_summarise_text_map_reduce_mode(mock_supervisor, mock_llama, mock_extract, mock_map_reduce):
+    summary_store.clear()
+    mock_extract.side_effect = lambda text, chunk_size, max_tokens: "First extract.\nSecond extract."
+    mock_map_reduce.return_value = "Merged partial summaries"
+    mock_llama.return_value = "Abstractive summary"
+
+    assert asyncio.run(summarise_text("Some legal text.")) == "Abstractive summary"
+    mock_map_reduce.assert_called_once_with(["First extract.", "Second extract."])
+    mock_llama.assert_called_once_with("Merged partial summaries")
+
+@patch("summarisation.summarise_text")
+def test_summarise_text_or_raise_turns_llm_errors_into_exceptions(mock_summarise):
+    from summarisation import summarise_text_or_raise, SummaryError
+    mock_summarise.return_value = "Error: Ollama timed out"
+    with pytest.raises(SummaryError, match="Ollama timed out"):
+        asyncio.run(summarise_text_or_raise("Some legal text."))
+
+    mock_summarise.return_value = "SUMMARY: fine"
+    assert asyncio.run(summarise_text_or_raise("Some legal text.")) == "SUMMARY: fine"
+
+def test_extractive_key_depends_on_classifier_backend():
+    import summarisation
+    text = "This Regulation applies to all Member States."
+    with patch("summarisation.CLASSIFIER_BACKEND", "eager"):
+        eager_key, _ = summarisation.summary_keys(text)
+    with patch("summarisation.CLASSIFIER_BACKEND", "int8"):
+        int8_key, _ = summarisation.summary_keys(text)
+    assert eager_key != int8_key
+
+@patch("summarisation.SUMMARY_MODE", "map_reduce")
+def test_abstractive_key_depends_on_reduce_budget():
+    import summarisation
+    text = "This Regulation applies to all Member States."
+    _, default_key = summarisation.summary_keys(text)
+    with patch("summarisation.REDUCE_INPUT_TOKENS", 1500):
+        _, smaller_budget_key = summarisation.summary_keys(text)
+    assert default_key != smaller_budget_key
+
+@patch("summarisation.stored_extractive_summary")
+@patch("summarisation.llama_summary_stream")
+@patch("summarisation.supervisor")
+def test_empty_streamed_summary_is_not_stored(mock_supervisor, mock_stream, mock_extract):
+    from summarisation import summarise_text_stream, summary_keys
+    summary_store.clear()
+    mock_extract.return_value = "Stored extract"
+
+    async def no_tokens(text):
+        return
+        yield
+
+    async def collect():
+        return [event async for event in summarise_text_stream("This Regulation applies to all Member States.")]
+
+    mock_stream.side_effect = no_tokens
+    events = asyncio.run(collect())
+    assert events[-1] == {"event": "done"}
+    _, abstractive_key = summary_keys("This Regulation applies to all Member States.")
+    assert summary_store.get_abstractive(abstractive_key) is None
+
+def test_cancel_stops_micro_batched_classification():
+    import threading
+    import time
+    import summarisation
+    from jobs import _cancel_event, JobCancelledError
+    cancel_event = threading.Event()
+    passes = []
+
+    def slow_predict(batch):
+        passes.append(len(batch))
+        if len(passes) == 2:
+            # The job is cancelled while its document is still being classified
+            cancel_event.set()
+        time.sleep(0.01)
+        return [0] * len(batch)
+
+    encodings = [[101, 2023, 102]] * (summarisation.CLASSIFIER_BATCH_SIZE * 10)
+    with patch("summarisation.CLASSIFIER_MICRO_BATCHING", True), \
+            patch.object(summarisation.classifier_batcher, "run_batch", slow_predict):
+        token = _cancel_event.set(cancel_event)
+        try:
+            with pytest.raises(JobCancelledError):
+                summarisation.classify_encodings(encodings)
+        finally:
+            _cancel_event.reset(token)
+    assert len(passes) < 10
@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+import pytest
+from benchmarks.worker_memory import server_memory, process_memory
+
+pytestmark = pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="needs Linux smaps_rollup")
+
+def test_process_memory_splits_unique_and_shared():
+    memory = process_memory(os.getpid())
+    assert 0 < memory["uss_mb"] <= memory["rss_mb"]
+    assert memory["pss_mb"] <= memory["rss_mb"]
+
+def test_server_memory_lists_child_processes():
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        report = server_memory(os.getpid())
+        assert child.pid in [worker["pid"] for worker in report["workers"]]
+        assert report["total_pss_mb"] >= report["parent"]["pss_mb"]
+    finally:
+        child.kill()
+        child.wait()
@@ -9,6 +9,8 @@ import logo from './assets/artificial-intelligence.png';
 type CelexData = {
   title: string;
   text: string;
+  preamble?: string;
+  articles?: { number: string; text: string }[];
   related_documents: {
     modifies: []; 
     modified_by: [];
@@ -41,6 +43,8 @@ function App() {
       return {
         title: data.title,
         text: data.text,
+        preamble: data.preamble,
+        articles: data.articles,
         related_documents: data.related_documents || [],
       };
     } catch (error) {
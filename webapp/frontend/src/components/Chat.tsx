@@ -5,13 +5,16 @@ import ReactMarkdown from 'react-markdown';
 type CelexData = {
     title: string;
     text: string;
+    preamble?: string;
+    articles?: { number: string; text: string }[];
   };
   
   type ChatProps = {
     celexData: CelexData;
+    celexId?: string;
   };
 
-function Chat({ celexData }: ChatProps) {
+function Chat({ celexData, celexId }: ChatProps) {
   const [messages, setMessages] = useState<string[]>([]);
   const [responses, setResponses] = useState<string[]>([]);
   const [newMessage, setNewMessage] = useState('');
@@ -29,7 +32,10 @@ function Chat({ celexData }: ChatProps) {
           },          
         body: JSON.stringify({
             question: newMessage,
-            text: celexData?.text,
+            text: celexData?.articles ? '' : celexData?.text,
+            celex_id: celexId,
+            preamble: celexData?.preamble,
+            articles: celexData?.articles,
           })
       });
       if (!response.ok) {
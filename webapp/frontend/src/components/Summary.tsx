@@ -22,6 +22,8 @@ type SummaryProps = {
   celexData: {
     title: string;
     text: string;
+    preamble?: string;
+    articles?: { number: string; text: string }[];
     related_documents: {
       modifies: RelatedDocItem[];
       modified_by: RelatedDocItem[];
@@ -156,7 +158,7 @@ function Summary({ summaryData, celexData, celexId }: SummaryProps) {
             <ChatIcon className="chat-icon" />
             <h4 className="fw-semibold">AI Assistant</h4>
           </div>
-          {summaryData && celexData && <Chat celexData={{ title: celexData.title, text: celexData.text }} />}
+          {summaryData && celexData && <Chat celexData={{ title: celexData.title, text: celexData.text, preamble: celexData.preamble, articles: celexData.articles }} celexId={celexId} />}
         </div>
       </div>
     </div>